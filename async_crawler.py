@@ -0,0 +1,53 @@
+import argparse
+import logging
+import time
+
+from src.asynchronous.spider import AsyncSpider
+
+
+def main():
+    """
+    Main function of the program. Provides command line facilities to crawl websites
+    using a concurrent web crawler based on asyncio.
+    """
+    # Acquires input arguments from the user
+    parser = argparse.ArgumentParser(description='A simple asynchronous web crawler')
+    parser.add_argument('website', help='the website you want to start the crawling from')
+    parser.add_argument('-m', dest='max_pages', type=int, default=5,
+                        help='the maximum number of pages that will be visited')
+    parser.add_argument('-l', dest='hide_logs', action='store_true', default=False,
+                        help='a flag that tells if logs should be hidden')
+    parser.add_argument('-s', dest='path_to_file', type=str,
+                        help='tells if the results should be saved to file and provides the full path for saving')
+    parser.add_argument('-c', dest='max_concurrency', type=int, default=10,
+                        help='the maximum number of HTTP requests in flight at the same time')
+    parser.add_argument('-r', dest='max_concurrency_per_host', type=int, default=5,
+                        help='the maximum number of HTTP requests in flight at the same time towards one host')
+    parser.add_argument('--timeout', dest='timeout', type=float, default=30,
+                        help='the number of seconds waited for the server before giving up on a request')
+    args = parser.parse_args()
+    # Sets up the main Logger of the program to the INFO level
+    logging.getLogger().setLevel(logging.INFO)
+    # Storing the current time
+    start_time = time.time()
+    # Setting up the AsyncSpider for crawling
+    spider = AsyncSpider(enable_logging=not args.hide_logs,
+                         max_concurrency=args.max_concurrency,
+                         max_concurrency_per_host=args.max_concurrency_per_host,
+                         timeout=args.timeout)
+    result = spider.crawl(args.website, args.max_pages)
+    print('Result of the crawling for {} returned in {:.2f} seconds:'.format(args.website, time.time()-start_time))
+    print(result)
+    # In addition, saves the result to a file if needed
+    if args.path_to_file:
+        with open(args.path_to_file, 'w') as outfile:
+            # Result is already a json string!
+            outfile.write(result)
+    # Cleans up the environment deleting spider
+    del spider
+
+if __name__ == '__main__':
+    """
+    Main entry point of the program. Simply calls the main function.
+    """
+    main()
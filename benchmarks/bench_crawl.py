@@ -0,0 +1,308 @@
+"""
+End-to-end crawl benchmark: serves a synthetic website (see benchmarks.site) from a separate
+process and crawls it, either with the Spider in the current process or with sync_crawler.py
+in a subprocess. It reports the pages crawled per second, the requests sent for each page, the
+p50/p99 page latency and the peak RSS of the crawler.
+
+Run it from the main project folder with:
+
+    python3 -m benchmarks.bench_crawl --pages 1000 -m 500 -o before.json
+    python3 -m benchmarks.bench_crawl --pages 1000 -m 500 --compare before.json
+
+The page latency is the time between two pages yielded by Spider.iter_crawl, so it is only
+measured when crawling in process. Peak RSS is read with getrusage, so it is only reported on
+Unix systems, in kilobytes, and in process it includes the memory held before the crawl.
+
+The useful pages are the distinct pages of the website crawled, calendar trap pages excluded,
+and the coverage is their fraction of the website. To compare how the frontier copes with
+crawler traps, run for instance:
+
+    python3 -m benchmarks.bench_crawl --pages 1000 --trap-ratio 0.2 -m 500
+    python3 -m benchmarks.bench_crawl --pages 1000 --trap-ratio 0.2 -m 500 --priority
+    python3 -m benchmarks.bench_crawl --pages 1000 --trap-ratio 0.2 -m 500 --prefer '/calendar/=-5'
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.site import STATS_PATH, SiteProcess, add_site_arguments, site_from_arguments
+from src.sync.dedup import DuplicateIndex
+from src.sync.frontier import PriorityFrontier
+from src.sync.scoring import DepthScorer, InlinkScorer, PathFilter, PatternScorer, parse_pattern_weight
+from src.sync.spider import Spider
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROJECT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    """
+    Returns a percentile of the given values, with the nearest-rank method.
+
+    :param values: a list of numbers
+    :param fraction: the percentile as a number between 0 and 1
+    :return: the percentile, or None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+def peak_rss(who):
+    """
+    Returns the peak resident set size of the current process or of its terminated children.
+
+    :param who: resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN
+    :return: the peak RSS in kilobytes, or None if it can't be measured
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(who).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+
+def server_stats(url):
+    """
+    Returns the counters of a SiteServer.
+
+    :param url: the base URL of the server
+    :return: a dictionary with the number of GET and HEAD requests and of connections
+    """
+    with urllib.request.urlopen(url + STATS_PATH) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def get_frontier(args):
+    """
+    Returns the function creating the frontier of the crawl, like sync_crawler.py does.
+
+    :param args: the parsed command line arguments
+    :return: a PriorityFrontier factory, or None for the default frontier
+    """
+    if not (args.priority or args.prefer or args.deny_paths):
+        return None
+    scorers = [DepthScorer(), InlinkScorer()]
+    if args.prefer:
+        scorers.append(PatternScorer(args.prefer))
+    if args.deny_paths:
+        scorers.append(PathFilter(deny=args.deny_paths))
+    return functools.partial(PriorityFrontier, scorers=scorers)
+
+
+def count_useful_pages(urls):
+    """
+    Counts the distinct pages of the website among the crawled URLs, ignoring their query string.
+
+    :param urls: an iterable of crawled URLs
+    :return: the number of distinct /page/ URLs
+    """
+    return len({url.split('?', 1)[0] for url in urls if '/page/' in url})
+
+
+def crawl_in_process(start_url, args):
+    """
+    Crawls the website with the Spider in the current process.
+
+    :param start_url: the URL the crawl starts from
+    :param args: the parsed command line arguments
+    :return: the tuple (pages, useful_pages, elapsed_time, page_latencies, peak_rss)
+    """
+    spider = Spider(enable_logging=False, max_workers=args.max_workers, strict=args.strict,
+                    parse_workers=args.parse_workers, duplicate_index=DuplicateIndex if args.dedup else None,
+                    frontier=get_frontier(args), max_depth=args.max_depth)
+    latencies = []
+    urls = []
+    start_time = last_time = time.perf_counter()
+    for result in spider.iter_crawl(start_url, args.max_pages):
+        now = time.perf_counter()
+        latencies.append(now - last_time)
+        last_time = now
+        urls.append(result['url'])
+    elapsed_time = time.perf_counter() - start_time
+    spider.close()
+    return len(urls), count_useful_pages(urls), elapsed_time, latencies, \
+        peak_rss(resource.RUSAGE_SELF if resource else None)
+
+
+def crawl_with_cli(start_url, args):
+    """
+    Crawls the website by running sync_crawler.py in a subprocess.
+
+    :param start_url: the URL the crawl starts from
+    :param args: the parsed command line arguments
+    :return: the tuple (pages, useful_pages, elapsed_time, page_latencies, peak_rss)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path_to_file = os.path.join(directory, 'results.ndjson')
+        command = [sys.executable, os.path.join(PROJECT_FOLDER, 'sync_crawler.py'), start_url,
+                   '-m', str(args.max_pages), '-l', '-w', str(args.max_workers),
+                   '--parse-workers', str(args.parse_workers), '-f', 'ndjson', '--stream', '-s', path_to_file]
+        if args.strict:
+            command.append('--strict')
+        if args.dedup:
+            command.append('--dedup')
+        if args.priority:
+            command.append('--priority')
+        if args.max_depth is not None:
+            command.extend(['--max-depth', str(args.max_depth)])
+        for pattern, weight in args.prefer or ():
+            command.extend(['--prefer', '{}={}'.format(pattern, weight)])
+        for path in args.deny_paths or ():
+            command.extend(['--deny-path', path])
+        start_time = time.perf_counter()
+        subprocess.run(command, check=True, cwd=PROJECT_FOLDER, stdout=subprocess.DEVNULL)
+        elapsed_time = time.perf_counter() - start_time
+        with open(path_to_file) as results:
+            urls = [json.loads(line)['url'] for line in results if line.strip()]
+    return len(urls), count_useful_pages(urls), elapsed_time, [], \
+        peak_rss(resource.RUSAGE_CHILDREN if resource else None)
+
+
+def run(site, args):
+    """
+    Crawls a freshly started website once.
+
+    :param site: the SiteGenerator of the website
+    :param args: the parsed command line arguments
+    :return: a dictionary with the measures of the run
+    """
+    with SiteProcess(site) as server:
+        crawl = crawl_with_cli if args.mode == 'cli' else crawl_in_process
+        pages, useful_pages, elapsed_time, latencies, max_rss = crawl(server.url + '/page/0', args)
+        stats = server_stats(server.url)
+    requests = stats['GET'] + stats['HEAD']
+    return {
+        'pages': pages,
+        'seconds': round(elapsed_time, 4),
+        'useful_pages': useful_pages,
+        'coverage': round(useful_pages / site.pages, 4),
+        'pages_per_second': round(pages / elapsed_time, 2) if elapsed_time else None,
+        'requests': requests,
+        'get_requests': stats['GET'],
+        'head_requests': stats['HEAD'],
+        'connections': stats['connections'],
+        'requests_per_page': round(requests / pages, 3) if pages else None,
+        'useful_pages_per_request': round(useful_pages / requests, 4) if requests else None,
+        'p50_latency_ms': round(percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+        'p99_latency_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'peak_rss_kb': max_rss,
+    }
+
+
+def summarize(runs):
+    """
+    Summarizes several runs with the median of each measure.
+
+    :param runs: a list of dictionaries returned by run
+    :return: a dictionary with the median of each measure
+    """
+    summary = {}
+    for name in runs[0]:
+        values = [run_measures[name] for run_measures in runs if run_measures[name] is not None]
+        summary[name] = percentile(values, 0.5)
+    return summary
+
+
+def get_commit():
+    """
+    Returns the commit the benchmark runs on.
+
+    :return: the hash of the current git commit, or None if it can't be determined
+    """
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_FOLDER, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def compare(summary, path):
+    """
+    Prints the relative change of each measure with respect to a previous report.
+
+    :param summary: the summary of the current runs
+    :param path: the path of a JSON report written with -o
+    """
+    with open(path) as report_file:
+        baseline = json.load(report_file)['summary']
+    print('\n{:>20} {:>14} {:>14} {:>9}'.format('', 'baseline', 'current', 'change'))
+    for name, value in summary.items():
+        previous = baseline.get(name)
+        if value is None or previous is None:
+            continue
+        change = '{:+.1f}%'.format((value - previous) * 100.0 / previous) if previous else 'n/a'
+        print('{:>20} {:>14} {:>14} {:>9}'.format(name, previous, value, change))
+
+
+def main():
+    """
+    Runs the benchmark and prints or saves the measures.
+    """
+    parser = argparse.ArgumentParser(description='Crawl benchmark on a synthetic local website')
+    add_site_arguments(parser)
+    parser.add_argument('-m', dest='max_pages', type=int, default=500, help='the maximum number of pages to crawl')
+    parser.add_argument('-w', dest='max_workers', type=int, default=8,
+                        help='the number of threads classifying the links of each page')
+    parser.add_argument('--parse-workers', dest='parse_workers', type=int, default=0,
+                        help='the number of processes parsing the pages')
+    parser.add_argument('--strict', dest='strict', action='store_true', default=False,
+                        help='a flag that tells if every link should be classified with a HEAD request')
+    parser.add_argument('--dedup', dest='dedup', action='store_true', default=False,
+                        help='a flag that tells if duplicate pages should not be parsed')
+    parser.add_argument('--priority', dest='priority', action='store_true', default=False,
+                        help='a flag that tells if the crawl should use the priority frontier')
+    parser.add_argument('--prefer', dest='prefer', type=parse_pattern_weight, action='append',
+                        help='a PATTERN=WEIGHT pair scoring the URLs of the priority frontier, can be repeated')
+    parser.add_argument('--deny-path', dest='deny_paths', type=str, action='append',
+                        help='a path prefix that is never visited, can be repeated')
+    parser.add_argument('--max-depth', dest='max_depth', type=int,
+                        help='the maximum number of links followed from the start page')
+    parser.add_argument('--mode', dest='mode', choices=['spider', 'cli'], default='spider',
+                        help='crawl with the Spider in process or with sync_crawler.py in a subprocess')
+    parser.add_argument('-r', dest='repeat', type=int, default=3, help='the number of runs, the median is reported')
+    parser.add_argument('-o', dest='output', type=str, help='the path of the JSON report')
+    parser.add_argument('--compare', dest='baseline', type=str,
+                        help='the path of a previous JSON report to compare the results with')
+    args = parser.parse_args()
+    site = site_from_arguments(args)
+    runs = []
+    for index in range(args.repeat):
+        runs.append(run(site, args))
+        print('run {}: {}'.format(index + 1, json.dumps(runs[-1], sort_keys=True)))
+    summary = summarize(runs)
+    report = {
+        'commit': get_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'site': site.options(),
+        'crawler': {'mode': args.mode, 'max_pages': args.max_pages, 'max_workers': args.max_workers,
+                    'parse_workers': args.parse_workers, 'strict': args.strict, 'dedup': args.dedup,
+                    'priority': args.priority, 'prefer': args.prefer, 'deny_paths': args.deny_paths,
+                    'max_depth': args.max_depth},
+        'runs': runs,
+        'summary': summary,
+    }
+    print('median: {}'.format(json.dumps(summary, sort_keys=True)))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+    if args.baseline:
+        compare(summary, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark comparing the cost of enqueuing and dequeuing synthetic URLs with the
+list-based queue the Spider used to have and with the Frontier.
+
+Run it from the main project folder with:
+
+    python3 -m benchmarks.bench_frontier -n 1000000
+
+The list-based queue is quadratic, so it is measured only up to --legacy-limit URLs.
+"""
+import argparse
+import time
+
+from src.sync.frontier import Frontier
+
+
+def generate_links(count, duplicate_every=10):
+    """
+    Generates the links discovered while crawling a synthetic website: every page links to
+    the next one, and every duplicate_every pages a link to an already discovered page (with
+    a fragment) is found as well.
+
+    :param count: the number of distinct pages of the website
+    :param duplicate_every: how often an already discovered page is linked again
+    :return: a list of URLs
+    """
+    links = []
+    for i in range(count):
+        links.append('http://www.sample.com/page/{}'.format(i))
+        if i and i % duplicate_every == 0:
+            links.append('http://www.sample.com/page/{}#top'.format(i // 2))
+    return links
+
+
+def run_legacy(links):
+    """
+    Enqueues and dequeues the links as the Spider used to do: a list consumed with pop(0) and a
+    list of visited pages checked with the in operator.
+
+    :param links: the links to enqueue
+    :return: the elapsed time in seconds
+    """
+    start_time = time.perf_counter()
+    pages_to_visit = list(links)
+    already_visited = []
+    while pages_to_visit:
+        current_url = pages_to_visit.pop(0)
+        if current_url not in already_visited:
+            already_visited.append(current_url)
+    return time.perf_counter() - start_time
+
+
+def run_frontier(links):
+    """
+    Enqueues and dequeues the links using the Frontier.
+
+    :param links: the links to enqueue
+    :return: the elapsed time in seconds
+    """
+    start_time = time.perf_counter()
+    frontier = Frontier()
+    for link in links:
+        frontier.add(link)
+    while frontier:
+        frontier.pop()
+    return time.perf_counter() - start_time
+
+
+def main():
+    """
+    Runs the benchmark for increasing numbers of URLs and prints the cost per URL.
+    """
+    parser = argparse.ArgumentParser(description='Frontier micro-benchmark')
+    parser.add_argument('-n', dest='count', type=int, default=1000000, help='the largest number of URLs')
+    parser.add_argument('--legacy-limit', dest='legacy_limit', type=int, default=20000,
+                        help='the largest number of URLs measured with the list-based queue')
+    args = parser.parse_args()
+    sizes = []
+    size = 1000
+    while size < args.count:
+        sizes.append(size)
+        size *= 10
+    sizes.append(args.count)
+    print('{:>10} {:>18} {:>18}'.format('URLs', 'list (us/URL)', 'Frontier (us/URL)'))
+    for size in sizes:
+        links = generate_links(size)
+        legacy = run_legacy(links) * 1e6 / len(links) if size <= args.legacy_limit else None
+        frontier = run_frontier(links) * 1e6 / len(links)
+        print('{:>10} {:>18} {:>18.2f}'.format(size, '{:.2f}'.format(legacy) if legacy is not None else 'skipped',
+                                               frontier))
+
+
+if __name__ == '__main__':
+    main()
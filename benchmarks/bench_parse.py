@@ -0,0 +1,71 @@
+"""
+Benchmark measuring the throughput of the link extraction for an increasing number of
+parse worker processes. The pages in tests/static are replicated up to the requested
+number of pages and sent to the workers as bytes, as the ParsePipeline does.
+
+Run it from the main project folder with:
+
+    python3 -m benchmarks.bench_parse -n 2000 -w 1 2 4
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.sync.url_parser import extract_valid_links
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tests', 'static')
+
+BASE_URLS = {'google.html': 'https://www.google.it/', 'sample.html': 'https://www.sample.com/'}
+
+
+def load_pages(count):
+    """
+    Loads the HTML pages in tests/static and replicates them up to the given number of pages.
+
+    :param count: the number of pages
+    :return: a list of tuples (page, base_url)
+    """
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(STATIC_FOLDER, '*.html'))):
+        with open(path, 'rb') as infile:
+            fixtures.append((infile.read(), BASE_URLS.get(os.path.basename(path), 'http://www.sample.com/')))
+    return [fixtures[i % len(fixtures)] for i in range(count)]
+
+
+def run(pages, workers):
+    """
+    Extracts the links of the given pages.
+
+    :param pages: a list of tuples (page, base_url)
+    :param workers: the number of worker processes, 0 to extract the links in the current process
+    :return: the tuple (elapsed_seconds, extracted_links)
+    """
+    start_time = time.perf_counter()
+    if workers == 0:
+        links = [extract_valid_links(page, base_url) for page, base_url in pages]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            links = list(executor.map(extract_valid_links, *zip(*pages), chunksize=8))
+    return time.perf_counter() - start_time, sum(len(page_links) for page_links in links)
+
+
+def main():
+    """
+    Runs the benchmark and prints the throughput for each number of workers.
+    """
+    parser = argparse.ArgumentParser(description='Link extraction benchmark')
+    parser.add_argument('-n', dest='count', type=int, default=2000, help='the number of pages')
+    parser.add_argument('-w', dest='workers', type=int, nargs='+', default=[0, 1, 2, 4],
+                        help='the numbers of worker processes to measure, 0 for the current process')
+    args = parser.parse_args()
+    pages = load_pages(args.count)
+    print('{:>8} {:>12} {:>12} {:>14}'.format('workers', 'seconds', 'pages/s', 'links/s'))
+    for workers in args.workers:
+        elapsed, links = run(pages, workers)
+        print('{:>8} {:>12.2f} {:>12.0f} {:>14.0f}'.format(workers, elapsed, len(pages) / elapsed, links / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark of the visited set backends of the Frontier: memory taken per million URLs, time
+per URL and, for the Bloom filter, the fraction of new URLs wrongly reported as already added.
+
+Run it from the main project folder with:
+
+    python3 -m benchmarks.bench_visited -n 1000000
+
+Each backend is measured in a fresh process, as the growth of its peak resident set size while
+adding the URLs, which are generated on the fly so that they aren't counted. Peak RSS is read
+with getrusage, so the benchmark only runs on Unix systems.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from src.sync.visited import VISITED_SETS, BloomVisitedSet, SQLiteVisitedSet
+
+
+def generate_urls(count, prefix='http://www.sample.com/'):
+    """
+    Generates distinct URLs with realistic lengths.
+
+    :param count: the number of URLs
+    :param prefix: the part common to every URL
+    :return: an iterator over the URLs
+    """
+    for i in range(count):
+        yield '{}category/{}/product/{}?page={}'.format(prefix, i % 97, i, i % 13)
+
+
+def peak_rss():
+    """
+    :return: the peak resident set size of the current process in bytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def measure(backend, count, error_rate, results):
+    """
+    Adds the URLs to a new visited set and reports the measures through a queue.
+
+    :param backend: the name of the backend, one of the keys of VISITED_SETS
+    :param count: the number of URLs
+    :param error_rate: the error rate of the Bloom filter
+    :param results: a multiprocessing queue receiving the measures
+    """
+    if backend == 'bloom':
+        visited = BloomVisitedSet(error_rate=error_rate)
+    else:
+        visited = VISITED_SETS[backend]()
+    rss_before = peak_rss()
+    start_time = time.perf_counter()
+    false_positives = 0
+    for url in generate_urls(count):
+        if not visited.add(url):
+            false_positives += 1
+    elapsed_time = time.perf_counter() - start_time
+    rss_growth = peak_rss() - rss_before
+    disk_size = os.path.getsize(visited.path) if isinstance(visited, SQLiteVisitedSet) else 0
+    visited.close()
+    results.put({'rss_growth': rss_growth, 'disk_size': disk_size, 'elapsed_time': elapsed_time,
+                 'false_positives': false_positives})
+
+
+def main():
+    """
+    Runs the benchmark for every backend and prints the measures scaled to one million URLs.
+    """
+    parser = argparse.ArgumentParser(description='Visited set backends benchmark')
+    parser.add_argument('-n', dest='count', type=int, default=1000000, help='the number of URLs')
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.001,
+                        help='the error rate of the Bloom filter')
+    args = parser.parse_args()
+    scale = 1000000.0 / args.count
+    print('{:>8} {:>16} {:>16} {:>12} {:>16}'.format('backend', 'RAM (MB/M URLs)', 'disk (MB/M URLs)',
+                                                     'us/URL', 'false positives'))
+    for backend in sorted(VISITED_SETS):
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure, args=(backend, args.count, args.error_rate, results))
+        process.start()
+        measures = results.get()
+        process.join()
+        print('{:>8} {:>16.1f} {:>16.1f} {:>12.2f} {:>16}'.format(
+            backend, measures['rss_growth'] * scale / 2 ** 20, measures['disk_size'] * scale / 2 ** 20,
+            measures['elapsed_time'] * 1e6 / args.count,
+            '{} ({:.4%})'.format(measures['false_positives'], measures['false_positives'] / args.count)))
+
+
+if __name__ == '__main__':
+    main()
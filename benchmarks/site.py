@@ -0,0 +1,350 @@
+"""
+Synthetic website served by a local HTTP server, used by the crawl benchmark.
+
+The site is generated deterministically from a seed, so that two runs with the same options
+crawl exactly the same graph. It can also be served on its own, e.g. to crawl it with
+sync_crawler.py by hand:
+
+    python3 -m benchmarks.site --pages 1000 --port 8000
+"""
+import argparse
+import http.server
+import json
+import multiprocessing
+import random
+import socketserver
+import threading
+import time
+
+STATS_PATH = '/__stats__'
+
+ASSET_EXTENSIONS = ('css', 'js', 'png', 'jpg')
+
+ASSET_TYPES = {
+    'css': 'text/css',
+    'js': 'application/javascript',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+}
+
+
+class SiteGenerator:
+    """
+    Generates the pages of a synthetic website. Page i always links to page i + 1, so that every
+    page is reachable from the first one, and to fan_out - 1 other random pages. Links to pages can
+    go through a redirect, and pages can fail with an internal server error. Links to pages can
+    also carry a session id in their query string, which doesn't change the page served. Pages can
+    also link to a crawler trap: an endless calendar whose pages each link to fan_out further
+    calendar pages and to nothing else.
+    """
+
+    def __init__(self, pages=1000, fan_out=10, assets_per_page=5, asset_reuse=0.8, redirect_ratio=0.05,
+                 error_rate=0.01, latency=0.0, variant_ratio=0.0, trap_ratio=0.0, seed=0):
+        """
+        Constructor.
+
+        :param pages: the number of pages of the website
+        :param fan_out: the number of links to other pages in each page
+        :param assets_per_page: the number of static assets linked by each page
+        :param asset_reuse: the fraction of the assets shared with other pages, the remaining
+        ones are linked by a single page
+        :param redirect_ratio: the fraction of the links to pages going through a redirect
+        :param error_rate: the fraction of the pages answering with an internal server error
+        :param latency: the number of seconds the server waits before answering each request
+        :param variant_ratio: the fraction of the links to pages with a session id in their query string
+        :param trap_ratio: the fraction of the pages linking to a calendar trap
+        :param seed: the seed of the random generator
+        """
+        if pages < 1:
+            raise ValueError('The website must have at least one page.')
+        self.pages = pages
+        self.fan_out = fan_out
+        self.assets_per_page = assets_per_page
+        self.asset_reuse = asset_reuse
+        self.redirect_ratio = redirect_ratio
+        self.error_rate = error_rate
+        self.latency = latency
+        self.variant_ratio = variant_ratio
+        self.trap_ratio = trap_ratio
+        self.seed = seed
+        # The pool of shared assets grows with the size of the website
+        self.shared_assets = max(1, pages // 10)
+        rng = random.Random(seed)
+        # The first page never fails, otherwise there would be nothing to crawl
+        self.error_pages = {page for page in range(1, pages) if rng.random() < error_rate}
+
+    def options(self):
+        """
+        Returns the options the website has been generated with.
+
+        :return: a dictionary of options
+        """
+        return {'pages': self.pages, 'fan_out': self.fan_out, 'assets_per_page': self.assets_per_page,
+                'asset_reuse': self.asset_reuse, 'redirect_ratio': self.redirect_ratio,
+                'error_rate': self.error_rate, 'latency': self.latency, 'variant_ratio': self.variant_ratio,
+                'trap_ratio': self.trap_ratio, 'seed': self.seed}
+
+    def page_links(self, page):
+        """
+        Returns the paths linked by a page.
+
+        :param page: the index of the page
+        :return: the tuple (page_paths, asset_paths)
+        """
+        rng = random.Random('{}-{}'.format(self.seed, page))
+        targets = [(page + 1) % self.pages] + [rng.randrange(self.pages) for _ in range(self.fan_out - 1)]
+        page_paths = ['/redirect/{}'.format(target) if rng.random() < self.redirect_ratio
+                      else '/page/{}'.format(target) for target in targets]
+        if self.variant_ratio:
+            page_paths = [path + '?sid={}'.format(rng.randrange(1000000)) if rng.random() < self.variant_ratio
+                          else path for path in page_paths]
+        if self.trap_ratio and rng.random() < self.trap_ratio:
+            # The trap comes first, so that a crawler visiting pages in order falls into it early
+            page_paths.insert(0, '/calendar/{}/0'.format(page))
+        asset_paths = []
+        for index in range(self.assets_per_page):
+            extension = ASSET_EXTENSIONS[index % len(ASSET_EXTENSIONS)]
+            if rng.random() < self.asset_reuse:
+                asset_paths.append('/static/shared-{}.{}'.format(rng.randrange(self.shared_assets), extension))
+            else:
+                asset_paths.append('/static/page-{}-{}.{}'.format(page, index, extension))
+        return page_paths, asset_paths
+
+    def render_page(self, page):
+        """
+        Renders the HTML of a page.
+
+        :param page: the index of the page
+        :return: the page as bytes
+        """
+        page_paths, asset_paths = self.page_links(page)
+        lines = ['<html><head><title>Page {}</title>'.format(page)]
+        for path in asset_paths:
+            if path.endswith('.css'):
+                lines.append('<link rel="stylesheet" href="{}">'.format(path))
+            elif path.endswith('.js'):
+                lines.append('<script src="{}"></script>'.format(path))
+        lines.append('</head><body>')
+        for path in asset_paths:
+            if path.endswith(('.png', '.jpg')):
+                lines.append('<img src="{}">'.format(path))
+        for path in page_paths:
+            lines.append('<p><a href="{}">{}</a></p>'.format(path, path))
+        lines.append('</body></html>')
+        return '\n'.join(lines).encode('utf-8')
+
+    def render_calendar(self, page, day):
+        """
+        Renders a page of the calendar trap of a page.
+
+        :param page: the index of the page linking to the calendar
+        :param day: the index of the calendar page, its links go to days day * fan_out + 1 to
+        day * fan_out + fan_out
+        :return: the calendar page as bytes
+        """
+        lines = ['<html><head><title>Calendar {} day {}</title></head><body>'.format(page, day)]
+        for index in range(1, self.fan_out + 1):
+            lines.append('<p><a href="/calendar/{0}/{1}">Day {1}</a></p>'.format(page, day * self.fan_out + index))
+        lines.append('</body></html>')
+        return '\n'.join(lines).encode('utf-8')
+
+    def respond(self, path):
+        """
+        Returns the response to a request.
+
+        :param path: the requested path
+        :return: the tuple (status_code, headers, body)
+        """
+        # The query string is ignored, like the session ids of real websites
+        parts = path.split('?', 1)[0].split('/')
+        if len(parts) == 3 and parts[1] in ('page', 'redirect') and parts[2].isdigit() \
+                and int(parts[2]) < self.pages:
+            page = int(parts[2])
+            if parts[1] == 'redirect':
+                return 301, {'Location': '/page/{}'.format(page)}, b''
+            if page in self.error_pages:
+                return 500, {'Content-Type': 'text/html'}, b'Internal server error'
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, self.render_page(page)
+        if len(parts) == 4 and parts[1] == 'calendar' and parts[2].isdigit() and parts[3].isdigit():
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, self.render_calendar(int(parts[2]),
+                                                                                           int(parts[3]))
+        if len(parts) == 3 and parts[1] == 'static':
+            extension = parts[2].rsplit('.', 1)[-1]
+            if extension in ASSET_TYPES:
+                return 200, {'Content-Type': ASSET_TYPES[extension]}, b'\0' * 64
+        return 404, {'Content-Type': 'text/html'}, b'Not found'
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class SiteServer:
+    """
+    Serves a SiteGenerator over HTTP/1.1 with keep-alive, counting the requests and connections.
+    The counters are returned as JSON at STATS_PATH, which isn't counted itself.
+    """
+
+    def __init__(self, generator, host='127.0.0.1', port=0):
+        """
+        Constructor. Binds the server, without starting it.
+
+        :param generator: the SiteGenerator of the website
+        :param host: the address the server listens on
+        :param port: the port the server listens on, 0 to pick a free one
+        """
+        self.generator = generator
+        self.stats = {'GET': 0, 'HEAD': 0, 'connections': 0}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Buffers each response, so that headers and body are sent together instead of in two
+            # segments, which would make the server wait for delayed acknowledgements
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                server._count('connections')
+
+            def _handle(self):
+                if self.path == STATS_PATH:
+                    with server._lock:
+                        status_code, headers, body = 200, {'Content-Type': 'application/json'}, \
+                            json.dumps(server.stats).encode('utf-8')
+                else:
+                    server._count(self.command)
+                    if server.generator.latency:
+                        time.sleep(server.generator.latency)
+                    status_code, headers, body = server.generator.respond(self.path)
+                self.send_response(status_code)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = _handle
+            do_HEAD = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self.url = 'http://{}:{}'.format(host, self._server.server_address[1])
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def serve_forever(self):
+        """
+        Serves the website until shutdown is called.
+        """
+        self._server.serve_forever(poll_interval=0.05)
+
+    def shutdown(self):
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _serve(options, ready):
+    server = SiteServer(SiteGenerator(**options))
+    ready.put(server.url)
+    server.serve_forever()
+
+
+class SiteProcess:
+    """
+    Runs a SiteServer in a separate process, so that it doesn't share the CPU time and the
+    memory of the benchmarked crawler.
+    """
+
+    def __init__(self, generator):
+        """
+        Constructor. Starts the server process and waits until it is listening.
+
+        :param generator: the SiteGenerator of the website
+        """
+        ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(generator.options(), ready), daemon=True)
+        self._process.start()
+        self.url = ready.get(timeout=30)
+
+    def close(self):
+        """
+        Stops the server process.
+        """
+        self._process.terminate()
+        self._process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def add_site_arguments(parser):
+    """
+    Adds the options of the synthetic website to a command line parser.
+
+    :param parser: an argparse.ArgumentParser
+    """
+    parser.add_argument('--pages', dest='pages', type=int, default=1000, help='the number of pages of the website')
+    parser.add_argument('--fan-out', dest='fan_out', type=int, default=10,
+                        help='the number of links to other pages in each page')
+    parser.add_argument('--assets', dest='assets_per_page', type=int, default=5,
+                        help='the number of static assets linked by each page')
+    parser.add_argument('--asset-reuse', dest='asset_reuse', type=float, default=0.8,
+                        help='the fraction of the assets shared with other pages')
+    parser.add_argument('--redirect-ratio', dest='redirect_ratio', type=float, default=0.05,
+                        help='the fraction of the links to pages going through a redirect')
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.01,
+                        help='the fraction of the pages answering with an internal server error')
+    parser.add_argument('--latency', dest='latency', type=float, default=0.0,
+                        help='the number of seconds the server waits before answering each request')
+    parser.add_argument('--variant-ratio', dest='variant_ratio', type=float, default=0.0,
+                        help='the fraction of the links to pages with a session id in their query string')
+    parser.add_argument('--trap-ratio', dest='trap_ratio', type=float, default=0.0,
+                        help='the fraction of the pages linking to an endless calendar trap')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='the seed of the random generator')
+
+
+def site_from_arguments(args):
+    """
+    Creates the SiteGenerator described by the parsed command line arguments.
+
+    :param args: the namespace returned by the parser given to add_site_arguments
+    :return: a SiteGenerator
+    """
+    return SiteGenerator(pages=args.pages, fan_out=args.fan_out, assets_per_page=args.assets_per_page,
+                         asset_reuse=args.asset_reuse, redirect_ratio=args.redirect_ratio,
+                         error_rate=args.error_rate, latency=args.latency, variant_ratio=args.variant_ratio,
+                         trap_ratio=args.trap_ratio, seed=args.seed)
+
+
+def main():
+    """
+    Serves a synthetic website until interrupted.
+    """
+    parser = argparse.ArgumentParser(description='Synthetic website for the crawl benchmark')
+    add_site_arguments(parser)
+    parser.add_argument('--port', dest='port', type=int, default=8000, help='the port the server listens on')
+    args = parser.parse_args()
+    server = SiteServer(site_from_arguments(args), port=args.port)
+    print('Serving {} pages at {}/page/0'.format(args.pages, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
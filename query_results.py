@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+
+from src.sync.result_store import ResultStore
+from src.sync.writers import WRITERS
+
+
+def main():
+    """
+    Main function of the program. Provides command line facilities to query the results of a crawl
+    saved by sync_crawler.py --store, or to export them in one of the output formats of the crawler.
+    """
+    # Acquires input arguments from the user
+    parser = argparse.ArgumentParser(description='Queries the results of a crawl saved with --store')
+    parser.add_argument('store', help='the path of the SQLite database written by sync_crawler.py --store')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--pages-using', dest='pages_using', type=str,
+                       help='lists the pages using the given static asset')
+    group.add_argument('--assets-of', dest='assets_of', type=str,
+                       help='lists the static assets of the given page')
+    group.add_argument('--page', dest='page', type=str,
+                       help='shows the status code, final URL and timings of the given page')
+    group.add_argument('--status', dest='status', type=str,
+                       help='lists the pages with the given status code, "none" for the failed requests')
+    group.add_argument('--stats', dest='stats', action='store_true', default=False,
+                       help='shows the number of pages, assets and pages by status code')
+    group.add_argument('--export', dest='export', action='store_true', default=False,
+                       help='writes the results in the format returned by the crawler')
+    parser.add_argument('-f', dest='output_format', choices=sorted(WRITERS), default='json',
+                        help='the format of the exported results')
+    args = parser.parse_args()
+    if not os.path.exists(args.store):
+        parser.error('{} does not exist'.format(args.store))
+    store = ResultStore(args.store)
+    try:
+        if args.pages_using:
+            print('\n'.join(store.pages_using(args.pages_using)))
+        elif args.assets_of:
+            assets = store.assets_of(args.assets_of)
+            if assets is None:
+                sys.exit('{} is not in the store'.format(args.assets_of))
+            print('\n'.join(assets))
+        elif args.page:
+            page = store.get_page(args.page)
+            if page is None:
+                sys.exit('{} is not in the store'.format(args.page))
+            print(json.dumps(page, indent=2))
+        elif args.status:
+            print('\n'.join(store.pages_with_status(None if args.status == 'none' else int(args.status))))
+        elif args.stats:
+            print(json.dumps(store.stats(), indent=2))
+        else:
+            writer = WRITERS[args.output_format]([sys.stdout])
+            for result in store.iter_results():
+                writer.write(result)
+            writer.close()
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    """
+    Main entry point of the program. Simply calls the main function.
+    """
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+
+from src.asynchronous.url_parser import AsyncURLParser
+from src.sync.frontier import canonicalize_url
+from src.sync.transport import DEFAULT_TIMEOUT
+
+
+class AsyncSpider:
+    """
+    The AsyncSpider class implements the same crawling functionality of the Spider, but
+    fetches and parses several pages at the same time. Pages are committed in the same
+    order the synchronous Spider would visit them, so that the results are identical to the ones
+    of a strict Spider without retries, compression nor limit on the size of the pages. With its
+    defaults, the Spider may return different results: it classifies most links without a HEAD
+    request, retries the requests failing for a transient reason and abandons the largest pages.
+    """
+
+    def __init__(self, enable_logging=True, max_concurrency=10, max_concurrency_per_host=5, timeout=DEFAULT_TIMEOUT):
+        """
+        Constructor. Gets an instance of the AsyncURLParser object in order to perform
+        the analysis on the links.
+
+        :param enable_logging: a flag being True if logs should be displayed during the
+        crawling, False otherwise.
+        :param max_concurrency: the maximum number of HTTP requests in flight at the same time
+        :param max_concurrency_per_host: the maximum number of HTTP requests in flight at the
+        same time towards the same host
+        :param timeout: the number of seconds each request waits for the server before giving up
+        """
+        self.enable_logging = enable_logging
+        self.max_concurrency = max_concurrency
+        self.url_parser = AsyncURLParser(enable_logging=enable_logging,
+                                         max_concurrency=max_concurrency,
+                                         max_concurrency_per_host=max_concurrency_per_host, timeout=timeout)
+
+    async def crawl_async(self, start_url, max_pages):
+        """
+        Coroutine implementing the crawling functionality. Pages are scheduled in the order
+        in which they are discovered, and up to a window of pages ahead of the next one to
+        commit are parsed concurrently. Results and newly discovered links are committed in
+        discovery order.
+
+        :param start_url: the URL from which the crawling starts
+        :param max_pages: the maximum number of pages that can be visited
+        :return: a json object containing the URLs visited together with their static
+        assets.
+        """
+        self.url_parser.set_base_url(start_url)
+        # Pages in discovery order, without duplicates
+        pages_to_visit = [start_url]
+        already_scheduled = {canonicalize_url(start_url)}
+        # Tasks parsing the pages in pages_to_visit, by position
+        tasks = []
+        window = 2 * self.max_concurrency
+        results = []
+        try:
+            while len(results) < len(pages_to_visit) and len(results) < max_pages:
+                # Schedules every known page within the window and the maximum number of pages
+                last_to_schedule = min(len(pages_to_visit), max_pages, len(results) + window)
+                for current_url in pages_to_visit[len(tasks):last_to_schedule]:
+                    if self.enable_logging:
+                        logging.info('Started crawling URL: {}'.format(current_url))
+                    tasks.append(asyncio.ensure_future(self.url_parser.parse_url(current_url)))
+                current_url = pages_to_visit[len(results)]
+                static_assets, links_to_follow = await tasks[len(results)]
+                # Releases the reference to the completed task
+                tasks[len(results)] = None
+                if self.enable_logging:
+                    logging.info('Finished crawling URL: {} - Found {} static assets and {} links to follow'
+                                 .format(current_url, len(static_assets), len(links_to_follow)))
+                results.append({'url': current_url, 'assets': static_assets})
+                for link in links_to_follow:
+                    canonical_link = canonicalize_url(link)
+                    if canonical_link not in already_scheduled:
+                        already_scheduled.add(canonical_link)
+                        pages_to_visit.append(link)
+        finally:
+            pending = [task for task in tasks if task is not None and not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return json.dumps(results)
+
+    def crawl(self, start_url, max_pages):
+        """
+        Given a starting URL and a maximum number of total pages that should be visited,
+        visits every reachable page under that domain running a dedicated event loop.
+
+        :param start_url: the URL from which the crawling starts
+        :param max_pages: the maximum number of pages that can be visited
+        :return: a json object containing the URLs visited together with their static
+        assets.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.crawl_async(start_url, max_pages))
+        finally:
+            self.url_parser.close()
+            loop.close()
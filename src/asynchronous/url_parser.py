@@ -0,0 +1,185 @@
+import asyncio
+import functools
+import http.client
+import logging
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from src.sync.transport import DEFAULT_TIMEOUT, UrllibTransport
+from src.sync.url_parser import URLParser
+
+
+class AsyncURLParser(URLParser):
+    """
+    The AsyncURLParser class provides the same parsing and classification utilities of the
+    URLParser, but sends the GET and HEAD requests concurrently from an asyncio event loop.
+    The number of requests in flight is bounded both globally and per host. Unlike the default
+    URLParser of the Spider, every link is classified with a HEAD request, and pages are read
+    whole, without compression, limit of size nor retries.
+    """
+
+    def __init__(self, enable_logging=True, max_concurrency=10, max_concurrency_per_host=5, timeout=DEFAULT_TIMEOUT):
+        """
+        Constructor. Initializes the base URL as the URLParser does and sets up the
+        concurrency limits.
+
+        :param enable_logging: a flag being True if logs should be displayed, False otherwise
+        :param max_concurrency: the maximum number of requests in flight at the same time
+        :param max_concurrency_per_host: the maximum number of requests in flight at the same
+        time towards the same network location
+        :param timeout: the number of seconds each request waits for the server before giving up,
+        None to wait forever
+        """
+        super().__init__(enable_logging=enable_logging, transport=UrllibTransport(timeout=timeout))
+        if max_concurrency < 1 or max_concurrency_per_host < 1:
+            raise ValueError('Concurrency limits must be positive integers.')
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self._executor = None
+        self._semaphore = None
+        self._host_semaphores = {}
+
+    def _get_semaphores(self, url):
+        """
+        Returns the global semaphore and the semaphore related to the host of the given URL.
+        Semaphores are lazily created so that they are bound to the running event loop.
+
+        :param url: the URL that is going to be requested
+        :return: the tuple (global_semaphore, host_semaphore)
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        netloc = urllib.parse.urlsplit(url).netloc
+        if netloc not in self._host_semaphores:
+            self._host_semaphores[netloc] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._semaphore, self._host_semaphores[netloc]
+
+    async def _run_blocking(self, url, f, *args):
+        """
+        Runs the blocking function f in the thread pool of the parser, as soon as both the
+        global and the per-host concurrency limits allow it.
+
+        :param url: the URL that f is going to request
+        :param f: the blocking function
+        :param args: the positional arguments of f
+        :return: the value returned by f
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        global_semaphore, host_semaphore = self._get_semaphores(url)
+        async with global_semaphore:
+            async with host_semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(f, *args))
+
+    def _get_page_bytes(self, url):
+        """
+        Sends a GET request to the given URL and reads the page. This method is blocking.
+
+        :param url: input URL
+        :return: the content of the page
+        """
+        http_response = self._request(url, 'GET')
+        return http_response.read()
+
+    def _head(self, url):
+        """
+        Sends a HEAD request to the given URL. This method is blocking.
+
+        :param url: input URL
+        :return: the tuple (actual_url, content_type) where actual_url is the real URL
+        in case of redirect
+        """
+        response = self._request(url, 'HEAD')
+        return response.geturl(), response.info()['Content-Type']
+
+    async def _classify(self, url):
+        """
+        Sends the HEAD request for the given URL without blocking the event loop.
+
+        :param url: input URL
+        :return: the tuple (actual_url, content_type) or None if the request failed
+        """
+        try:
+            return await self._run_blocking(url, self._head, url)
+        except urllib.error.HTTPError as http_err:
+            if self.enable_logging:
+                logging.error('HTTPError returned in sending a HEAD request to {} - HTTP code {}'
+                              .format(url, http_err.code))
+            return None
+        except urllib.error.URLError as url_err:
+            # The failure may be transient: like a failed HEAD request of the URLParser, the link is skipped
+            if self.enable_logging:
+                logging.error('URLError returned in sending a HEAD request to {}: {}'.format(url, url_err.reason))
+            return None
+        except (http.client.HTTPException, OSError) as err:
+            # urlopen doesn't wrap the errors raised while reading the status line, e.g. a closed connection
+            if self.enable_logging:
+                logging.error('Error returned in sending a HEAD request to {}: {}'.format(url, err))
+            return None
+
+    async def _get_assets(self, page):
+        """
+        Given an HTML page as a string, returns its static and non-static assets. All the
+        HEAD requests are sent concurrently, while the order of the results follows the
+        order of the links in the page.
+
+        :param page: an HTML page as a string
+        :return: the tuple (static_assets, links_to_follow) where the former element represents the
+        list of static assets found while the latter is a list of non-static assets found in the page.
+        """
+        valid_linked_urls = self._get_valid_linked_urls(page)
+        classifications = await asyncio.gather(*[self._classify(valid_url) for valid_url in valid_linked_urls])
+        static_assets = []
+        links_to_follow = []
+        for classification in classifications:
+            if classification is None:
+                continue
+            actual_url, content_type = classification
+            if content_type and 'text/html' in content_type:
+                links_to_follow.append(actual_url)
+            else:
+                static_assets.append(actual_url)
+        return static_assets, links_to_follow
+
+    async def parse_url(self, url):
+        """
+        Parse the HTML content of the current URL in order to find static and non-static assets.
+
+        :param url: the URL for which the page should be fetched and static/non-static assets
+        should be determined
+        :return: the tuple (static_assets, links_to_follow) where the former element represents the
+        list of static assets found while the latter is a list of non-static assets found in the page.
+        """
+        if not self.base_url:
+            raise ValueError('Base URL not set before asking to parse the content of {}.'.format(url))
+        try:
+            page = await self._run_blocking(url, self._get_page_bytes, url)
+        except urllib.error.HTTPError as http_err:
+            if self.enable_logging:
+                logging.error('HTTPError returned in fetching the content for {} - HTTP code {}'
+                              .format(url, http_err.code))
+            return [], []
+        except urllib.error.URLError as url_err:
+            if self.enable_logging:
+                logging.error('URLError returned for {}'.format(url))
+                logging.error(url_err)
+            return [], []
+        except (http.client.HTTPException, OSError) as err:
+            # Errors of the connection while reading the body, e.g. a timeout or a truncated body
+            if self.enable_logging:
+                logging.error('The content of {} can\'t be read: {}'.format(url, err))
+            return [], []
+        else:
+            return await self._get_assets(page)
+
+    def close(self):
+        """
+        Releases the thread pool and the semaphores bound to the last event loop.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._semaphore = None
+        self._host_semaphores = {}
@@ -0,0 +1,482 @@
+"""
+This module contains the HTTPArchive, which records the HTTP exchanges of a crawl in a
+compressed append-only file, and the transports recording a crawl to an archive and replaying
+it from there, without any network access.
+
+The archive is a sequence of WARC response records, each compressed as a separate gzip member
+like in .warc.gz files, so that it can be read by WARC tools and a single record can be read
+without decompressing the ones before it. The requested URL, when different from the final URL
+of the response, and the method are kept in the X-Requested-URI and X-Request-Method extension
+fields. Requests that failed without a response are recorded as WARC metadata records with an
+X-Fetch-Error field, and responses whose body wasn't read to the end while crawling, e.g. because
+it wasn't HTML or was too large, have a WARC-Truncated field. A sidecar index file maps each
+request to the offset and length of its last record, and is rebuilt from the archive if it is
+missing or behind it.
+"""
+import http.client
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import uuid
+import zlib
+
+from src.sync.content import DEFAULT_MAX_BODY_SIZE
+from src.sync.http_cache import CachedResponse, TeeResponse
+from src.sync.transport import MAX_DRAINED_BODY_SIZE
+
+# The number of bytes read at once while scanning the archive
+CHUNK_SIZE = 64 * 1024
+
+# Hop-by-hop headers describing the encoding of the message on the wire, which the recorded body doesn't have
+UNRECORDED_HEADERS = frozenset(['transfer-encoding', 'connection', 'keep-alive'])
+
+
+def _iter_members(infile, offset):
+    """
+    Reads the gzip members of a file.
+
+    :param infile: a file opened in binary mode
+    :param offset: the offset of the first member to read
+    :return: an iterator over the tuples (offset, length, data) of the members. A truncated or
+    corrupted member ends the iteration.
+    """
+    infile.seek(offset)
+    start = position = offset
+    decompressor = zlib.decompressobj(31)
+    chunks = []
+    data = b''
+    while True:
+        if not data:
+            data = infile.read(CHUNK_SIZE)
+            if not data:
+                return
+        try:
+            chunks.append(decompressor.decompress(data))
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            position += len(data)
+            data = b''
+            continue
+        end = position + len(data) - len(decompressor.unused_data)
+        yield start, end - start, b''.join(chunks)
+        data = decompressor.unused_data
+        start = position = end
+        decompressor = zlib.decompressobj(31)
+        chunks = []
+
+
+def _parse_headers(block):
+    """
+    Parses a block of header lines.
+
+    :param block: the lines, as bytes, without the first line of the message
+    :return: a list of (name, value) tuples
+    """
+    headers = []
+    for line in block.decode('iso-8859-1').split('\r\n'):
+        name, separator, value = line.partition(':')
+        if separator:
+            headers.append((name.strip(), value.strip()))
+    return headers
+
+
+def _serialize_record(warc_type, target_uri, fields, content_type, content):
+    """
+    Serializes a WARC record.
+
+    :param warc_type: the WARC-Type of the record
+    :param target_uri: the WARC-Target-URI of the record
+    :param fields: a list of (name, value) tuples of extension fields
+    :param content_type: the Content-Type of the record block
+    :param content: the record block, as bytes
+    :return: the record as bytes
+    """
+    lines = ['WARC/1.1', 'WARC-Type: {}'.format(warc_type),
+             'WARC-Record-ID: <urn:uuid:{}>'.format(uuid.uuid4()),
+             'WARC-Date: {}'.format(time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+             'WARC-Target-URI: {}'.format(target_uri)]
+    lines.extend('{}: {}'.format(name, value) for name, value in fields)
+    lines.extend(['Content-Type: {}'.format(content_type), 'Content-Length: {}'.format(len(content))])
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + content + b'\r\n\r\n'
+
+
+def _parse_record(data):
+    """
+    Parses a WARC record written by the HTTPArchive.
+
+    :param data: the decompressed record
+    :return: the tuple (method, url, entry), where entry is a dictionary with the keys 'url',
+    'status', 'reason', 'headers' and 'body' of the response, and 'truncated' if its body wasn't
+    recorded entirely, or 'url' and 'error' if the request failed without one
+    :raise ValueError: if the record isn't valid
+    """
+    header_block, separator, rest = data.partition(b'\r\n\r\n')
+    if not separator or not header_block.startswith(b'WARC/'):
+        raise ValueError('Not a WARC record.')
+    fields = dict(_parse_headers(header_block.split(b'\r\n', 1)[1] if b'\r\n' in header_block else b''))
+    content = rest[:int(fields.get('Content-Length', len(rest)))]
+    final_url = fields['WARC-Target-URI']
+    url = fields.get('X-Requested-URI', final_url)
+    method = fields.get('X-Request-Method', 'GET')
+    if 'X-Fetch-Error' in fields:
+        return method, url, {'url': final_url, 'error': fields['X-Fetch-Error']}
+    head, _, body = content.partition(b'\r\n\r\n')
+    status_line, _, header_lines = head.partition(b'\r\n')
+    _, status, reason = (status_line.decode('iso-8859-1').split(' ', 2) + [''])[:3]
+    entry = {'url': final_url, 'status': int(status), 'reason': reason, 'headers': _parse_headers(header_lines),
+             'body': body}
+    if 'WARC-Truncated' in fields:
+        entry['truncated'] = True
+    return method, url, entry
+
+
+class HTTPArchive:
+    """
+    The HTTPArchive class stores HTTP responses in a compressed append-only file of WARC records,
+    one gzip member per record. An index of the records, kept in memory and appended to a sidecar
+    file, finds the record of a request with a single seek. A request recorded again, e.g. after
+    a retry, is answered by its last record. The archive is thread safe.
+    """
+
+    def __init__(self, path, mode='r'):
+        """
+        Constructor. Opens the archive and loads its index.
+
+        :param path: the path of the archive, e.g. crawl.warc.gz. The index is kept next to it,
+        with the .idx suffix.
+        :param mode: 'r' to read the archive, 'a' to append records to it, creating it if needed
+        """
+        if mode not in ('r', 'a'):
+            raise ValueError('The mode of the archive must be r or a.')
+        self.path = path
+        self.index_path = path + '.idx'
+        self.mode = mode
+        self._index = {}
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b' if mode == 'a' else 'rb')
+        self._size = self._file.seek(0, os.SEEK_END)
+        self._index_file = None
+        indexed_size = self._load_index()
+        rebuilt = indexed_size is None
+        if rebuilt:
+            self._index = {}
+            indexed_size = 0
+        # Records written after the last line of the index, e.g. by a crawl that was killed, are indexed now
+        new_entries = []
+        end = indexed_size
+        for offset, length, data in _iter_members(self._file, indexed_size):
+            try:
+                method, url, _ = _parse_record(data)
+            except (ValueError, KeyError):
+                break
+            new_entries.append((method, url, offset, length))
+            end = offset + length
+        for method, url, offset, length in new_entries:
+            self._index[(method, url)] = (offset, length)
+        if mode == 'a':
+            if end < self._size:
+                # Drops a record left incomplete, so that the next ones can be read back
+                self._file.truncate(end)
+                self._size = end
+            self._index_file = open(self.index_path, 'w' if rebuilt else 'a')
+            if rebuilt:
+                for (method, url), (offset, length) in sorted(self._index.items(), key=lambda item: item[1]):
+                    self._write_index_line(method, url, offset, length)
+            else:
+                for entry in new_entries:
+                    self._write_index_line(*entry)
+            self._index_file.flush()
+
+    def _load_index(self):
+        """
+        Loads the index file, if it matches the archive.
+
+        :return: the offset of the end of the last indexed record, or None if the index is
+        missing or doesn't match the archive and has to be rebuilt
+        """
+        try:
+            with open(self.index_path) as infile:
+                lines = infile.read().split('\n')
+        except OSError:
+            return None
+        if lines[-1]:
+            # The crawl was killed while writing the last line, which can't be appended to
+            return None
+        end = 0
+        for line in lines[:-1]:
+            try:
+                method, url, offset, length = json.loads(line)
+            except ValueError:
+                return None
+            if offset + length > self._size:
+                return None
+            self._index[(method, url)] = (offset, length)
+            end = max(end, offset + length)
+        return end
+
+    def _write_index_line(self, method, url, offset, length):
+        self._index_file.write(json.dumps([method, url, offset, length]) + '\n')
+
+    def _read(self, offset, length):
+        """
+        Reads and parses a record.
+
+        :param offset: the offset of the record in the archive
+        :param length: the compressed length of the record
+        :return: the tuple (method, url, entry) returned by _parse_record
+        """
+        with self._lock:
+            self._file.seek(offset)
+            data = self._file.read(length)
+        return _parse_record(zlib.decompress(data, 31))
+
+    def get(self, method, url):
+        """
+        Returns the last response recorded for the given request.
+
+        :param method: HTTP method
+        :param url: the requested URL
+        :return: a dictionary with the keys 'url', 'status', 'reason', 'headers' and 'body', and
+        'truncated' if the body wasn't recorded entirely, or 'url' and 'error' if the request failed
+        without a response, or None if nothing is recorded
+        """
+        location = self._index.get((method, url))
+        if location is None:
+            return None
+        return self._read(*location)[2]
+
+    def put(self, method, url, entry):
+        """
+        Appends a record for the given request.
+
+        :param method: HTTP method
+        :param url: the requested URL
+        :param entry: a dictionary like the ones returned by get, with a 'truncated' key being True
+        if the body wasn't recorded entirely
+        """
+        if self.mode != 'a':
+            raise ValueError('The archive is open for reading.')
+        final_url = entry.get('url') or url
+        fields = [('X-Request-Method', method)]
+        if final_url != url:
+            fields.append(('X-Requested-URI', url))
+        if entry.get('truncated'):
+            fields.append(('WARC-Truncated', 'length'))
+        if 'error' in entry:
+            fields.append(('X-Fetch-Error', ' '.join(str(entry['error']).split())))
+            record = _serialize_record('metadata', final_url, fields, 'text/plain', b'')
+        else:
+            lines = ['HTTP/1.1 {} {}'.format(entry['status'], entry.get('reason') or '')]
+            lines.extend('{}: {}'.format(name, value) for name, value in entry['headers']
+                         if name.lower() not in UNRECORDED_HEADERS)
+            message = ('\r\n'.join(lines) + '\r\n\r\n').encode('iso-8859-1', errors='replace') + entry['body']
+            record = _serialize_record('response', final_url, fields, 'application/http;msgtype=response', message)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        data = compressor.compress(record) + compressor.flush()
+        with self._lock:
+            offset = self._size
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self._index[(method, url)] = (offset, len(data))
+            self._write_index_line(method, url, offset, len(data))
+            self._index_file.flush()
+
+    def iter_records(self):
+        """
+        Reads every record of the archive, in the order they have been written, e.g. to run the
+        extraction again over the recorded pages.
+
+        :return: an iterator over the tuples (method, url, entry), with entry like the ones
+        returned by get
+        """
+        for offset, length in sorted(set(self._index.values())):
+            yield self._read(offset, length)
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        """
+        Closes the archive and its index.
+        """
+        with self._lock:
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
+            self._file.close()
+
+
+class RecordingTransport:
+    """
+    The RecordingTransport class wraps another transport and records every response it returns,
+    error responses and failed requests included, to an HTTPArchive. Bodies are recorded as they
+    were received, still compressed if the server compressed them, and as far as the caller reads
+    them: a response is recorded once its body has been read to the end or the response closed.
+    """
+
+    def __init__(self, transport, archive, max_body_size=DEFAULT_MAX_BODY_SIZE):
+        """
+        Constructor.
+
+        :param transport: the transport sending the requests
+        :param archive: the HTTPArchive, opened in append mode
+        :param max_body_size: the maximum number of bytes of a recorded body, as received. Longer
+        bodies are recorded truncated. None for no limit.
+        """
+        self.transport = transport
+        self.archive = archive
+        self.max_body_size = max_body_size
+        self.records = 0
+        self._lock = threading.Lock()
+
+    def _put(self, method, url, entry):
+        self.archive.put(method, url, entry)
+        with self._lock:
+            self.records += 1
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Given an URL and a method, sends the related HTTP request through the wrapped transport
+        and records the response.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :param timeout: an optional timeout in seconds for the blocking operations
+        :return: the related HTTP response
+        """
+        try:
+            response = self.transport.send(url, method, headers=headers, timeout=timeout)
+        except urllib.error.HTTPError as http_err:
+            try:
+                body = http_err.read(MAX_DRAINED_BODY_SIZE) if http_err.fp is not None else b''
+            except (http.client.HTTPException, OSError) as err:
+                self._put(method, url, {'url': url, 'error': err})
+                raise urllib.error.URLError(err)
+            headers = list(http_err.headers.items()) if http_err.headers is not None else []
+            self._put(method, url, {'url': http_err.geturl() or url, 'status': http_err.code,
+                                    'reason': http_err.reason, 'headers': headers, 'body': body})
+            raise urllib.error.HTTPError(http_err.geturl(), http_err.code, http_err.reason, http_err.headers,
+                                         io.BytesIO(body))
+        except urllib.error.URLError as url_err:
+            self._put(method, url, {'url': url, 'error': url_err.reason})
+            raise
+        entry = {'url': response.geturl(), 'status': response.getcode() or 200,
+                 'reason': getattr(response, 'reason', 'OK'), 'headers': list(response.info().items()), 'body': b''}
+        if method == 'HEAD':
+            response.close()
+            self._put(method, url, entry)
+            return CachedResponse(entry)
+
+        def record(body, complete, error):
+            if error is not None:
+                # The connection failed while the body was read: the request is replayed as failed
+                reason = error.reason if isinstance(error, urllib.error.URLError) else error
+                self._put(method, url, {'url': url, 'error': reason})
+            else:
+                self._put(method, url, dict(entry, body=body, truncated=not complete))
+        return TeeResponse(response, record, max_size=self.max_body_size)
+
+    def stats(self):
+        """
+        Returns the statistics of the wrapped transport together with the number of records written.
+
+        :return: a dictionary with the counters
+        """
+        stats = dict(self.transport.stats())
+        stats['archive_records'] = self.records
+        return stats
+
+    def close(self):
+        """
+        Closes the wrapped transport and the archive.
+        """
+        self.transport.close()
+        self.archive.close()
+
+
+class TruncatedResponse(CachedResponse):
+    """
+    The TruncatedResponse class exposes a recorded response whose body wasn't recorded entirely:
+    reading past the recorded part fails like a lost connection.
+    """
+
+    def read(self, amt=None):
+        data = super().read(amt)
+        if amt is None or not data:
+            raise urllib.error.URLError('the body of {} wasn\'t recorded entirely'.format(self.url))
+        return data
+
+
+class ReplayTransport:
+    """
+    The ReplayTransport class answers every request from an HTTPArchive, without any network
+    access: a crawl replayed from the archive of a recorded crawl visits the same pages, at disk
+    speed. Requests that weren't recorded fail like unreachable URLs.
+    """
+
+    # Nothing is sent over the network, so nothing needs to be paced
+    offline = True
+
+    def __init__(self, archive):
+        """
+        Constructor.
+
+        :param archive: the HTTPArchive
+        """
+        self.archive = archive
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Given an URL and a method, returns the response recorded for the related HTTP request.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: ignored, the recorded response is returned whatever the request headers
+        :param timeout: ignored
+        :return: the recorded HTTP response
+        """
+        entry = self.archive.get(method, url)
+        if entry is None and method == 'HEAD':
+            # The headers of a recorded GET response answer a HEAD request as well
+            entry = self.archive.get('GET', url)
+            if entry is not None and 'error' not in entry:
+                entry = dict(entry, body=b'', truncated=False)
+        if entry is None:
+            self._count('misses')
+            raise urllib.error.URLError('{} {} is not in the archive'.format(method, url))
+        self._count('hits')
+        if 'error' in entry:
+            raise urllib.error.URLError(entry['error'])
+        response = TruncatedResponse(entry) if entry.get('truncated') else CachedResponse(entry)
+        if not 200 <= entry['status'] < 300:
+            raise urllib.error.HTTPError(entry['url'], entry['status'], entry['reason'], response.headers,
+                                         io.BytesIO(entry['body']))
+        return response
+
+    def stats(self):
+        """
+        Returns the usage statistics of the transport.
+
+        :return: a dictionary with the number of requests answered from the archive and of the
+        ones that weren't recorded
+        """
+        return {'replay_hits': self.hits, 'replay_misses': self.misses}
+
+    def close(self):
+        """
+        Closes the archive.
+        """
+        self.archive.close()
@@ -0,0 +1,130 @@
+import json
+import os
+import pickle
+import time
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint:
+    """
+    The Checkpoint class periodically saves the state of a crawl, so that it can be resumed
+    after a crash without fetching again the pages already visited. The state (frontier,
+    number of visited pages and URL classifications) is pickled to a temporary file which then
+    atomically replaces the checkpoint, while the results are appended to a newline delimited
+    json log next to it. The checkpoint records the size of the log, so that results written
+    after the last checkpoint are discarded on resume. As the whole state is saved every time,
+    whose size grows with the crawl, checkpoints are spaced in time rather than in pages.
+    """
+
+    def __init__(self, path, interval=None, seconds=60.0, clock=time.monotonic):
+        """
+        Constructor.
+
+        :param path: the full path of the checkpoint file. Results are logged to path + '.results'
+        :param interval: if given, the maximum number of visited pages between two checkpoints
+        :param seconds: if given, the number of seconds between two checkpoints
+        :param clock: the function returning the current time in seconds
+        """
+        if interval is not None and interval < 1:
+            raise ValueError('The checkpoint interval must be a positive integer.')
+        if seconds is not None and seconds <= 0:
+            raise ValueError('The number of seconds between two checkpoints must be positive.')
+        self.path = path
+        self.results_path = path + '.results'
+        self.interval = interval
+        self.seconds = seconds
+        self.clock = clock
+        self.start_url = None
+        self._results_file = None
+        self._pending = 0
+        self._saved_at = None
+
+    def start(self, start_url, resume=False):
+        """
+        Prepares the checkpoint for a crawl, loading the last saved state if needed.
+
+        :param start_url: the URL from which the crawling starts
+        :param resume: True if the crawl should continue from the last checkpoint, if any
+        :return: a dictionary with the keys 'frontier', 'pages_visited' and 'classifications',
+        or None if the crawl starts from scratch
+        """
+        state = None
+        if resume and os.path.exists(self.path):
+            with open(self.path, 'rb') as infile:
+                state = pickle.load(infile)
+            if state['version'] != CHECKPOINT_VERSION:
+                raise ValueError('Unsupported checkpoint version {} in {}.'.format(state['version'], self.path))
+            if state['start_url'] != start_url:
+                raise ValueError('The checkpoint {} belongs to a crawl starting from {}.'
+                                 .format(self.path, state['start_url']))
+            # Drops the results logged after the checkpoint
+            with open(self.results_path, 'ab') as results_file:
+                results_file.truncate(state['results_size'])
+            self._results_file = open(self.results_path, 'ab')
+        else:
+            self._results_file = open(self.results_path, 'wb')
+        self.start_url = start_url
+        self._pending = 0
+        self._saved_at = self.clock()
+        return state
+
+    def iter_results(self):
+        """
+        Returns the results saved by the last checkpoint.
+
+        :return: an iterator over the results of the pages visited before the checkpoint
+        """
+        with open(self.results_path, 'rb') as results_file:
+            for line in results_file:
+                yield json.loads(line.decode('utf-8'))
+
+    def record(self, result, frontier, pages_visited, cache):
+        """
+        Logs the result of a page, saving the state of the crawl once enough pages have been
+        visited or enough time has passed since the last checkpoint.
+
+        :param result: the result of the page
+        :param frontier: the frontier of the crawl, already updated with the links of the page
+        :param pages_visited: the number of visited pages, including this one
+        :param cache: the ClassificationCache of the crawl
+        """
+        self._results_file.write((json.dumps(result) + '\n').encode('utf-8'))
+        self._pending += 1
+        if ((self.interval is not None and self._pending >= self.interval) or
+                (self.seconds is not None and self.clock() - self._saved_at >= self.seconds)):
+            self.save(frontier, pages_visited, cache)
+
+    def save(self, frontier, pages_visited, cache):
+        """
+        Saves the state of the crawl. The logged results are made durable before the state that
+        refers to them.
+
+        :param frontier: the frontier of the crawl
+        :param pages_visited: the number of visited pages
+        :param cache: the ClassificationCache of the crawl
+        """
+        self._results_file.flush()
+        os.fsync(self._results_file.fileno())
+        state = {'version': CHECKPOINT_VERSION,
+                 'start_url': self.start_url,
+                 'frontier': frontier,
+                 'pages_visited': pages_visited,
+                 'classifications': cache.dump(),
+                 'results_size': self._results_file.tell()}
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'wb') as outfile:
+            pickle.dump(state, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(temporary_path, self.path)
+        self._pending = 0
+        self._saved_at = self.clock()
+
+    def close(self):
+        """
+        Closes the results log. Results logged after the last save are discarded on resume.
+        """
+        if self._results_file is not None:
+            self._results_file.close()
+            self._results_file = None
@@ -0,0 +1,117 @@
+import json
+import threading
+from collections import OrderedDict
+
+# The HTTP error codes telling that a URL is gone for good. Other errors (e.g. 408, 429 or 5xx) may be
+# transient, so that the URL is classified again when another page links it
+CACHED_ERROR_CODES = frozenset([404, 410])
+
+
+class ClassificationCache:
+    """
+    The ClassificationCache class stores, for each URL, the outcome of its classification:
+    the real URL in case of redirect, whether it points to an HTML page and the HTTP error
+    code returned, if any. Only the errors of CACHED_ERROR_CODES are kept, the other ones may be
+    transient. Least recently used entries are evicted once the cache is full.
+    The cache is thread safe, so that it can be shared by the workers of a URLParser.
+    """
+
+    def __init__(self, max_size=100000):
+        """
+        Constructor. Initializes an empty cache.
+
+        :param max_size: the maximum number of URLs kept in the cache
+        """
+        if max_size < 1:
+            raise ValueError('The size of the cache must be a positive integer.')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, url):
+        return url in self._entries
+
+    def get(self, url):
+        """
+        Returns the classification of the given URL, marking it as the most recently used.
+
+        :param url: the URL to look up
+        :return: the tuple (actual_url, is_html, error_code) or None if the URL is unknown
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return entry
+
+    def put(self, url, actual_url, is_html, error_code=None):
+        """
+        Stores the classification of the given URL, evicting the least recently used entry
+        if the cache is full. Classifications failed with an error code that may be transient
+        aren't stored.
+
+        :param url: the classified URL
+        :param actual_url: the real URL in case of redirect
+        :param is_html: True if the URL points to an HTML page, False otherwise
+        :param error_code: the HTTP error code returned for the URL, if any
+        """
+        if error_code and error_code not in CACHED_ERROR_CODES:
+            return
+        with self._lock:
+            self._entries[url] = (actual_url, is_html, error_code)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the usage statistics of the cache.
+
+        :return: a dictionary with the number of entries, hits and misses
+        """
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def dump(self):
+        """
+        Returns the entries of the cache, from the least to the most recently used.
+
+        :return: a list of lists [url, actual_url, is_html, error_code]
+        """
+        with self._lock:
+            return [[url] + list(entry) for url, entry in self._entries.items()]
+
+    def restore(self, entries):
+        """
+        Adds the entries previously returned by dump, keeping their recency order.
+
+        :param entries: a list of lists [url, actual_url, is_html, error_code]
+        """
+        for url, actual_url, is_html, error_code in entries:
+            self.put(url, actual_url, is_html, error_code)
+
+    def save(self, path):
+        """
+        Saves the entries of the cache to a json file, from the least to the most recently used.
+
+        :param path: the full path of the file
+        """
+        entries = self.dump()
+        with open(path, 'w') as outfile:
+            json.dump(entries, outfile)
+
+    def load(self, path):
+        """
+        Loads the entries previously saved to a json file, keeping their recency order.
+
+        :param path: the full path of the file
+        """
+        with open(path, 'r') as infile:
+            self.restore(json.load(infile))
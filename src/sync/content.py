@@ -0,0 +1,166 @@
+"""
+This module contains the utilities used to read the body of a response in bounded chunks,
+decoding the content encodings the crawler asks for. Brotli is supported only if the brotli
+package is installed.
+"""
+import http.client
+import urllib.error
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The content encodings sent in the Accept-Encoding header of the GET requests
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli is not None else 'gzip, deflate'
+
+# The content types of the pages whose links are extracted
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# The default maximum size of a page, once decoded
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+DECODING_ERRORS = (zlib.error, EOFError) + ((brotli.error,) if brotli is not None else ())
+
+
+class BodyTooLargeError(urllib.error.URLError):
+    """
+    Raised when the body of a response exceeds the maximum size allowed, either as declared by
+    its Content-Length header or once decoded.
+    """
+
+    def __init__(self, url, max_size):
+        super().__init__('the body of {} exceeds {} bytes'.format(url, max_size))
+        self.url = url
+        self.max_size = max_size
+
+
+class ContentDecodingError(urllib.error.URLError):
+    """
+    Raised when the body of a response can't be decoded according to its Content-Encoding.
+    """
+
+
+def is_html(content_type):
+    """
+    Tells if a Content-Type header denotes an HTML page. A missing header could be anything,
+    so it is considered HTML.
+
+    :param content_type: the value of the header, or None
+    :return: True if the body should be parsed as HTML
+    """
+    if not content_type:
+        return True
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type in HTML_CONTENT_TYPES
+
+
+class _IdentityDecoder:
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+class _DeflateDecoder:
+    """
+    Decodes deflate bodies, which some servers send as raw deflate streams instead of zlib streams.
+    """
+
+    def __init__(self):
+        self._decoder = None
+
+    def decompress(self, data):
+        if self._decoder is None:
+            if not data:
+                return b''
+            # A zlib stream starts with a header whose first two bytes are a multiple of 31
+            is_zlib = len(data) > 1 and data[0] & 0x0f == 8 and (data[0] << 8 | data[1]) % 31 == 0
+            self._decoder = zlib.decompressobj(zlib.MAX_WBITS if is_zlib else -zlib.MAX_WBITS)
+        return self._decoder.decompress(data)
+
+    def flush(self):
+        return self._decoder.flush() if self._decoder is not None else b''
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._decoder = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._decoder.process(data)
+
+    def flush(self):
+        return b''
+
+
+def get_decoder(content_encoding):
+    """
+    Returns a decoder for the given Content-Encoding header.
+
+    :param content_encoding: the value of the header, or None
+    :return: an object with the decompress(data) and flush() methods
+    :raise ContentDecodingError: if the encoding isn't supported
+    """
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding in ('identity', ''):
+        return _IdentityDecoder()
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return _DeflateDecoder()
+    if encoding == 'br' and brotli is not None:
+        return _BrotliDecoder()
+    raise ContentDecodingError('unsupported content encoding {}'.format(content_encoding))
+
+
+def iter_body(response, url, max_size=None, decode=True, chunk_size=CHUNK_SIZE):
+    """
+    Reads the body of a response in chunks, decoding it according to its Content-Encoding.
+    Reading stops as soon as the body exceeds the maximum size, without downloading the rest,
+    and a body announcing a larger Content-Length isn't read at all.
+
+    :param response: an urlopen-like response supporting read(amt)
+    :param url: the requested URL, used in the errors
+    :param max_size: the maximum number of bytes of the decoded body, None for no limit
+    :param decode: False if the body should be returned as it is
+    :param chunk_size: the number of bytes read at a time
+    :return: an iterator over the decoded chunks of the body
+    :raise BodyTooLargeError: if the body exceeds the maximum size
+    :raise ContentDecodingError: if the body can't be decoded
+    :raise urllib.error.URLError: if the body can't be read, e.g. because of a timeout or a
+    connection closed before the end of the body
+    """
+    headers = response.info()
+    try:
+        decoder = get_decoder(headers.get('Content-Encoding') if decode else None)
+        content_length = headers.get('Content-Length')
+        # A compressed body larger than the limit is even larger once decoded
+        if max_size is not None and content_length and content_length.isdigit() and int(content_length) > max_size:
+            raise BodyTooLargeError(url, max_size)
+        size = 0
+        while True:
+            data = response.read(chunk_size)
+            chunk = decoder.decompress(data) if data else decoder.flush()
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise BodyTooLargeError(url, max_size)
+            if chunk:
+                yield chunk
+            if not data:
+                return
+    except DECODING_ERRORS as err:
+        raise ContentDecodingError('the body of {} can\'t be decoded: {}'.format(url, err))
+    except urllib.error.URLError:
+        raise
+    except (http.client.HTTPException, OSError) as err:
+        # Errors of the connection while reading the body are reported like the ones of the request
+        raise urllib.error.URLError(err)
+    finally:
+        close = getattr(response, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,205 @@
+"""
+This module contains the DuplicateIndex, which detects the pages whose content has already been
+seen during a crawl, e.g. the same page served under many query string variants. Every page is
+fingerprinted with an exact digest of its body and with a SimHash of its text and links, so that
+pages differing only in a few details (a session id, a timestamp) are detected as well.
+"""
+import hashlib
+import re
+from collections import namedtuple
+
+PageFingerprint = namedtuple('PageFingerprint', ['digest', 'simhash', 'features'])
+
+SIMHASH_BITS = 64
+
+# Pages with fewer features are only compared by their digest: their SimHash isn't meaningful
+MIN_FEATURES = 8
+
+# The number of words of each shingle of the text of a page
+SHINGLE_SIZE = 3
+
+_MARKUP_PATTERN = re.compile(rb'<(script|style)\b.*?</\1\s*>|<!--.*?-->|<[^>]*>', re.DOTALL | re.IGNORECASE)
+# Links are features without their query string and fragment, which often hold session ids
+_LINK_PATTERN = re.compile(rb'(?:href|src)\s*=\s*["\']?([^"\'\s>?#]+)', re.IGNORECASE)
+_WORD_PATTERN = re.compile(rb'\w+')
+
+# The SimHash sums the bits of the hashes of the features in 64 lanes of a single integer, so
+# that the sums are computed by the integer additions instead of bit by bit
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_SPREAD_BYTES = [sum(((byte >> bit) & 1) << (bit * _LANE_BITS) for bit in range(8)) for byte in range(256)]
+
+
+def get_features(page):
+    """
+    Gets the features of a page used by its SimHash: the shingles of its text and its links,
+    without their query string.
+
+    :param page: an HTML page as bytes or string
+    :return: a set of bytes
+    """
+    if not isinstance(page, bytes):
+        page = page.encode('utf-8')
+    features = set(_LINK_PATTERN.findall(page))
+    words = _WORD_PATTERN.findall(_MARKUP_PATTERN.sub(b' ', page).lower())
+    for i in range(max(len(words) - SHINGLE_SIZE + 1, 1 if words else 0)):
+        features.add(b' '.join(words[i:i + SHINGLE_SIZE]))
+    return features
+
+
+def simhash(features):
+    """
+    Computes the SimHash of a set of features: each bit is set if it is set in the hashes of the
+    majority of the features, so that similar sets have hashes differing in a few bits.
+
+    :param features: an iterable over bytes
+    :return: an integer of SIMHASH_BITS bits
+    """
+    lanes = 0
+    count = 0
+    for feature in features:
+        digest = hashlib.blake2b(feature, digest_size=SIMHASH_BITS // 8).digest()
+        spread = 0
+        for i, byte in enumerate(digest):
+            spread |= _SPREAD_BYTES[byte] << (i * 8 * _LANE_BITS)
+        lanes += spread
+        count += 1
+    result = 0
+    for bit in range(SIMHASH_BITS):
+        if ((lanes >> (bit * _LANE_BITS)) & _LANE_MASK) * 2 > count:
+            result |= 1 << bit
+    return result
+
+
+def hamming_distance(first, second):
+    """
+    :return: the number of bits differing between two integers
+    """
+    return bin(first ^ second).count('1')
+
+
+def get_fingerprint(page):
+    """
+    Fingerprints the body of a page.
+
+    :param page: an HTML page as bytes or string
+    :return: a PageFingerprint
+    """
+    data = page if isinstance(page, bytes) else page.encode('utf-8')
+    features = get_features(data)
+    return PageFingerprint(hashlib.sha1(data).digest(), simhash(features), len(features))
+
+
+class DuplicateIndex:
+    """
+    The DuplicateIndex class keeps the fingerprints of the pages parsed by a crawl, together with
+    their static assets. A page is a duplicate of a previous one if their bodies are identical or,
+    when both have enough features, if their SimHashes differ in at most max_distance bits.
+    Near duplicates are looked up as in Manku et al., "Detecting near-duplicates for web crawling":
+    the SimHashes are split in max_distance + 1 blocks, and two SimHashes within the distance
+    have at least one identical block.
+    """
+
+    def __init__(self, max_distance=3, near_duplicates=True):
+        """
+        Constructor. Initializes an empty index.
+
+        :param max_distance: the maximum number of bits differing between the SimHashes of near duplicates
+        :param near_duplicates: if False, only pages with identical bodies are duplicates
+        """
+        self.max_distance = max_distance
+        self.near_duplicates = near_duplicates
+        block_count = max_distance + 1
+        block_size = SIMHASH_BITS // block_count
+        self._blocks = [(i * block_size, block_size if i < block_count - 1 else SIMHASH_BITS - i * block_size)
+                        for i in range(block_count)]
+        # Maps the digests to the index of the page in _pages
+        self._digests = {}
+        # One dictionary for each block, mapping the value of the block to the indexes of the pages
+        self._simhash_blocks = [{} for _ in self._blocks]
+        # The tuples (url, simhash, static_assets, classified_urls) of the pages
+        self._pages = []
+        self._aliases = {}
+        self.exact_duplicates = 0
+        self.near_duplicates_found = 0
+        self.parses_saved = 0
+        self.head_requests_saved = 0
+
+    def __len__(self):
+        return len(self._pages)
+
+    def _iter_blocks(self, value):
+        for (offset, size), blocks in zip(self._blocks, self._simhash_blocks):
+            yield (value >> offset) & ((1 << size) - 1), blocks
+
+    def find(self, fingerprint):
+        """
+        Looks up the page a fingerprint is a duplicate of.
+
+        :param fingerprint: the PageFingerprint of a page
+        :return: the tuple (url, static_assets, classified_urls, is_exact) of the page, or None
+        """
+        index = self._digests.get(fingerprint.digest)
+        if index is not None:
+            url, _, static_assets, classified_urls = self._pages[index]
+            return url, static_assets, classified_urls, True
+        if not self.near_duplicates or fingerprint.features < MIN_FEATURES:
+            return None
+        for block, blocks in self._iter_blocks(fingerprint.simhash):
+            for index in blocks.get(block, ()):
+                url, other_simhash, static_assets, classified_urls = self._pages[index]
+                if hamming_distance(fingerprint.simhash, other_simhash) <= self.max_distance:
+                    return url, static_assets, classified_urls, False
+        return None
+
+    def add(self, url, fingerprint, static_assets, classified_urls=()):
+        """
+        Adds a parsed page to the index.
+
+        :param url: the URL of the page
+        :param fingerprint: the PageFingerprint of the page
+        :param static_assets: the static assets of the page, reused by its duplicates
+        :param classified_urls: the links of the page classified with a HEAD request, or which
+        would have been without a cache
+        """
+        index = len(self._pages)
+        self._pages.append((url, fingerprint.simhash, tuple(static_assets), tuple(classified_urls)))
+        self._digests.setdefault(fingerprint.digest, index)
+        if self.near_duplicates and fingerprint.features >= MIN_FEATURES:
+            for block, blocks in self._iter_blocks(fingerprint.simhash):
+                blocks.setdefault(block, []).append(index)
+
+    def record_duplicate(self, url, original_url, is_exact, head_requests_saved):
+        """
+        Records a page found to be a duplicate, which hasn't been parsed.
+
+        :param url: the URL of the duplicate page
+        :param original_url: the URL of the page it duplicates
+        :param is_exact: True if the bodies of the pages are identical
+        :param head_requests_saved: the number of HEAD requests the classification of the page would have sent
+        """
+        self._aliases[url] = original_url
+        if is_exact:
+            self.exact_duplicates += 1
+        else:
+            self.near_duplicates_found += 1
+        self.parses_saved += 1
+        self.head_requests_saved += head_requests_saved
+
+    def pop_alias(self, url):
+        """
+        Returns the page a duplicate page is an alias of, forgetting it.
+
+        :param url: the URL of a page
+        :return: the URL of the page it duplicates, or None if it isn't a duplicate
+        """
+        return self._aliases.pop(url, None)
+
+    def stats(self):
+        """
+        :return: a dictionary with the number of pages indexed, exact and near duplicates found,
+        parses and HEAD requests saved
+        """
+        return {'pages': len(self._pages), 'exact_duplicates': self.exact_duplicates,
+                'near_duplicates': self.near_duplicates_found, 'parses_saved': self.parses_saved,
+                'head_requests_saved': self.head_requests_saved}
@@ -0,0 +1,294 @@
+import abc
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+from src.sync.frontier import canonicalize_url
+
+# The states of a URL in a shared frontier
+QUEUED, LEASED, DONE = 0, 1, 2
+
+
+class FrontierStore(abc.ABC):
+    """
+    The FrontierStore class defines the interface of the stores shared by the workers of a
+    distributed crawl. A store keeps the frontier, the set of URLs ever queued and the results
+    of the visited pages. Workers claim URLs with a lease: a URL whose lease expires before its
+    result is stored is queued again, so that the pages of crashed workers are still visited.
+    Every method must be atomic with respect to the other workers, and no more than max_pages
+    URLs must be leased or done at the same time, so that the limit is respected exactly.
+    SQLiteFrontierStore implements it for workers sharing a file system, other implementations
+    (e.g. backed by Redis) can be plugged into the DistributedCrawler.
+    """
+
+    @abc.abstractmethod
+    def seed(self, start_url, max_pages):
+        """
+        Initializes the crawl, unless another worker already did.
+
+        :param start_url: the URL from which the crawling starts
+        :param max_pages: the maximum number of pages visited by all the workers together
+        :raise ValueError: if the store belongs to a crawl with a different start URL or limit
+        """
+
+    @abc.abstractmethod
+    def claim(self, worker_id, lease_seconds):
+        """
+        Leases the URL that has been waiting for the longest time, queuing again the URLs whose
+        lease expired.
+
+        :param worker_id: the identifier of the worker
+        :param lease_seconds: the number of seconds the worker has to complete the URL
+        :return: the URL to visit, or None if no URL can be visited now
+        """
+
+    @abc.abstractmethod
+    def complete(self, worker_id, url, assets, links):
+        """
+        Stores the result of a leased URL and queues the links found in its page.
+
+        :param worker_id: the identifier of the worker
+        :param url: the URL leased by the worker
+        :param assets: the static assets of the page
+        :param links: the links to follow found in the page
+        :return: True if the result has been stored, False if the lease was lost
+        """
+
+    @abc.abstractmethod
+    def is_finished(self):
+        """
+        :return: True if the limit of pages has been reached or there are no more pages to visit
+        """
+
+    @abc.abstractmethod
+    def results(self):
+        """
+        :return: an iterator over dictionaries containing the URL of a visited page together with
+        its static assets, in the order they have been stored
+        """
+
+    @abc.abstractmethod
+    def stats(self):
+        """
+        :return: a dictionary with the number of queued, leased and done URLs
+        """
+
+    @abc.abstractmethod
+    def close(self):
+        """
+        Releases the resources of the store.
+        """
+
+
+class SQLiteFrontierStore(FrontierStore):
+    """
+    The SQLiteFrontierStore class keeps the shared frontier of a distributed crawl in an SQLite
+    database, relying on the locks of SQLite to serialize the workers. It can be shared by the
+    processes of a single machine, or by several machines mounting a file system with working
+    locks. The write-ahead log used by default needs the shared memory of a single machine: on a
+    shared file system, every worker must open the store with shared_filesystem set.
+    """
+
+    def __init__(self, path, canonicalize=canonicalize_url, timeout=60, clock=time.time, shared_filesystem=False):
+        """
+        Constructor. Opens or creates the database.
+
+        :param path: the path of the database
+        :param canonicalize: the function bringing a URL to the canonical form used to detect duplicates
+        :param timeout: the number of seconds a worker waits for the lock of the database
+        :param clock: the function returning the current time, which must be shared by the workers
+        :param shared_filesystem: if True, the database is kept with a rollback journal, so that it
+        can be shared by several machines. Otherwise a write-ahead log lets the workers of a single
+        machine read while another one writes.
+        """
+        self.path = path
+        self.canonicalize = canonicalize
+        self.clock = clock
+        # Transactions are handled explicitly, so that they lock the database from their start
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode = {}'.format('DELETE' if shared_filesystem else 'WAL'))
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS urls (seq INTEGER PRIMARY KEY, canonical TEXT UNIQUE, url TEXT,
+                                             state INTEGER DEFAULT 0, worker TEXT, lease_expires REAL);
+            CREATE INDEX IF NOT EXISTS urls_state ON urls (state, seq);
+            CREATE TABLE IF NOT EXISTS results (seq INTEGER PRIMARY KEY, url TEXT, assets TEXT);
+            CREATE TABLE IF NOT EXISTS counts (state INTEGER PRIMARY KEY, count INTEGER);
+        """)
+        self.max_pages = None
+
+    def _transaction(self):
+        self._connection.execute('BEGIN IMMEDIATE')
+
+    def _counts(self):
+        # The number of URLs in each state is kept up to date, so that it doesn't need to be counted
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0}
+        counts.update(self._connection.execute('SELECT state, count FROM counts'))
+        return counts
+
+    def _update_counts(self, changes):
+        self._connection.executemany('UPDATE counts SET count = count + ? WHERE state = ?',
+                                     [(change, state) for state, change in changes.items() if change])
+
+    def seed(self, start_url, max_pages):
+        self._transaction()
+        try:
+            meta = dict(self._connection.execute('SELECT key, value FROM meta'))
+            if not meta:
+                self._connection.executemany('INSERT INTO meta VALUES (?, ?)',
+                                             [('start_url', start_url), ('max_pages', str(max_pages))])
+                self._connection.execute('INSERT INTO urls (canonical, url) VALUES (?, ?)',
+                                         (self.canonicalize(start_url), start_url))
+                self._connection.executemany('INSERT INTO counts VALUES (?, ?)',
+                                             [(QUEUED, 1), (LEASED, 0), (DONE, 0)])
+            elif meta['start_url'] != start_url or int(meta['max_pages']) != max_pages:
+                raise ValueError('The store {} belongs to a crawl of {} pages starting from {}.'
+                                 .format(self.path, meta['max_pages'], meta['start_url']))
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self.max_pages = max_pages
+
+    def claim(self, worker_id, lease_seconds):
+        now = self.clock()
+        self._transaction()
+        try:
+            expired = self._connection.execute('UPDATE urls SET state = ?, worker = NULL, lease_expires = NULL '
+                                               'WHERE state = ? AND lease_expires < ?', (QUEUED, LEASED, now)).rowcount
+            self._update_counts({QUEUED: expired, LEASED: -expired})
+            counts = self._counts()
+            row = None
+            if counts[DONE] + counts[LEASED] < self.max_pages:
+                row = self._connection.execute('SELECT seq, url FROM urls WHERE state = ? ORDER BY seq LIMIT 1',
+                                               (QUEUED,)).fetchone()
+            if row is not None:
+                self._connection.execute('UPDATE urls SET state = ?, worker = ?, lease_expires = ? WHERE seq = ?',
+                                         (LEASED, worker_id, now + lease_seconds, row[0]))
+                self._update_counts({QUEUED: -1, LEASED: 1})
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        return row[1] if row is not None else None
+
+    def complete(self, worker_id, url, assets, links):
+        canonical_url = self.canonicalize(url)
+        self._transaction()
+        try:
+            row = self._connection.execute('SELECT state, worker FROM urls WHERE canonical = ?',
+                                           (canonical_url,)).fetchone()
+            if row is None or row[0] != LEASED or row[1] != worker_id:
+                # The lease expired and the URL has been queued again, or claimed by another worker
+                self._connection.execute('ROLLBACK')
+                return False
+            self._connection.execute('UPDATE urls SET state = ?, worker = NULL, lease_expires = NULL '
+                                     'WHERE canonical = ?', (DONE, canonical_url))
+            self._connection.execute('INSERT INTO results (url, assets) VALUES (?, ?)', (url, json.dumps(assets)))
+            queued = self._connection.executemany('INSERT OR IGNORE INTO urls (canonical, url) VALUES (?, ?)',
+                                                  [(self.canonicalize(link), link) for link in links]).rowcount
+            self._update_counts({QUEUED: max(queued, 0), LEASED: -1, DONE: 1})
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        return True
+
+    def is_finished(self):
+        counts = self._counts()
+        return counts[DONE] >= self.max_pages or counts[QUEUED] + counts[LEASED] == 0
+
+    def results(self):
+        for url, assets in self._connection.execute('SELECT url, assets FROM results ORDER BY seq'):
+            yield {'url': url, 'assets': json.loads(assets)}
+
+    def stats(self):
+        counts = self._counts()
+        return {'queued': counts[QUEUED], 'leased': counts[LEASED], 'done': counts[DONE]}
+
+    def close(self):
+        self._connection.close()
+
+
+def get_worker_id():
+    """
+    :return: an identifier of the current process, unique across machines
+    """
+    return '{}-{}-{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class DistributedCrawler:
+    """
+    The DistributedCrawler class runs a worker of a distributed crawl: it visits the pages
+    claimed from a FrontierStore with the URLParser of a Spider, and stores their results and
+    links back into the store, until all the workers together have visited max_pages pages or
+    there are no more pages to visit.
+    """
+
+    def __init__(self, spider, store, worker_id=None, lease_seconds=60, poll_interval=0.5, sleep=time.sleep):
+        """
+        Constructor.
+
+        :param spider: the Spider whose URLParser, politeness scheduler and metrics are used
+        :param store: the FrontierStore shared by the workers
+        :param worker_id: the identifier of the worker. If not given, one is generated.
+        :param lease_seconds: the number of seconds a worker has to visit a page before it is
+        given to another worker
+        :param poll_interval: the number of seconds to wait when no page can be claimed, because
+        the pages left are leased by other workers
+        :param sleep: the function used to wait
+        """
+        self.spider = spider
+        self.store = store
+        self.worker_id = worker_id or get_worker_id()
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+
+    def crawl(self, start_url, max_pages):
+        """
+        Generator visiting the pages of a distributed crawl.
+
+        :param start_url: the URL from which the crawling starts, the same for every worker
+        :param max_pages: the maximum number of pages visited by all the workers together
+        :return: an iterator over the results of the pages visited by this worker
+        """
+        spider = self.spider
+        self.store.seed(start_url, max_pages)
+        spider.url_parser.set_base_url(start_url)
+        deadline_time = time.monotonic() + spider.deadline if spider.deadline is not None else None
+        try:
+            while True:
+                if deadline_time is not None and time.monotonic() >= deadline_time:
+                    # The pages queued are left to the other workers, or to a later run
+                    if spider.enable_logging:
+                        logging.warning('Worker {} reached its deadline of {} seconds'
+                                        .format(self.worker_id, spider.deadline))
+                    break
+                url = self.store.claim(self.worker_id, self.lease_seconds)
+                if url is None:
+                    if self.store.is_finished():
+                        break
+                    self.sleep(self.poll_interval)
+                    continue
+                if spider.enable_logging:
+                    logging.info('Worker {} started crawling URL: {}'.format(self.worker_id, url))
+                static_assets, links_to_follow = spider.url_parser.parse_url(url)
+                # The store has to mark missing pages as done, so they are stored like the other ones
+                spider.url_parser.discarded_pages.discard(url)
+                if spider.politeness is not None:
+                    links_to_follow = [link for link in links_to_follow if spider.politeness.allowed(link)]
+                with spider.metrics.timer('enqueue'):
+                    stored = self.store.complete(self.worker_id, url, static_assets, links_to_follow)
+                if not stored:
+                    if spider.enable_logging:
+                        logging.warning('Worker {} lost the lease of {}'.format(self.worker_id, url))
+                    continue
+                spider.metrics.record_page(self.store.stats()['queued'])
+                yield {'url': url, 'assets': static_assets}
+        finally:
+            spider.url_parser.close()
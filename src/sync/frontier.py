@@ -0,0 +1,280 @@
+import heapq
+import itertools
+import urllib.parse
+from collections import deque
+
+from src.sync.scoring import DepthScorer, InlinkScorer
+from src.sync.visited import MemoryVisitedSet
+
+# Ports that are implied by the scheme of a URL
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that don't change the content of a page
+DEFAULT_IGNORED_PARAMETERS = frozenset(['utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                                        'gclid', 'fbclid', 'msclkid'])
+
+TRAILING_SLASH_POLICIES = ('strip', 'add', 'keep')
+
+
+def canonicalize_url(url, trailing_slash='strip', ignored_parameters=DEFAULT_IGNORED_PARAMETERS):
+    """
+    Brings a URL to its canonical form, so that URLs pointing to the same page are equal.
+    The fragment and the default port are removed, scheme and host are lower cased, query
+    parameters are filtered and sorted, and the trailing slash of the path is handled
+    according to the given policy.
+
+    :param url: an absolute URL
+    :param trailing_slash: 'strip' to remove the trailing slash from the path, 'add' to add it
+    to paths whose last segment has no extension, 'keep' to leave the path as it is
+    :param ignored_parameters: the names of the query parameters that should be dropped
+    :return: the canonical form of the URL
+    """
+    if trailing_slash not in TRAILING_SLASH_POLICIES:
+        raise ValueError('Unknown trailing slash policy {}.'.format(trailing_slash))
+    split = urllib.parse.urlsplit(url)
+    scheme = split.scheme.lower()
+    netloc = split.netloc.lower()
+    host = split.hostname or ''
+    try:
+        port = split.port
+    except ValueError:
+        # Leaves alone network locations with invalid ports
+        port = None
+    else:
+        if ':' in host:
+            host = '[{}]'.format(host)
+        netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else '{}:{}'.format(host, port)
+        if '@' in split.netloc:
+            netloc = '{}@{}'.format(split.netloc.rsplit('@', 1)[0], netloc)
+    path = split.path or '/'
+    if trailing_slash == 'strip':
+        path = path.rstrip('/') or '/'
+    elif trailing_slash == 'add' and not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]:
+        path += '/'
+    query = split.query
+    if query:
+        parameters = [(name, value) for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True)
+                      if name not in ignored_parameters]
+        query = urllib.parse.urlencode(sorted(parameters))
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+class Frontier:
+    """
+    The Frontier class keeps track of the pages that still need to be visited, in the order
+    they have been discovered, together with their depth. URLs are deduplicated when they are
+    added, using their canonical form, so that every page is queued at most once.
+    """
+
+    def __init__(self, canonicalize=canonicalize_url, visited=None):
+        """
+        Constructor. Initializes an empty frontier.
+
+        :param canonicalize: the function bringing a URL to the canonical form used to detect
+        duplicates
+        :param visited: the set keeping the canonical URLs ever added, one of the classes of
+        src.sync.visited. If not given, a MemoryVisitedSet is used.
+        """
+        self.canonicalize = canonicalize
+        self._queue = deque()
+        self._seen = visited if visited is not None else MemoryVisitedSet()
+
+    def __len__(self):
+        """
+        :return: the number of URLs that still need to be visited
+        """
+        return len(self._queue)
+
+    def __contains__(self, url):
+        """
+        :return: True if the URL, or another URL with the same canonical form, has ever been added
+        """
+        return self.canonicalize(url) in self._seen
+
+    @property
+    def seen_count(self):
+        """
+        :return: the number of distinct URLs ever added to the frontier
+        """
+        return len(self._seen)
+
+    def add(self, url, depth=0):
+        """
+        Adds a URL to the frontier unless it has been already added.
+
+        :param url: the URL that should be visited
+        :param depth: the number of links followed from the start URL to find this one
+        :return: True if the URL has been queued, False if it was a duplicate
+        """
+        if not self._seen.add(self.canonicalize(url)):
+            return False
+        self._queue.append((url, depth))
+        return True
+
+    def mark_seen(self, url):
+        """
+        Records a URL as already added without queuing it, so that it won't be visited.
+
+        :param url: the URL that shouldn't be visited
+        :return: True if the URL had never been added, False otherwise
+        """
+        return self._seen.add(self.canonicalize(url))
+
+    def pop_with_depth(self):
+        """
+        Removes and returns the URL that has been waiting for the longest time, with its depth.
+
+        :return: the tuple (url, depth) of the next URL to visit
+        """
+        return self._queue.popleft()
+
+    def pop(self):
+        """
+        Removes and returns the next URL to visit.
+
+        :return: the next URL to visit
+        """
+        return self.pop_with_depth()[0]
+
+    def peek(self, count):
+        """
+        Returns the URLs that will be popped next, without removing them.
+
+        :param count: the maximum number of URLs to return
+        :return: a list of URLs, in the order they will be popped
+        """
+        return [url for url, _ in itertools.islice(self._queue, count)]
+
+    def close(self):
+        """
+        Releases the resources of the set of added URLs.
+        """
+        self._seen.close()
+
+
+class PriorityFrontier(Frontier):
+    """
+    The PriorityFrontier class visits first the pages with the highest score, as given by a list
+    of scorers (see src.sync.scoring), instead of the order they have been discovered. Pages with
+    the same score are visited in the order they have been discovered. The score of a queued page
+    is updated when more links to it are found, or when it is found closer to the start URL.
+    URLs rejected by a scorer are never queued.
+    The queue is a heap: updated pages are pushed again, and their outdated entries are skipped
+    when popped.
+    """
+
+    def __init__(self, canonicalize=canonicalize_url, visited=None, scorers=None):
+        """
+        Constructor. Initializes an empty frontier.
+
+        :param canonicalize: the function bringing a URL to the canonical form used to detect
+        duplicates
+        :param visited: the set keeping the canonical URLs ever added, one of the classes of
+        src.sync.visited. If not given, a MemoryVisitedSet is used.
+        :param scorers: the scorers whose scores are added to get the score of a page. By default,
+        pages closer to the start URL and linked by more pages are preferred.
+        """
+        super().__init__(canonicalize=canonicalize, visited=visited)
+        self.scorers = scorers if scorers is not None else [DepthScorer(), InlinkScorer()]
+        # Entries (-score, order, canonical_url) of the queued URLs, possibly outdated
+        self._heap = []
+        # Maps the canonical form of the queued URLs to the list [url, depth, inlinks, score, order]
+        self._entries = {}
+        # The number of URLs ever queued, giving the order they have been discovered
+        self._discovered = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _score(self, url, depth, inlinks):
+        """
+        :return: the sum of the scores of a URL, or None if a scorer rejects it
+        """
+        total = 0
+        for scorer in self.scorers:
+            score = scorer(url, depth, inlinks)
+            if score is None:
+                return None
+            total += score
+        return total
+
+    def _push(self, canonical_url, entry):
+        heapq.heappush(self._heap, (-entry[3], entry[4], canonical_url))
+        # Outdated entries are dropped once they outnumber the queued URLs
+        if len(self._heap) > 2 * len(self._entries) + 1000:
+            self._heap = [(-current[3], current[4], key) for key, current in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, url, depth=0):
+        """
+        Adds a URL to the frontier unless it has been already added. If the URL is still queued,
+        its score is updated instead.
+
+        :param url: the URL that should be visited
+        :param depth: the number of links followed from the start URL to find this one
+        :return: True if the URL has been queued, False if it was a duplicate or has been rejected
+        """
+        canonical_url = self.canonicalize(url)
+        entry = self._entries.get(canonical_url)
+        if entry is not None:
+            entry[1] = min(entry[1], depth)
+            entry[2] += 1
+            score = self._score(entry[0], entry[1], entry[2])
+            if score is None:
+                # A queued URL keeps its previous score
+                return False
+            if score != entry[3]:
+                entry[3] = score
+                self._push(canonical_url, entry)
+            return False
+        if not self._seen.add(canonical_url):
+            return False
+        score = self._score(url, depth, 1)
+        if score is None:
+            return False
+        entry = self._entries[canonical_url] = [url, depth, 1, score, self._discovered]
+        self._discovered += 1
+        self._push(canonical_url, entry)
+        return True
+
+    def _pop_entry(self):
+        """
+        Removes the entry of the URL with the highest score from the heap, skipping outdated ones.
+
+        :return: the tuple (canonical_url, entry)
+        """
+        while True:
+            negative_score, order, canonical_url = heapq.heappop(self._heap)
+            entry = self._entries.get(canonical_url)
+            if entry is not None and entry[4] == order and entry[3] == -negative_score:
+                return canonical_url, entry
+
+    def pop_with_depth(self):
+        """
+        Removes and returns the URL with the highest score, with its depth.
+
+        :return: the tuple (url, depth) of the next URL to visit
+        """
+        canonical_url, entry = self._pop_entry()
+        del self._entries[canonical_url]
+        return entry[0], entry[1]
+
+    def peek(self, count):
+        """
+        Returns the URLs that will be popped next, without removing them. The order may change
+        when URLs are added.
+
+        :param count: the maximum number of URLs to return
+        :return: a list of URLs, in the order they would be popped now
+        """
+        popped = []
+        popped_urls = set()
+        while len(popped) < min(count, len(self._entries)):
+            canonical_url, entry = self._pop_entry()
+            # A URL may have several up to date entries, if its score went back to a previous value
+            if canonical_url not in popped_urls:
+                popped_urls.add(canonical_url)
+                popped.append((canonical_url, entry))
+        for canonical_url, entry in popped:
+            heapq.heappush(self._heap, (-entry[3], entry[4], canonical_url))
+        return [entry[0] for _, entry in popped]
@@ -0,0 +1,405 @@
+import hashlib
+import http.client
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+from collections import OrderedDict
+
+from src.sync.content import DEFAULT_MAX_BODY_SIZE
+
+
+def parse_cache_control(value):
+    """
+    Parses the value of a Cache-Control header.
+
+    :param value: the value of the header, or None
+    :return: a dictionary mapping the lower cased directives to their value (True for
+    directives without a value)
+    """
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else True
+    return directives
+
+
+class HTTPCache:
+    """
+    The HTTPCache class stores HTTP responses on disk, one file per request, keyed by method
+    and URL. Each file holds a line with the JSON header of the entry followed by the raw body,
+    so that nothing but data is loaded from the directory. Once the total size of the stored
+    bodies exceeds the given cap, the least recently used entries are deleted. The recency order
+    survives restarts since it is kept in the modification time of the files.
+    """
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024):
+        """
+        Constructor. Loads the index of the entries already stored in the directory.
+
+        :param directory: the directory where the responses are stored
+        :param max_size: the maximum number of bytes stored in the directory
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.size = 0
+        self.evictions = 0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith('.entry'):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-len('.entry')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.size += size
+
+    @staticmethod
+    def _get_key(method, url):
+        return hashlib.sha1('{} {}'.format(method, url).encode('utf-8')).hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.entry')
+
+    def get(self, method, url):
+        """
+        Returns the stored entry for the given request, marking it as the most recently used.
+
+        :param method: HTTP method
+        :param url: the requested URL
+        :return: a dictionary with the keys 'url', 'status', 'reason', 'headers', 'body' and
+        'stored_at', together with the ones given to put, or None if nothing is stored
+        """
+        key = self._get_key(method, url)
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._get_path(key), 'rb') as infile:
+                entry = json.loads(infile.readline().decode('utf-8'))
+                entry['body'] = infile.read()
+            os.utime(self._get_path(key))
+        except (OSError, ValueError, TypeError):
+            # Unreadable entries, e.g. written by an older version, are dropped
+            self.delete(method, url)
+            return None
+        entry['headers'] = [tuple(header) for header in entry['headers']]
+        return entry
+
+    def put(self, method, url, entry):
+        """
+        Stores an entry for the given request, evicting the least recently used ones if needed.
+
+        :param method: HTTP method
+        :param url: the requested URL
+        :param entry: the dictionary returned by get. The values other than the body must be
+        serializable to JSON.
+        """
+        key = self._get_key(method, url)
+        header = {name: value for name, value in entry.items() if name != 'body'}
+        data = json.dumps(header).encode('utf-8') + b'\n' + entry['body']
+        if len(data) > self.max_size:
+            return
+        path = self._get_path(key)
+        temporary_path = '{}.{}.tmp'.format(path, threading.get_ident())
+        with open(temporary_path, 'wb') as outfile:
+            outfile.write(data)
+        os.replace(temporary_path, path)
+        evicted = []
+        with self._lock:
+            self.size += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self.size > self.max_size:
+                evicted_key, evicted_size = self._index.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+                evicted.append(evicted_key)
+        for evicted_key in evicted:
+            try:
+                os.remove(self._get_path(evicted_key))
+            except OSError:
+                pass
+
+    def delete(self, method, url):
+        """
+        Deletes the stored entry for the given request, if any.
+
+        :param method: HTTP method
+        :param url: the requested URL
+        """
+        key = self._get_key(method, url)
+        with self._lock:
+            self.size -= self._index.pop(key, 0)
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._index)
+
+
+class CachedResponse:
+    """
+    The CachedResponse class exposes a stored entry with the interface of an urlopen response.
+    """
+
+    def __init__(self, entry):
+        """
+        Constructor.
+
+        :param entry: the entry returned by HTTPCache.get
+        """
+        self.url = entry['url']
+        self.status = entry['status']
+        self.code = entry['status']
+        self.reason = entry['reason']
+        self.headers = http.client.HTTPMessage()
+        for name, value in entry['headers']:
+            self.headers[name] = value
+        self._body = io.BytesIO(entry['body'])
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+    def read(self, amt=None):
+        return self._body.read() if amt is None else self._body.read(amt)
+
+    def close(self):
+        self._body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TeeResponse:
+    """
+    The TeeResponse class wraps a response and keeps a copy of its body while the caller reads
+    it, so that the response can be stored without reading its body up front: a body the caller
+    doesn't read, e.g. because it isn't HTML or it is too large, isn't downloaded either. Once the
+    body has been read to the end, or the response is closed, the callback receives the body read.
+    Errors while reading the body are raised as urllib.error.URLError.
+    """
+
+    def __init__(self, response, callback, max_size=DEFAULT_MAX_BODY_SIZE):
+        """
+        Constructor.
+
+        :param response: the wrapped response
+        :param callback: the function called once with the body read, a flag being True if the
+        body is complete, and the error raised while reading it, if any
+        :param max_size: the maximum number of bytes of the body kept. The rest of a longer body
+        is still returned to the caller, but the callback receives it truncated.
+        """
+        self._response = response
+        self._callback = callback
+        self._max_size = max_size
+        self._chunks = []
+        self._size = 0
+        self._truncated = False
+        self._done = False
+        self.url = response.geturl()
+        self.status = response.getcode() or 200
+        self.code = self.status
+        self.reason = getattr(response, 'reason', 'OK')
+        self.headers = response.info()
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+    def read(self, amt=None):
+        try:
+            data = self._response.read() if amt is None else self._response.read(amt)
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as err:
+            self._finish(False, err)
+            if isinstance(err, urllib.error.URLError):
+                raise
+            raise urllib.error.URLError(err)
+        if not self._truncated:
+            if self._max_size is not None and self._size + len(data) > self._max_size:
+                data_kept = data[:self._max_size - self._size]
+                self._truncated = True
+            else:
+                data_kept = data
+            self._chunks.append(data_kept)
+            self._size += len(data_kept)
+        if amt is None or not data:
+            self._finish(not self._truncated)
+        return data
+
+    def _finish(self, complete, error=None):
+        if self._done:
+            return
+        self._done = True
+        body, self._chunks = b''.join(self._chunks), []
+        self._callback(body, complete, error)
+
+    def close(self):
+        self._response.close()
+        self._finish(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CachingTransport:
+    """
+    The CachingTransport class wraps another transport with an HTTPCache. Fresh responses,
+    according to the max-age directive of their Cache-Control header, are served from disk
+    without any request. Stale responses are revalidated with If-None-Match and
+    If-Modified-Since, and served from disk if the server answers 304 Not Modified. Responses
+    are stored once their body has been read to the end by the caller, so bodies the crawler
+    doesn't read, e.g. of pages that aren't HTML, aren't downloaded just to be stored. A stored
+    response only answers requests with the same Accept-Encoding header, and the same headers
+    listed by its Vary header, as the request it was received for.
+    """
+
+    def __init__(self, transport, cache, max_body_size=DEFAULT_MAX_BODY_SIZE):
+        """
+        Constructor.
+
+        :param transport: the transport used to send the requests that can't be served from disk
+        :param cache: the HTTPCache
+        :param max_body_size: the maximum number of bytes of a stored body, as received. Longer
+        responses aren't stored. None for no limit.
+        """
+        self.transport = transport
+        self.cache = cache
+        self.max_body_size = max_body_size
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _is_fresh(entry, now):
+        directives = parse_cache_control(dict(entry['headers']).get('Cache-Control'))
+        if 'no-cache' in directives:
+            return False
+        try:
+            max_age = int(directives.get('max-age', 0))
+        except ValueError:
+            return False
+        return now - entry['stored_at'] < max_age
+
+    @staticmethod
+    def _get_variant(headers, vary):
+        """
+        Given the headers of a request and the Vary header of the response, returns the values
+        of the request headers the response depends on.
+
+        :param headers: a dictionary of request headers, or None
+        :param vary: the Vary header of the response, or None
+        :return: a sorted list of [name, value] pairs, the value being None for missing headers
+        """
+        request_headers = {name.lower(): value for name, value in (headers or {}).items()}
+        names = {'accept-encoding'}
+        names.update(name.strip().lower() for name in (vary or '').split(',') if name.strip())
+        return [[name, request_headers.get(name)] for name in sorted(names)]
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Given an URL and a method, returns the response from the cache when possible, otherwise
+        sends the related HTTP request through the wrapped transport and stores the response.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :param timeout: an optional timeout in seconds for the blocking operations
+        :return: the related HTTP response
+        """
+        entry = self.cache.get(method, url)
+        if entry is not None and entry.get('variant') != self._get_variant(
+                headers, dict(entry['headers']).get('Vary')):
+            # Stored for a request with other headers, e.g. a compressed body for a request without Accept-Encoding
+            entry = None
+        if entry is None and method == 'HEAD':
+            # The headers of a stored GET response answer a HEAD request as well
+            entry = self.cache.get('GET', url)
+            if entry is not None:
+                entry = dict(entry, body=b'')
+        now = time.time()
+        if entry is not None and self._is_fresh(entry, now):
+            self._count('hits')
+            return CachedResponse(entry)
+        request_headers = dict(headers or {})
+        if entry is not None:
+            entry_headers = dict(entry['headers'])
+            if 'ETag' in entry_headers:
+                request_headers['If-None-Match'] = entry_headers['ETag']
+            if 'Last-Modified' in entry_headers:
+                request_headers['If-Modified-Since'] = entry_headers['Last-Modified']
+        try:
+            response = self.transport.send(url, method, headers=request_headers, timeout=timeout)
+        except urllib.error.HTTPError as http_err:
+            if http_err.code != 304 or entry is None:
+                raise
+            self._count('revalidations')
+            # Refreshes the stored headers with the ones of the 304 response
+            refreshed_headers = dict(entry['headers'])
+            refreshed_headers.update(http_err.headers.items())
+            entry = dict(entry, headers=list(refreshed_headers.items()), stored_at=now)
+            self.cache.put(method, url, entry)
+            return CachedResponse(entry)
+        self._count('misses')
+        vary = response.info().get('Vary')
+        if 'no-store' in parse_cache_control(response.info().get('Cache-Control')) or (vary or '').strip() == '*':
+            return response
+        entry = {'url': response.geturl(), 'status': response.getcode() or 200,
+                 'reason': getattr(response, 'reason', 'OK'), 'headers': list(response.info().items()),
+                 'body': b'', 'stored_at': now, 'variant': self._get_variant(headers, vary)}
+        if method == 'HEAD':
+            response.close()
+            self.cache.put(method, url, entry)
+            return CachedResponse(entry)
+
+        def store(body, complete, error):
+            # Bodies that haven't been read to the end, or are too large, aren't stored
+            if complete:
+                self.cache.put(method, url, dict(entry, body=body))
+        return TeeResponse(response, store, max_size=self.max_body_size)
+
+    def stats(self):
+        """
+        Returns the usage statistics of the cache together with the ones of the wrapped transport.
+
+        :return: a dictionary with the counters
+        """
+        stats = dict(self.transport.stats())
+        stats.update({'cache_hits': self.hits, 'cache_revalidations': self.revalidations,
+                      'cache_misses': self.misses, 'cache_evictions': self.cache.evictions})
+        return stats
+
+    def close(self):
+        """
+        Closes the wrapped transport.
+        """
+        self.transport.close()
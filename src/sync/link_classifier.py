@@ -0,0 +1,79 @@
+"""
+This module classifies the links of a page as static assets or pages without sending any
+HTTP request, looking at the tag and attribute the link comes from and at the extension
+of the linked URL. Links that can't be classified in this way are reported as ambiguous.
+"""
+import posixpath
+import urllib.parse
+
+STATIC = 'static'
+PAGE = 'page'
+
+STATIC_EXTENSIONS = frozenset([
+    # Images
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.svg', '.webp', '.avif', '.tif', '.tiff',
+    # Scripts and stylesheets
+    '.js', '.mjs', '.css', '.map',
+    # Fonts
+    '.woff', '.woff2', '.ttf', '.otf', '.eot',
+    # Media
+    '.mp3', '.mp4', '.m4a', '.ogg', '.ogv', '.oga', '.wav', '.webm', '.flac', '.mov', '.avi',
+    # Documents and archives
+    '.pdf', '.txt', '.csv', '.xml', '.json', '.rss', '.zip', '.gz', '.tgz', '.tar', '.rar', '.7z',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.exe', '.dmg', '.apk', '.swf',
+])
+
+PAGE_EXTENSIONS = frozenset(['', '.html', '.htm', '.xhtml', '.shtml', '.php', '.asp', '.aspx', '.jsp', '.cfm'])
+
+# Tags whose src attribute always points to a static asset
+STATIC_SOURCE_TAGS = frozenset(['img', 'script', 'source', 'video', 'audio', 'track', 'embed', 'input'])
+
+# Values of the rel attribute of a <link> tag pointing to a static asset
+STATIC_LINK_RELS = frozenset(['stylesheet', 'icon', 'shortcut', 'apple-touch-icon', 'apple-touch-icon-precomposed',
+                              'mask-icon', 'manifest', 'preload', 'prefetch', 'modulepreload'])
+
+# Tags whose href attribute points to a page unless the extension tells otherwise
+ANCHOR_TAGS = frozenset(['a', 'area'])
+
+
+def get_extension(url):
+    """
+    Returns the lower case extension of the path of the given URL.
+
+    :param url: an absolute or relative URL
+    :return: the extension including the leading dot, or an empty string if the path has none
+    """
+    path = urllib.parse.urlsplit(url).path
+    return posixpath.splitext(posixpath.basename(path))[1].lower()
+
+
+def classify_link(url, tag, attribute, rel=None):
+    """
+    Classifies a link of a page using the context it has been found in.
+
+    :param url: the linked URL
+    :param tag: the name of the tag containing the link
+    :param attribute: the attribute containing the link, None if the link has been found in
+    the text of the tag (e.g.: a url() in a <style> tag)
+    :param rel: the value of the rel attribute of the tag, if any
+    :return: STATIC if the link points to a static asset, PAGE if it points to a page, or None
+    if the link is ambiguous and an HTTP request is needed to classify it
+    """
+    extension = get_extension(url)
+    tag = tag.lower() if isinstance(tag, str) else ''
+    # Links found in inline CSS are always images or fonts
+    if attribute is None or attribute == 'style':
+        return STATIC
+    if tag in STATIC_SOURCE_TAGS and attribute in ('src', 'srcset', 'poster'):
+        return STATIC
+    if tag in ('video', 'object') and attribute in ('poster', 'data'):
+        return STATIC
+    if tag == 'link' and attribute == 'href':
+        rels = set((rel or '').lower().split())
+        if rels & STATIC_LINK_RELS:
+            return STATIC
+    if extension in STATIC_EXTENSIONS:
+        return STATIC
+    if tag in ANCHOR_TAGS and attribute == 'href' and extension in PAGE_EXTENSIONS:
+        return PAGE
+    return None
@@ -0,0 +1,168 @@
+import re
+import urllib.parse
+
+from lxml import etree
+
+# The attributes containing the links the crawler cares about, for each tag
+LINK_ATTRIBUTES = {
+    'a': ('href',),
+    'area': ('href',),
+    'link': ('href',),
+    'img': ('src', 'srcset'),
+    'script': ('src',),
+    'source': ('src', 'srcset'),
+    'video': ('src', 'poster'),
+    'audio': ('src',),
+    'track': ('src',),
+    'embed': ('src',),
+    'input': ('src',),
+    'iframe': ('src',),
+    'frame': ('src',),
+    'object': ('data',),
+}
+
+CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def parse_charset(content_type):
+    """
+    Gets the charset declared in the value of a Content-Type header.
+
+    :param content_type: the value of the header, or None
+    :return: the name of the charset, or None if no charset is declared
+    """
+    match = CHARSET_PATTERN.search(content_type or '')
+    return match.group(1) if match else None
+
+
+class _LinkCollector:
+    """
+    Parser target collecting the links of the relevant tags without building the document tree.
+    """
+
+    def __init__(self):
+        self.links = []
+
+    def start(self, tag, attrib):
+        attributes = LINK_ATTRIBUTES.get(tag)
+        if attributes is None:
+            return
+        for attribute in attributes:
+            value = attrib.get(attribute)
+            if not value:
+                continue
+            if attribute == 'srcset':
+                # Each candidate is an URL optionally followed by a descriptor
+                for candidate in value.split(','):
+                    candidate = candidate.split()
+                    if candidate:
+                        self.links.append((candidate[0], tag, attribute, None))
+            else:
+                self.links.append((value, tag, attribute, attrib.get('rel')))
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.links
+
+
+class LinkExtractor:
+    """
+    The LinkExtractor class extracts the valid links of a page, i.e. the links that are on the same
+    network location of a base URL but don't point to the base URL itself. Unlike lxml's iterlinks,
+    it parses the page without building the document tree, looks only at the tags and attributes
+    in LINK_ATTRIBUTES, and returns every link only once. Joined and validated URLs are memoized,
+    since the same relative links are found on most pages of a website.
+    """
+
+    def __init__(self, base_url, cache_size=100000):
+        """
+        Constructor.
+
+        :param base_url: the URL that will be taken as baseline
+        :param cache_size: the maximum number of links memoized
+        """
+        if not base_url:
+            raise ValueError('Base URL not set before asking to extract links.')
+        self.base_url = base_url
+        self.cache_size = cache_size
+        base_url_split = urllib.parse.urlsplit(base_url)
+        self._base_netloc = base_url_split.netloc
+        self._base_path = base_url_split.path
+        self._resolved_links = {}
+
+    def _resolve(self, link):
+        """
+        Brings a link to an absolute URL and validates it.
+
+        :param link: the link as found in the page
+        :return: the absolute URL if it is valid, None otherwise
+        """
+        resolved_link = self._resolved_links.get(link, False)
+        if resolved_link is not False:
+            return resolved_link
+        url = urllib.parse.urljoin(self.base_url, link.strip())
+        url_split = urllib.parse.urlsplit(url)
+        resolved_link = url if url_split.netloc == self._base_netloc and url_split.path != self._base_path else None
+        if len(self._resolved_links) >= self.cache_size:
+            self._resolved_links.clear()
+        self._resolved_links[link] = resolved_link
+        return resolved_link
+
+    def extract(self, page, encoding=None):
+        """
+        Extracts the valid links of a page.
+
+        :param page: an HTML page as bytes or string
+        :param encoding: the charset declared by the server for a page given as bytes. If None,
+        the charset declared in the page itself is used
+        :return: a list of tuples (url, tag, attribute, rel), one for each distinct valid link, in
+        the order they are found in the page
+        """
+        return self.extract_chunks([page], encoding)
+
+    def extract_chunks(self, chunks, encoding=None):
+        """
+        Extracts the valid links of a page given in chunks, parsing each chunk as soon as it is
+        available, so that the whole page doesn't need to be kept in memory.
+
+        :param chunks: an iterable over the chunks of an HTML page, all bytes or all strings
+        :param encoding: the charset declared by the server for a page given as bytes. If None,
+        the charset declared in the page itself is used
+        :return: a list of tuples (url, tag, attribute, rel), one for each distinct valid link, in
+        the order they are found in the page
+        """
+        parser = None
+        try:
+            for chunk in chunks:
+                if parser is None:
+                    if isinstance(chunk, bytes):
+                        try:
+                            parser = etree.HTMLParser(target=_LinkCollector(), encoding=encoding)
+                        except LookupError:
+                            # Unknown charsets declared by the server are ignored, lxml detects the encoding
+                            parser = etree.HTMLParser(target=_LinkCollector())
+                    else:
+                        parser = etree.HTMLParser(target=_LinkCollector())
+                parser.feed(chunk)
+            if parser is None:
+                return []
+            links = parser.close()
+        except etree.ParserError:
+            # Empty or unparsable documents have no links
+            return []
+        valid_links = []
+        already_found = set()
+        for link, tag, attribute, rel in links:
+            url = self._resolve(link)
+            if url is not None and url not in already_found:
+                already_found.add(url)
+                valid_links.append((url, tag, attribute, rel))
+        return valid_links
@@ -0,0 +1,253 @@
+import http.server
+import json
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+
+# The phases a crawl spends its time in
+PHASES = ('fetch', 'parse', 'classify', 'enqueue')
+
+
+class CrawlMetrics:
+    """
+    The CrawlMetrics class collects the measures of a crawl: the time spent in each phase, the
+    requests sent by method and status code, the bytes received and the size of the frontier
+    over time. It is shared by the Spider and its URLParser, and it is thread safe, so that the
+    threads classifying the links can record their requests.
+    """
+
+    def __init__(self, max_samples=1000, clock=time.perf_counter):
+        """
+        Constructor.
+
+        :param max_samples: the maximum number of frontier size samples kept. When reached, every
+        other sample is discarded and samples are taken half as often, so that the whole crawl is
+        still covered.
+        :param clock: the function returning the current time in seconds
+        """
+        self.max_samples = max_samples
+        self.clock = clock
+        self.start_time = clock()
+        self.pages = 0
+        self.bytes_received = 0
+        self.frontier_size = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.phases = {phase: {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0} for phase in PHASES}
+        # Maps (method, status) to the number of requests, status is None for connection errors
+        self.requests = {}
+        self.frontier_samples = []
+        self._sample_every = 1
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Context manager measuring the time spent in a phase.
+
+        :param phase: the name of the phase, one of PHASES
+        """
+        start_time = self.clock()
+        try:
+            yield
+        finally:
+            self.record_phase(phase, self.clock() - start_time)
+
+    def record_phase(self, phase, seconds):
+        """
+        Records the time spent once in a phase.
+
+        :param phase: the name of the phase
+        :param seconds: the elapsed time
+        """
+        with self._lock:
+            measures = self.phases.setdefault(phase, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            measures['count'] += 1
+            measures['seconds'] += seconds
+            measures['max_seconds'] = max(measures['max_seconds'], seconds)
+
+    def record_request(self, method, status=None):
+        """
+        Records an HTTP request.
+
+        :param method: the HTTP method
+        :param status: the status code of the response, None if no response was received
+        """
+        with self._lock:
+            key = method, status
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def record_timeout(self):
+        """
+        Records a request, or the read of a body, which failed because of a timeout.
+        """
+        with self._lock:
+            self.timeouts += 1
+
+    def record_retry(self):
+        """
+        Records a request sent again after a transient failure.
+        """
+        with self._lock:
+            self.retries += 1
+
+    def record_bytes(self, size):
+        """
+        Records the bytes of a body received.
+
+        :param size: the number of bytes received
+        """
+        with self._lock:
+            self.bytes_received += size
+
+    def record_page(self, frontier_size):
+        """
+        Records a visited page, sampling the size of the frontier.
+
+        :param frontier_size: the number of pages waiting to be visited
+        """
+        with self._lock:
+            self.pages += 1
+            self.frontier_size = frontier_size
+            if self.pages % self._sample_every:
+                return
+            self.frontier_samples.append((round(self.clock() - self.start_time, 3), self.pages, frontier_size))
+            if len(self.frontier_samples) >= self.max_samples:
+                self.frontier_samples = self.frontier_samples[1::2]
+                self._sample_every *= 2
+
+    def snapshot(self):
+        """
+        Returns the measures collected so far.
+
+        :return: a dictionary which can be serialized as JSON
+        """
+        with self._lock:
+            elapsed_time = self.clock() - self.start_time
+            requests = {}
+            for (method, status), count in self.requests.items():
+                requests.setdefault(method, {})[str(status) if status is not None else 'error'] = count
+            return {
+                'elapsed_seconds': round(elapsed_time, 3),
+                'pages': self.pages,
+                'pages_per_second': round(self.pages / elapsed_time, 3) if elapsed_time > 0 else 0.0,
+                'requests': requests,
+                'total_requests': sum(self.requests.values()),
+                'bytes_received': self.bytes_received,
+                'timeouts': self.timeouts,
+                'retries': self.retries,
+                'phases': {phase: {'count': measures['count'], 'seconds': round(measures['seconds'], 6),
+                                   'max_seconds': round(measures['max_seconds'], 6)}
+                           for phase, measures in self.phases.items()},
+                'frontier_size': self.frontier_size,
+                'frontier_samples': list(self.frontier_samples),
+            }
+
+    def progress_line(self):
+        """
+        Returns a one-line summary of the progress of the crawl.
+
+        :return: a string
+        """
+        snapshot = self.snapshot()
+        phases = ', '.join('{} {:.2f}s'.format(phase, measures['seconds'])
+                           for phase, measures in snapshot['phases'].items())
+        return '{pages} pages in {elapsed_seconds:.1f}s ({pages_per_second:.1f}/s), {total_requests} requests, ' \
+               '{kilobytes:.0f} KB, {timeouts} timeouts, {retries} retries, frontier {frontier_size} - {phase_times}'.format(
+                   kilobytes=snapshot['bytes_received'] / 1024.0, phase_times=phases, **snapshot)
+
+    def save(self, path):
+        """
+        Saves the measures collected so far to a JSON file.
+
+        :param path: the path of the file
+        """
+        with open(path, 'w') as metrics_file:
+            json.dump(self.snapshot(), metrics_file, indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Returns the measures collected so far in the Prometheus text exposition format.
+
+        :return: a string
+        """
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP crawler_pages_total Pages visited.',
+            '# TYPE crawler_pages_total counter',
+            'crawler_pages_total {}'.format(snapshot['pages']),
+            '# HELP crawler_bytes_received_total Bytes of the bodies received.',
+            '# TYPE crawler_bytes_received_total counter',
+            'crawler_bytes_received_total {}'.format(snapshot['bytes_received']),
+            '# HELP crawler_timeouts_total Requests and body reads which timed out.',
+            '# TYPE crawler_timeouts_total counter',
+            'crawler_timeouts_total {}'.format(snapshot['timeouts']),
+            '# HELP crawler_retries_total Requests retried after a transient failure.',
+            '# TYPE crawler_retries_total counter',
+            'crawler_retries_total {}'.format(snapshot['retries']),
+            '# HELP crawler_frontier_size Pages waiting to be visited.',
+            '# TYPE crawler_frontier_size gauge',
+            'crawler_frontier_size {}'.format(snapshot['frontier_size']),
+            '# HELP crawler_requests_total HTTP requests sent, by method and status code.',
+            '# TYPE crawler_requests_total counter',
+        ]
+        for method, statuses in sorted(snapshot['requests'].items()):
+            for status, count in sorted(statuses.items()):
+                lines.append('crawler_requests_total{{method="{}",status="{}"}} {}'.format(method, status, count))
+        lines.extend(['# HELP crawler_phase_seconds_total Time spent in each phase of the crawl.',
+                      '# TYPE crawler_phase_seconds_total counter'])
+        for phase, measures in sorted(snapshot['phases'].items()):
+            lines.append('crawler_phase_seconds_total{{phase="{}"}} {}'.format(phase, measures['seconds']))
+        lines.extend(['# HELP crawler_phase_calls_total Number of times each phase of the crawl ran.',
+                      '# TYPE crawler_phase_calls_total counter'])
+        for phase, measures in sorted(snapshot['phases'].items()):
+            lines.append('crawler_phase_calls_total{{phase="{}"}} {}'.format(phase, measures['count']))
+        return '\n'.join(lines) + '\n'
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    """
+    Serves the measures of a crawl in the Prometheus text exposition format at /metrics, from a
+    background thread.
+    """
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        """
+        Constructor. Starts the server.
+
+        :param metrics: the CrawlMetrics to serve
+        :param port: the port the server listens on, 0 to pick a free one
+        :param host: the address the server listens on
+        """
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self.url = 'http://{}:{}/metrics'.format(host, self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.1},
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
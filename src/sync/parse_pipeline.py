@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from src.sync.url_parser import extract_valid_links
+
+
+class ParsePipeline:
+    """
+    The ParsePipeline class overlaps fetching and parsing: pages are fetched ahead of time by
+    the URLParser in the current process, while their HTML is parsed and their links are
+    extracted by a pool of worker processes, so that parsing isn't bound to a single core.
+    Workers receive the bytes of a page and return compact (url, tag, attribute, rel) tuples,
+    which are then classified by the URLParser.
+    """
+
+    def __init__(self, url_parser, max_workers, window=None):
+        """
+        Constructor. Starts the worker processes.
+
+        :param url_parser: the URLParser used to fetch the pages and classify their links
+        :param max_workers: the number of worker processes
+        :param window: the maximum number of pages fetched ahead of time, by default twice the
+        number of workers
+        """
+        if max_workers < 1:
+            raise ValueError('The number of parse workers must be a positive integer.')
+        self.url_parser = url_parser
+        self.window = window or 2 * max_workers
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        # Maps the fetched URLs to the tuples (future, fingerprint, static_assets) where the future
+        # returns the links of the page, and static_assets are the ones of the page it duplicates,
+        # if any. URLs which couldn't be fetched are mapped to None.
+        self._pending = OrderedDict()
+
+    def prefetch(self, urls):
+        """
+        Fetches the given pages and dispatches their parsing to the workers, unless they are
+        already pending or the window is full. Pending pages that aren't among the given ones
+        anymore, e.g. demoted by a PriorityFrontier, are discarded, so that they don't hold the
+        window.
+
+        :param urls: the URLs that are going to be parsed next, in order
+        """
+        urls = list(urls)
+        next_urls = set(urls)
+        for url in [url for url in self._pending if url not in next_urls]:
+            self._discard(url)
+        for url in urls:
+            if len(self._pending) >= self.window:
+                break
+            if url not in self._pending:
+                self._fetch(url)
+
+    def _fetch(self, url):
+        fetched_page = self.url_parser._fetch_page(url)
+        if fetched_page is None:
+            self._pending[url] = None
+            return
+        page, encoding = fetched_page
+        fingerprint = static_assets = None
+        if self.url_parser.duplicates is not None:
+            fingerprint, static_assets = self.url_parser._find_duplicate(url, page)
+            if static_assets is not None:
+                self._pending[url] = None, fingerprint, static_assets
+                return
+        future = self._executor.submit(extract_valid_links, page, self.url_parser.base_url,
+                                       self.url_parser.strict, encoding)
+        self._pending[url] = future, fingerprint, None
+
+    def _discard(self, url):
+        pending_page = self._pending.pop(url)
+        if pending_page is not None and pending_page[0] is not None:
+            pending_page[0].cancel()
+
+    def parse_url(self, url):
+        """
+        Returns the static and non-static assets of the given page, fetching it now if it wasn't
+        prefetched.
+
+        :param url: the URL of the page
+        :return: the tuple (static_assets, links_to_follow) where the former element represents the
+        list of static assets found while the latter is a list of non-static assets found in the page.
+        """
+        if url not in self._pending:
+            self._fetch(url)
+        pending_page = self._pending.pop(url, None)
+        if pending_page is None:
+            return [], []
+        future, fingerprint, static_assets = pending_page
+        if static_assets is not None:
+            return static_assets, []
+        metrics = self.url_parser.metrics
+        if metrics is None:
+            valid_links = future.result()
+        else:
+            # In the current process, parsing costs the time spent waiting for the workers
+            with metrics.timer('parse'):
+                valid_links = future.result()
+        static_assets, links_to_follow = self.url_parser._classify_links(valid_links)
+        if fingerprint is not None:
+            self.url_parser._index_page(url, fingerprint, valid_links, static_assets)
+        return static_assets, links_to_follow
+
+    def close(self):
+        """
+        Stops the worker processes, discarding the pending pages.
+        """
+        for url in list(self._pending):
+            self._discard(url)
+        self._executor.shutdown(wait=True)
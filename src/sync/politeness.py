@@ -0,0 +1,321 @@
+import email.utils
+import http.client
+import io
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.robotparser
+
+from src.sync.content import iter_body
+
+# Status codes telling that the server is overloaded or that the crawler is too fast
+THROTTLING_CODES = frozenset([429, 503])
+
+# The number of bytes of robots.txt that are parsed, the rest is ignored as Google does
+MAX_ROBOTS_SIZE = 500 * 1024
+
+
+class RobotsDisallowedError(urllib.error.HTTPError):
+    """
+    Raised by the PoliteTransport for URLs that robots.txt doesn't allow to fetch.
+    """
+
+    def __init__(self, url):
+        super().__init__(url, 403, 'Disallowed by robots.txt', http.client.HTTPMessage(), io.BytesIO(b''))
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parses the value of a Retry-After header.
+
+    :param value: the value of the header, either a number of seconds or an HTTP date
+    :param now: the current time as a unix timestamp, by default time.time()
+    :return: the number of seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_date is None:
+        return None
+    return max(0.0, retry_date.timestamp() - (now if now is not None else time.time()))
+
+
+class HostState:
+    """
+    The HostState class keeps the pacing state of a single host: a token bucket refilled at the
+    current rate, the robots.txt rules and the backoff imposed by throttling responses.
+    """
+
+    def __init__(self, rate, max_rate, now):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated_at = now
+        self.backoff_until = now
+        self.consecutive_throttles = 0
+        self.consecutive_successes = 0
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.robots = None
+
+
+class PolitenessScheduler:
+    """
+    The PolitenessScheduler class paces the requests sent to each host. Every host has a token bucket
+    refilled at an adaptive rate: the rate is halved and requests are paused whenever the host answers
+    429 or 503 (for the time given by Retry-After, or with an exponential backoff), and it is slowly
+    increased again while responses are healthy. The rate never exceeds the one allowed by the
+    Crawl-delay of robots.txt, whose Disallow rules are honored as well. The scheduler is thread safe.
+    """
+
+    def __init__(self, rate=5.0, min_rate=0.5, max_rate=50.0, user_agent='*', respect_robots=True,
+                 max_backoff=60.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Constructor.
+
+        :param rate: the initial number of requests per second sent to each host
+        :param min_rate: the minimum number of requests per second the rate can be decreased to
+        :param max_rate: the maximum number of requests per second the rate can be increased to
+        :param user_agent: the user agent whose robots.txt rules are honored
+        :param respect_robots: if False, robots.txt is not fetched
+        :param max_backoff: the maximum number of seconds a host is paused after throttling responses
+        :param clock: the function returning the current time in seconds
+        :param sleep: the function used to wait
+        """
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError('Rates must satisfy 0 < min_rate <= rate <= max_rate.')
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _get_host(self, url):
+        """
+        Returns the state of the host of the given URL, creating it if needed. Must be called
+        holding the lock.
+
+        :param url: an absolute URL
+        :return: the HostState
+        """
+        netloc = urllib.parse.urlsplit(url).netloc
+        if netloc not in self._hosts:
+            self._hosts[netloc] = HostState(self.rate, self.max_rate, self.clock())
+        return self._hosts[netloc]
+
+    def load_robots(self, url, transport):
+        """
+        Fetches and parses the robots.txt of the host of the given URL, unless already done. A
+        robots.txt that can't be fetched allows everything, and only its first MAX_ROBOTS_SIZE bytes
+        are parsed.
+
+        :param url: an absolute URL
+        :param transport: the transport used to fetch robots.txt
+        """
+        if not self.respect_robots:
+            return
+        with self._lock:
+            host = self._get_host(url)
+            if host.robots is not None:
+                return
+        split = urllib.parse.urlsplit(url)
+        robots_url = urllib.parse.urlunsplit((split.scheme, split.netloc, '/robots.txt', '', ''))
+        robots = urllib.robotparser.RobotFileParser()
+        try:
+            chunks = iter_body(transport.send(robots_url, 'GET'), robots_url)
+            body = []
+            size = 0
+            try:
+                for chunk in chunks:
+                    body.append(chunk)
+                    size += len(chunk)
+                    if size >= MAX_ROBOTS_SIZE:
+                        break
+            finally:
+                chunks.close()
+            robots.parse(b''.join(body)[:MAX_ROBOTS_SIZE].decode('utf-8', errors='replace').splitlines())
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            robots.parse([])
+        crawl_delay = robots.crawl_delay(self.user_agent)
+        with self._lock:
+            host.robots = robots
+            if crawl_delay:
+                host.max_rate = min(host.max_rate, 1.0 / float(crawl_delay))
+                host.rate = min(host.rate, host.max_rate)
+
+    def allowed(self, url):
+        """
+        Tells whether robots.txt allows to fetch the given URL. URLs of hosts whose robots.txt has
+        not been loaded are allowed.
+
+        :param url: an absolute URL
+        :return: True if the URL can be fetched, False otherwise
+        """
+        with self._lock:
+            robots = self._get_host(url).robots
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    def acquire(self, url):
+        """
+        Waits until a request to the host of the given URL can be sent.
+
+        :param url: the URL that is going to be requested
+        :return: the number of seconds waited
+        """
+        with self._lock:
+            host = self._get_host(url)
+            now = self.clock()
+            host.tokens = min(1.0, host.tokens + (now - host.updated_at) * host.rate)
+            host.updated_at = now
+            # Takes a token, possibly in advance: the wait pays it back
+            host.tokens -= 1.0
+            wait = max(-host.tokens / host.rate, host.backoff_until - now, 0.0)
+            host.requests += 1
+            host.waiting += 1
+        try:
+            if wait > 0:
+                self.sleep(wait)
+        finally:
+            with self._lock:
+                host.waiting -= 1
+        return wait
+
+    def record(self, url, status_code, retry_after=None):
+        """
+        Adapts the rate of the host of the given URL to the status code of a response.
+
+        :param url: the requested URL
+        :param status_code: the HTTP status code of the response
+        :param retry_after: the value of the Retry-After header of the response, if any
+        :return: the number of seconds the host is paused for
+        """
+        with self._lock:
+            host = self._get_host(url)
+            now = self.clock()
+            if status_code in THROTTLING_CODES:
+                host.throttled += 1
+                host.consecutive_successes = 0
+                host.consecutive_throttles += 1
+                host.rate = max(self.min_rate, host.rate / 2)
+                backoff = parse_retry_after(retry_after)
+                if backoff is None:
+                    backoff = 2 ** (host.consecutive_throttles - 1)
+                backoff = min(backoff, self.max_backoff)
+                host.backoff_until = max(host.backoff_until, now + backoff)
+                return backoff
+            host.consecutive_throttles = 0
+            host.consecutive_successes += 1
+            # Ramps up after about one second worth of healthy responses
+            if host.consecutive_successes >= host.rate:
+                host.consecutive_successes = 0
+                host.rate = min(host.max_rate, host.rate * 1.25)
+            return 0.0
+
+    def metrics(self):
+        """
+        Returns the current pacing state of each host.
+
+        :return: a dictionary mapping each host to its rate in requests per second, queue depth
+        (requests waiting to be sent), number of requests and number of throttling responses
+        """
+        now = self.clock()
+        with self._lock:
+            return {netloc: {'rate': round(host.rate, 3), 'queue_depth': host.waiting, 'requests': host.requests,
+                             'throttled': host.throttled, 'backoff': round(max(0.0, host.backoff_until - now), 3)}
+                    for netloc, host in self._hosts.items()}
+
+
+class PoliteTransport:
+    """
+    The PoliteTransport class wraps another transport with a PolitenessScheduler: robots.txt is
+    honored, every request waits for its turn, and throttled requests are retried after the backoff.
+    Only the requests sent over the network should be paced: in front of a cache or an archive, a
+    PoliteTransport honoring robots.txt goes above it and one pacing the requests below it.
+    """
+
+    def __init__(self, transport, scheduler, max_retries=2, robots=True, pace=True):
+        """
+        Constructor.
+
+        :param transport: the transport used to send the requests
+        :param scheduler: the PolitenessScheduler
+        :param max_retries: the number of times a throttled request is retried
+        :param robots: if True, robots.txt is fetched through the wrapped transport and honored
+        :param pace: if True, every request waits for its turn and throttled requests are retried
+        """
+        self.transport = transport
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.robots = robots
+        self.pace = pace
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Sends the request as soon as the scheduler allows it, retrying it if the host throttles it.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :param timeout: an optional timeout in seconds for the blocking operations
+        :return: the related HTTP response
+        """
+        if self.robots:
+            self.scheduler.load_robots(url, self.transport)
+            if not self.scheduler.allowed(url):
+                raise RobotsDisallowedError(url)
+        if not self.pace:
+            return self.transport.send(url, method, headers=headers, timeout=timeout)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(url)
+            try:
+                response = self.transport.send(url, method, headers=headers, timeout=timeout)
+            except urllib.error.HTTPError as http_err:
+                self.scheduler.record(url, http_err.code, http_err.headers.get('Retry-After') if http_err.headers
+                                      else None)
+                if http_err.code not in THROTTLING_CODES or attempt == self.max_retries:
+                    raise
+                continue
+            self.scheduler.record(url, getattr(response, 'status', 200))
+            return response
+
+    def stats(self):
+        """
+        Returns the statistics of the wrapped transport.
+
+        :return: a dictionary with the counters
+        """
+        return self.transport.stats()
+
+    def close(self):
+        """
+        Closes the wrapped transport.
+        """
+        self.transport.close()
+
+
+def is_paced(transport):
+    """
+    Tells whether the requests a transport sends over the network are already paced, i.e. whether
+    a PoliteTransport pacing them is found among the transports it wraps, or it doesn't send any.
+
+    :param transport: a transport, possibly wrapping other transports
+    :return: True if the requests are paced, False otherwise
+    """
+    while transport is not None:
+        if (isinstance(transport, PoliteTransport) and transport.pace) or getattr(transport, 'offline', False):
+            return True
+        transport = getattr(transport, 'transport', None)
+    return False
@@ -0,0 +1,180 @@
+"""
+This module contains the ResultStore, which saves the results of a crawl in an SQLite database
+while crawling, instead of keeping them in memory: pages, with their status code, final URL and
+timings, assets and the edges linking each page to its assets. The database can then be queried,
+e.g. for the pages using an asset, and exported to the results returned by Spider.crawl.
+"""
+import itertools
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class ResultStore:
+    """
+    The ResultStore class writes the result of each page to an SQLite database. Results are
+    buffered and written in batches, one transaction per batch, so that a crawl doesn't pay a
+    transaction per page. Every asset is stored once, and pages are linked to their assets by
+    the page_assets table, in the order the assets were found. A page stored again, e.g. by a
+    resumed crawl, replaces the previous one.
+    """
+
+    def __init__(self, path, batch_size=100, reset=False):
+        """
+        Constructor. Opens or creates the database.
+
+        :param path: the path of the database
+        :param batch_size: the number of pages written in each transaction
+        :param reset: if True, the results left in the database by a previous crawl are deleted
+        """
+        if batch_size < 1:
+            raise ValueError('The size of the batches must be a positive integer.')
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = []
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, url TEXT UNIQUE, final_url TEXT,
+                                              status INTEGER, content_type TEXT, error TEXT, alias_of TEXT,
+                                              fetch_seconds REAL, total_seconds REAL, crawled_at REAL);
+            CREATE TABLE IF NOT EXISTS assets (id INTEGER PRIMARY KEY, url TEXT UNIQUE);
+            CREATE TABLE IF NOT EXISTS page_assets (page_id INTEGER, position INTEGER, asset_id INTEGER,
+                                                    PRIMARY KEY (page_id, position)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS page_assets_asset ON page_assets (asset_id);
+        """)
+        if reset:
+            self._connection.executescript('DELETE FROM page_assets; DELETE FROM assets; DELETE FROM pages;')
+
+    def add(self, result, details=None, total_seconds=None):
+        """
+        Adds the result of a page, writing the pending results if the batch is full.
+
+        :param result: a dictionary containing the URL of a page together with its static assets
+        :param details: an optional dictionary with the status, final_url, content_type, error and
+        fetch_seconds of the page, as recorded by the URLParser
+        :param total_seconds: the number of seconds spent on the page, fetching and parsing it
+        and classifying its links
+        """
+        details = details or {}
+        self._pending.append((result['url'], details.get('final_url'), details.get('status'),
+                              details.get('content_type'), details.get('error'), result.get('alias_of'),
+                              details.get('fetch_seconds'), total_seconds, time.time(), result['assets']))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the pending results in a single transaction.
+        """
+        if not self._pending:
+            return
+        # A page added twice in the same batch is written once, with its last result
+        pending = list(OrderedDict((row[0], row) for row in self._pending).values())
+        self._pending = []
+        urls = [(row[0],) for row in pending]
+        with self._connection:
+            self._connection.executemany('DELETE FROM page_assets WHERE page_id IN '
+                                         '(SELECT id FROM pages WHERE url = ?)', urls)
+            self._connection.executemany('DELETE FROM pages WHERE url = ?', urls)
+            self._connection.executemany('INSERT INTO pages (url, final_url, status, content_type, error, alias_of, '
+                                         'fetch_seconds, total_seconds, crawled_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                         [row[:-1] for row in pending])
+            self._connection.executemany('INSERT OR IGNORE INTO assets (url) VALUES (?)',
+                                         [(asset,) for row in pending for asset in row[-1]])
+            self._connection.executemany('INSERT INTO page_assets SELECT pages.id, ?, assets.id FROM pages, assets '
+                                         'WHERE pages.url = ? AND assets.url = ?',
+                                         [(position, row[0], asset) for row in pending
+                                          for position, asset in enumerate(row[-1])])
+
+    def __len__(self):
+        self.flush()
+        return self._connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def iter_results(self):
+        """
+        Returns the stored results in the form returned by Spider.crawl, reading them from the
+        database one page at a time.
+
+        :return: an iterator over dictionaries containing the URL of a visited page together with
+        its static assets, in the order they have been stored
+        """
+        self.flush()
+        rows = self._connection.execute('SELECT pages.id, pages.url, pages.alias_of, assets.url FROM pages '
+                                        'LEFT JOIN page_assets ON page_assets.page_id = pages.id '
+                                        'LEFT JOIN assets ON assets.id = page_assets.asset_id '
+                                        'ORDER BY pages.id, page_assets.position')
+        for _, page_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            page_rows = list(page_rows)
+            result = {'url': page_rows[0][1], 'assets': [row[3] for row in page_rows if row[3] is not None]}
+            if page_rows[0][2] is not None:
+                result['alias_of'] = page_rows[0][2]
+            yield result
+
+    def get_page(self, url):
+        """
+        :param url: the URL of a page
+        :return: a dictionary with the URL, final URL, status, Content-Type, error, alias_of,
+        fetch and total seconds and crawl time of the page, or None if it isn't stored
+        """
+        self.flush()
+        cursor = self._connection.execute('SELECT url, final_url, status, content_type, error, alias_of, '
+                                          'fetch_seconds, total_seconds, crawled_at FROM pages WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row is not None else None
+
+    def pages_using(self, asset_url):
+        """
+        :param asset_url: the URL of a static asset
+        :return: the list of the URLs of the pages using the asset, in the order they have been stored
+        """
+        self.flush()
+        return [row[0] for row in self._connection.execute(
+            'SELECT DISTINCT pages.url, pages.id FROM assets JOIN page_assets ON page_assets.asset_id = assets.id '
+            'JOIN pages ON pages.id = page_assets.page_id WHERE assets.url = ? ORDER BY pages.id', (asset_url,))]
+
+    def assets_of(self, url):
+        """
+        :param url: the URL of a page
+        :return: the list of the static assets of the page, or None if it isn't stored
+        """
+        self.flush()
+        if self._connection.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is None:
+            return None
+        return [row[0] for row in self._connection.execute(
+            'SELECT assets.url FROM pages JOIN page_assets ON page_assets.page_id = pages.id '
+            'JOIN assets ON assets.id = page_assets.asset_id WHERE pages.url = ? ORDER BY page_assets.position',
+            (url,))]
+
+    def pages_with_status(self, status):
+        """
+        :param status: an HTTP status code, or None for the pages whose request failed without one
+        :return: the list of the URLs of the pages with the given status, in the order they have been stored
+        """
+        self.flush()
+        condition = 'status IS NULL AND error IS NOT NULL' if status is None else 'status = ?'
+        return [row[0] for row in self._connection.execute(
+            'SELECT url FROM pages WHERE {} ORDER BY id'.format(condition), () if status is None else (status,))]
+
+    def stats(self):
+        """
+        :return: a dictionary with the number of pages, assets and page to asset edges, the number of
+        pages by status code and the total seconds spent on the pages
+        """
+        self.flush()
+        counts = {table: self._connection.execute('SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0]
+                  for table in ('pages', 'assets', 'page_assets')}
+        statuses = {str(status) if status is not None else 'none': pages for status, pages in
+                    self._connection.execute('SELECT status, COUNT(*) FROM pages GROUP BY status')}
+        total_seconds = self._connection.execute('SELECT SUM(total_seconds) FROM pages').fetchone()[0]
+        return {'pages': counts['pages'], 'assets': counts['assets'], 'edges': counts['page_assets'],
+                'statuses': statuses, 'total_seconds': round(total_seconds or 0.0, 6)}
+
+    def close(self):
+        """
+        Writes the pending results and closes the database.
+        """
+        if self._connection is None:
+            return
+        self.flush()
+        self._connection.close()
+        self._connection = None
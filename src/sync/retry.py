@@ -0,0 +1,127 @@
+"""
+This module contains the RetryingTransport, which retries the requests failing for transient
+reasons (timeouts, refused or reset connections, temporary server errors) with an exponential
+backoff and a random jitter, so that the retries of many workers don't hit a server together.
+"""
+import random
+import socket
+import time
+import urllib.error
+
+from src.sync.politeness import parse_retry_after
+
+# The status codes of the responses worth retrying
+RETRY_CODES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+def is_timeout(error):
+    """
+    Tells if an error has been caused by a timeout.
+
+    :param error: an exception raised while sending a request or reading a response
+    :return: True if the error is a timeout
+    """
+    if isinstance(error, urllib.error.URLError) and not isinstance(error, urllib.error.HTTPError):
+        error = error.reason
+    return isinstance(error, socket.timeout)
+
+
+def is_transient(error, retry_codes=RETRY_CODES):
+    """
+    Tells if a request failed for a reason which may not happen again.
+
+    :param error: the urllib.error.URLError raised by a transport
+    :param retry_codes: the status codes worth retrying
+    :return: True if the request is worth retrying
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in retry_codes
+    # Connection errors and timeouts have an OSError as reason, unlike invalid URLs
+    return isinstance(error.reason, OSError)
+
+
+class RetryingTransport:
+    """
+    The RetryingTransport class wraps another transport, retrying the requests which fail for
+    transient reasons. The n-th retry waits a random time between 0 and backoff * 2 ** (n - 1)
+    seconds ("full jitter"), or the time asked by the Retry-After header of the response, if
+    longer, never more than max_backoff seconds.
+    """
+
+    def __init__(self, transport, max_retries=2, backoff=0.5, max_backoff=10.0, retry_codes=RETRY_CODES,
+                 metrics=None, sleep=time.sleep, random=random.random):
+        """
+        Constructor.
+
+        :param transport: the transport used to send the requests
+        :param max_retries: the number of times a failed request is retried
+        :param backoff: the maximum number of seconds waited before the first retry
+        :param max_backoff: the maximum number of seconds waited before any retry
+        :param retry_codes: the status codes of the responses worth retrying
+        :param metrics: an optional CrawlMetrics counting the retries
+        :param sleep: the function used to wait
+        :param random: the function returning a random number between 0 and 1
+        """
+        self.transport = transport
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_codes = retry_codes
+        self.metrics = metrics
+        self.sleep = sleep
+        self.random = random
+        self.retries = 0
+
+    def get_delay(self, attempt, error):
+        """
+        Returns the number of seconds to wait before retrying a request.
+
+        :param attempt: the number of attempts already made
+        :param error: the error of the last attempt
+        :return: the number of seconds
+        """
+        delay = self.random() * self.backoff * 2 ** (attempt - 1)
+        if isinstance(error, urllib.error.HTTPError) and error.headers is not None:
+            retry_after = parse_retry_after(error.headers.get('Retry-After'))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        return min(delay, self.max_backoff)
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Sends the request, retrying it while it fails for transient reasons.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :param timeout: an optional timeout in seconds for the blocking operations
+        :return: the related HTTP response
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.transport.send(url, method, headers=headers, timeout=timeout)
+            except urllib.error.URLError as err:
+                if attempt == self.max_retries or not is_transient(err, self.retry_codes):
+                    raise
+                attempt += 1
+                self.retries += 1
+                if self.metrics is not None:
+                    self.metrics.record_retry()
+                self.sleep(self.get_delay(attempt, err))
+
+    def stats(self):
+        """
+        Returns the statistics of the wrapped transport, together with the number of retries.
+
+        :return: a dictionary with the counters
+        """
+        stats = dict(self.transport.stats())
+        stats['retries'] = self.retries
+        return stats
+
+    def close(self):
+        """
+        Closes the wrapped transport.
+        """
+        self.transport.close()
@@ -0,0 +1,106 @@
+"""
+This module contains the scorers used by the PriorityFrontier to decide which page to visit
+next. A scorer is a callable receiving a URL, its depth (the number of links followed from the
+start URL to reach it) and the number of links to it found so far, and returning a number:
+pages with the highest total score are visited first. A scorer returning None rejects the URL,
+which is then never visited.
+"""
+import math
+import re
+import urllib.parse
+
+
+class DepthScorer:
+    """
+    Prefers the pages closer to the start URL.
+    """
+
+    def __init__(self, weight=1.0):
+        """
+        Constructor.
+
+        :param weight: the score lost for each link followed from the start URL
+        """
+        self.weight = weight
+
+    def __call__(self, url, depth, inlinks):
+        return -self.weight * depth
+
+
+class InlinkScorer:
+    """
+    Prefers the pages linked by many of the pages visited so far. The score grows with the
+    logarithm of the number of links, so that a page linked from every page doesn't overshadow
+    every other criterion.
+    """
+
+    def __init__(self, weight=1.0):
+        """
+        Constructor.
+
+        :param weight: the score gained each time the number of links to a page doubles
+        """
+        self.weight = weight
+
+    def __call__(self, url, depth, inlinks):
+        return self.weight * math.log2(max(inlinks, 1))
+
+
+class PatternScorer:
+    """
+    Adds a weight to the URLs matching regular expressions, e.g. a negative weight to calendar
+    or pagination links and a positive one to product pages.
+    """
+
+    def __init__(self, patterns):
+        """
+        Constructor.
+
+        :param patterns: a list of tuples (pattern, weight), where pattern is a regular expression
+        searched in the URL. The weights of every matching pattern are added.
+        """
+        self.patterns = [(re.compile(pattern), weight) for pattern, weight in patterns]
+
+    def __call__(self, url, depth, inlinks):
+        return sum(weight for pattern, weight in self.patterns if pattern.search(url))
+
+
+class PathFilter:
+    """
+    Rejects the URLs whose path isn't under one of the allowed prefixes, if any, or is under one
+    of the denied prefixes.
+    """
+
+    def __init__(self, allow=(), deny=()):
+        """
+        Constructor.
+
+        :param allow: the path prefixes the crawl is restricted to. If empty, every path is allowed.
+        :param deny: the path prefixes that are never visited, even if allowed
+        """
+        self.allow = tuple(allow)
+        self.deny = tuple(deny)
+
+    def __call__(self, url, depth, inlinks):
+        path = urllib.parse.urlsplit(url).path or '/'
+        if (self.allow and not path.startswith(self.allow)) or (self.deny and path.startswith(self.deny)):
+            return None
+        return 0
+
+
+def parse_pattern_weight(value):
+    """
+    Parses a pattern weight given on the command line.
+
+    :param value: a string PATTERN=WEIGHT, e.g. '/calendar/=-5'
+    :return: the tuple (pattern, weight)
+    :raise ValueError: if the value isn't valid
+    """
+    pattern, separator, weight = value.rpartition('=')
+    if not separator or not pattern:
+        raise ValueError('Expected PATTERN=WEIGHT, got {}.'.format(value))
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise ValueError('Invalid pattern {}: {}.'.format(pattern, e))
+    return pattern, float(weight)
@@ -0,0 +1,462 @@
+"""
+This module contains the CrawlService, which runs crawl jobs in a long-running process, and the
+ServiceServer, which exposes it through a small JSON API over HTTP, on a TCP port or a Unix socket.
+The jobs share the transport, and so the connections kept alive, the classification cache and the
+politeness state, which stay warm from one job to the next.
+"""
+import http.server
+import itertools
+import json
+import logging
+import os
+import queue
+import socketserver
+import stat
+import threading
+import time
+import urllib.parse
+
+from src.sync.metrics import CrawlMetrics, _ThreadingHTTPServer
+from src.sync.spider import Spider
+from src.sync.url_table import CompactResults
+
+# The states of a job, in the order they are reached
+QUEUED, RUNNING, FINISHED, FAILED, CANCELLED = 'queued', 'running', 'finished', 'failed', 'cancelled'
+
+FINAL_STATES = frozenset([FINISHED, FAILED, CANCELLED])
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised by the CrawlService when a job is submitted while its queue is full.
+    """
+
+
+class CrawlJob:
+    """
+    The CrawlJob class keeps the state of a crawl submitted to the CrawlService, together with
+    the results of the pages visited so far, stored in a CompactResults.
+    """
+
+    def __init__(self, job_id, start_url, max_pages, deadline=None):
+        """
+        Constructor.
+
+        :param job_id: the identifier of the job
+        :param start_url: the URL from which the crawling starts
+        :param max_pages: the maximum number of pages that can be visited
+        :param deadline: if given, the crawl stops after this many seconds
+        """
+        self.id = job_id
+        self.start_url = start_url
+        self.max_pages = max_pages
+        self.deadline = deadline
+        self.state = QUEUED
+        self.error = None
+        self.metrics = CrawlMetrics()
+        self.results = CompactResults()
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._condition = threading.Condition()
+
+    @property
+    def cancelled(self):
+        return self.state == CANCELLED
+
+    def _set_state(self, state, error=None):
+        with self._condition:
+            if self.state in FINAL_STATES:
+                return False
+            self.state = state
+            self.error = error
+            if state == RUNNING:
+                self.started_at = time.time()
+            elif state in FINAL_STATES:
+                self.finished_at = time.time()
+            self._condition.notify_all()
+            return True
+
+    def add_result(self, result):
+        """
+        Adds the result of a page, waking up the clients streaming the results.
+
+        :param result: a dictionary containing the URL of a page together with its static assets
+        """
+        with self._condition:
+            self.results.append(result)
+            self._condition.notify_all()
+
+    def cancel(self):
+        """
+        Cancels the job. A running job stops after the page being visited.
+
+        :return: True if the job has been cancelled, False if it was already over
+        """
+        return self._set_state(CANCELLED)
+
+    def wait(self, timeout=None):
+        """
+        Waits for the job to be over.
+
+        :param timeout: the maximum number of seconds to wait, None to wait forever
+        :return: True if the job is over
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.state in FINAL_STATES, timeout)
+
+    def iter_results(self, follow=True):
+        """
+        Returns the results of the pages visited by the job.
+
+        :param follow: if True, the results are yielded as soon as they are available until the
+        job is over. Otherwise, only the results available now are returned.
+        :return: an iterator over dictionaries containing the URL of a visited page together with
+        its static assets
+        """
+        index = 0
+        while True:
+            with self._condition:
+                if follow:
+                    self._condition.wait_for(lambda: index < len(self.results) or self.state in FINAL_STATES)
+                if index >= len(self.results):
+                    return
+                result = self.results[index]
+            index += 1
+            yield result
+
+    def status(self):
+        """
+        :return: a dictionary describing the job, which can be serialized as JSON
+        """
+        with self._condition:
+            metrics = self.metrics.snapshot()
+            del metrics['frontier_samples']
+            return {'id': self.id, 'url': self.start_url, 'max_pages': self.max_pages, 'deadline': self.deadline,
+                    'state': self.state, 'error': self.error, 'pages': len(self.results),
+                    'submitted_at': self.submitted_at, 'started_at': self.started_at,
+                    'finished_at': self.finished_at, 'metrics': metrics}
+
+
+class CrawlService:
+    """
+    The CrawlService class runs the crawl jobs submitted to it on a fixed number of threads,
+    queuing the others in a bounded queue. Each job is crawled by its own Spider, but all the
+    spiders share the same transport, classification cache and politeness scheduler, so that
+    short crawls don't pay the cost of opening connections and classifying links again.
+    Finished jobs are kept, with their results, until max_finished_jobs newer ones have finished.
+    Jobs can't exceed max_job_pages pages nor run for more than max_job_seconds.
+    """
+
+    def __init__(self, transport, cache, max_jobs=2, max_queued_jobs=16, max_finished_jobs=100,
+                 max_job_pages=10000, max_job_seconds=3600, enable_logging=True, **spider_options):
+        """
+        Constructor. Starts the threads running the jobs.
+
+        :param transport: the transport shared by the jobs, closed with the service
+        :param cache: the ClassificationCache shared by the jobs
+        :param max_jobs: the number of jobs running concurrently
+        :param max_queued_jobs: the maximum number of jobs waiting to be run
+        :param max_finished_jobs: the number of finished jobs whose results are kept
+        :param max_job_pages: the maximum number of pages a job can visit, None for no limit
+        :param max_job_seconds: the maximum number of seconds a job can run, None for no limit. Jobs
+        submitted without a deadline stop after this many seconds.
+        :param enable_logging: a flag being True if logs should be displayed
+        :param spider_options: the other keyword arguments of the Spider of each job, e.g.
+        politeness or strict. The functions creating the per crawl state, like visited_set, are
+        called once per job.
+        """
+        if max_jobs < 1:
+            raise ValueError('The number of concurrent jobs must be a positive integer.')
+        self.transport = transport
+        self.cache = cache
+        self.max_finished_jobs = max_finished_jobs
+        self.max_job_pages = max_job_pages
+        self.max_job_seconds = max_job_seconds
+        self.enable_logging = enable_logging
+        self.spider_options = spider_options
+        self.jobs = {}
+        self._finished_jobs = []
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queued_jobs)
+        self._threads = [threading.Thread(target=self._run_jobs, daemon=True) for _ in range(max_jobs)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, start_url, max_pages, deadline=None):
+        """
+        Queues a new crawl job.
+
+        :param start_url: the URL from which the crawling starts
+        :param max_pages: the maximum number of pages that can be visited
+        :param deadline: if given, the crawl stops after this many seconds. Otherwise the deadline of
+        the spider options is used, if any
+        :return: the CrawlJob
+        :raise ValueError: if the job exceeds the limits of the service
+        :raise JobQueueFullError: if the queue of the jobs waiting to be run is full
+        """
+        if self.max_job_pages is not None and max_pages > self.max_job_pages:
+            raise ValueError('A job can visit at most {} pages'.format(self.max_job_pages))
+        if deadline is not None and self.max_job_seconds is not None and deadline > self.max_job_seconds:
+            raise ValueError('A job can run for at most {} seconds'.format(self.max_job_seconds))
+        if deadline is None:
+            deadline = self.spider_options.get('deadline')
+            if self.max_job_seconds is not None:
+                deadline = min(deadline, self.max_job_seconds) if deadline is not None else self.max_job_seconds
+        with self._lock:
+            job = CrawlJob(str(next(self._job_ids)), start_url, max_pages, deadline=deadline)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFullError('{} jobs are already waiting to be run'.format(self._queue.maxsize))
+            self.jobs[job.id] = job
+        if self.enable_logging:
+            logging.info('Job {} queued: {} pages from {}'.format(job.id, max_pages, start_url))
+        return job
+
+    def get(self, job_id):
+        """
+        :param job_id: the identifier of a job
+        :return: the CrawlJob, or None if it doesn't exist or has been forgotten
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """
+        :return: the list of the jobs queued, running or recently finished, in the order they were submitted
+        """
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancels a job.
+
+        :param job_id: the identifier of a job
+        :return: the CrawlJob, or None if it doesn't exist or has been forgotten
+        """
+        job = self.get(job_id)
+        if job is not None and job.cancel() and self.enable_logging:
+            logging.info('Job {} cancelled'.format(job_id))
+        return job
+
+    def _create_spider(self, job):
+        """
+        Creates the Spider crawling a job, on the shared resources of the service.
+
+        :param job: a CrawlJob
+        :return: a Spider
+        """
+        options = dict(self.spider_options)
+        if job.deadline is not None:
+            options['deadline'] = job.deadline
+        return Spider(enable_logging=self.enable_logging, cache=self.cache, transport=self.transport,
+                      metrics=job.metrics, **options)
+
+    def _run_job(self, job):
+        """
+        Crawls a job, storing its results as soon as they are available.
+
+        :param job: a CrawlJob
+        """
+        if not job._set_state(RUNNING):
+            return
+        results = None
+        try:
+            # The spider isn't closed at the end of the job, since its transport is shared
+            results = self._create_spider(job).iter_crawl(job.start_url, job.max_pages)
+            for result in results:
+                if job.cancelled:
+                    break
+                job.add_result(result)
+        except Exception as e:
+            if self.enable_logging:
+                logging.exception('Job {} failed'.format(job.id))
+            job._set_state(FAILED, error=str(e))
+        finally:
+            if results is not None:
+                results.close()
+        job._set_state(FINISHED)
+        if self.enable_logging:
+            logging.info('Job {} {}: {} pages'.format(job.id, job.state, len(job.results)))
+
+    def _forget_old_jobs(self, job):
+        """
+        Records a job as over, forgetting the oldest finished jobs if needed.
+
+        :param job: the CrawlJob which is over
+        """
+        with self._lock:
+            self._finished_jobs.append(job.id)
+            while len(self._finished_jobs) > self.max_finished_jobs:
+                self.jobs.pop(self._finished_jobs.pop(0), None)
+
+    def _run_jobs(self):
+        """
+        Runs the queued jobs, one at a time, until the service is closed.
+        """
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run_job(job)
+            self._forget_old_jobs(job)
+
+    def stats(self):
+        """
+        :return: a dictionary with the number of jobs in each state, and the statistics of the
+        shared classification cache and transport
+        """
+        jobs = self.list_jobs()
+        states = {state: 0 for state in (QUEUED, RUNNING, FINISHED, FAILED, CANCELLED)}
+        for job in jobs:
+            states[job.state] += 1
+        return {'jobs': states, 'cache': self.cache.stats(), 'transport': self.transport.stats()}
+
+    def close(self):
+        """
+        Cancels the jobs queued or running, waits for the running ones to stop and closes the
+        shared transport.
+        """
+        for job in self.list_jobs():
+            job.cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.transport.close()
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ServiceServer:
+    """
+    Serves the job API of a CrawlService from a background thread. Requests and responses are
+    JSON objects:
+
+    - POST /jobs with {"url": ..., "max_pages": ..., "deadline": ...} submits a job, 400 if it
+      exceeds the limits of the service, 503 if the queue is full
+    - GET /jobs lists the jobs, GET /jobs/<id> returns the status of a job
+    - GET /jobs/<id>/results streams the results as newline delimited JSON until the job is over,
+      or returns the results available now with ?follow=0
+    - DELETE /jobs/<id> cancels a job
+    - GET /stats returns the statistics of the service
+    """
+
+    def __init__(self, service, address):
+        """
+        Constructor. Starts the server.
+
+        :param service: the CrawlService to serve
+        :param address: the tuple (host, port) the server listens on, port 0 to pick a free one,
+        or the path of a Unix socket
+        :raise ValueError: if the path of the Unix socket belongs to another kind of file
+        """
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def _send_json(self, status, value):
+                body = json.dumps(value).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _get_job(self, job_id):
+                job = service.get(job_id)
+                if job is None:
+                    self._send_json(404, {'error': 'Unknown job {}'.format(job_id)})
+                return job
+
+            def _stream_results(self, job, follow):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                try:
+                    for result in job.iter_results(follow=follow):
+                        self.wfile.write(json.dumps(result).encode('utf-8') + b'\n')
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, the job goes on
+                    pass
+
+            def do_GET(self):
+                split = urllib.parse.urlsplit(self.path)
+                parts = split.path.strip('/').split('/')
+                if parts == ['stats']:
+                    self._send_json(200, service.stats())
+                elif parts == ['jobs']:
+                    self._send_json(200, [job.status() for job in service.list_jobs()])
+                elif len(parts) == 2 and parts[0] == 'jobs':
+                    job = self._get_job(parts[1])
+                    if job is not None:
+                        self._send_json(200, job.status())
+                elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'results':
+                    job = self._get_job(parts[1])
+                    if job is not None:
+                        query = urllib.parse.parse_qs(split.query)
+                        self._stream_results(job, query.get('follow', ['1'])[0] not in ('0', 'false'))
+                else:
+                    self._send_json(404, {'error': 'Unknown path {}'.format(split.path)})
+
+            def do_POST(self):
+                if self.path.rstrip('/') != '/jobs':
+                    self._send_json(404, {'error': 'Unknown path {}'.format(self.path)})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8'))
+                    start_url = request['url']
+                    max_pages = int(request.get('max_pages', 5))
+                    deadline = float(request['deadline']) if request.get('deadline') is not None else None
+                    if not start_url.startswith(('http://', 'https://')) or max_pages < 1:
+                        raise ValueError('An http(s) url and a positive max_pages are required')
+                    job = service.submit(start_url, max_pages, deadline=deadline)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    self._send_json(400, {'error': 'Invalid job: {}'.format(e)})
+                    return
+                except JobQueueFullError as e:
+                    self._send_json(503, {'error': str(e)})
+                    return
+                self._send_json(202, job.status())
+
+            def do_DELETE(self):
+                parts = self.path.strip('/').split('/')
+                if len(parts) != 2 or parts[0] != 'jobs':
+                    self._send_json(404, {'error': 'Unknown path {}'.format(self.path)})
+                    return
+                job = service.cancel(parts[1])
+                if job is None:
+                    self._send_json(404, {'error': 'Unknown job {}'.format(parts[1])})
+                else:
+                    self._send_json(200, job.status())
+
+            def log_message(self, *args):
+                pass
+
+        self.socket_path = None
+        if isinstance(address, str):
+            # The socket left by a previous run is replaced, any other file is kept
+            if os.path.exists(address):
+                if not stat.S_ISSOCK(os.stat(address).st_mode):
+                    raise ValueError('{} exists and is not a socket'.format(address))
+                os.remove(address)
+            self._server = _ThreadingUnixHTTPServer(address, Handler)
+            self.socket_path = self.url = address
+        else:
+            self._server = _ThreadingHTTPServer(address, Handler)
+            self.url = 'http://{}:{}'.format(address[0], self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.1},
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
@@ -0,0 +1,235 @@
+"""
+This module contains the SitemapSeeder, which fills the frontier with the pages listed by the
+sitemaps of a website before the crawl starts, so that deep pages don't need to be reached
+link by link.
+"""
+import json
+import logging
+import os
+import urllib.error
+import urllib.parse
+import zlib
+from collections import deque
+
+from lxml import etree
+
+from src.sync.content import ACCEPT_ENCODING, DECODING_ERRORS, iter_body
+
+# The maximum size of a sitemap once uncompressed, according to sitemaps.org
+MAX_SITEMAP_SIZE = 50 * 1024 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class _GzipFileDecoder:
+    """
+    Decompresses sitemaps stored as .gz files, which are served gzipped without a Content-Encoding.
+    """
+
+    def __init__(self):
+        self._decoder = None
+
+    def decompress(self, data):
+        if self._decoder is None:
+            self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if data.startswith(GZIP_MAGIC) else False
+        return self._decoder.decompress(data) if self._decoder else data
+
+
+def _local_name(element):
+    tag = element.tag
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else None
+
+
+def iter_sitemap(chunks, max_size=MAX_SITEMAP_SIZE):
+    """
+    Parses a sitemap or a sitemap index given in chunks, gzipped or not, without keeping the
+    whole document in memory.
+
+    :param chunks: an iterable over the bytes of the document
+    :param max_size: the maximum number of bytes of the uncompressed document
+    :return: an iterator over tuples (kind, loc, lastmod), where kind is 'url' for the pages and
+    'sitemap' for the sitemaps listed by an index, and lastmod is None if not given
+    :raise ValueError: if the document exceeds the maximum size or can't be decompressed
+    """
+    parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True)
+    decoder = _GzipFileDecoder()
+    size = 0
+
+    def read_events():
+        for _, element in parser.read_events():
+            kind = _local_name(element)
+            if kind not in ('url', 'sitemap'):
+                continue
+            loc = lastmod = None
+            for child in element:
+                name = _local_name(child)
+                if name == 'loc':
+                    loc = (child.text or '').strip()
+                elif name == 'lastmod':
+                    lastmod = (child.text or '').strip() or None
+            # Drops the entries already read, so that the tree never grows
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+            if loc:
+                yield kind, loc, lastmod
+
+    try:
+        for chunk in chunks:
+            data = decoder.decompress(chunk)
+            size += len(data)
+            if size > max_size:
+                raise ValueError('the sitemap exceeds {} bytes'.format(max_size))
+            parser.feed(data)
+            for entry in read_events():
+                yield entry
+        parser.close()
+    except DECODING_ERRORS as err:
+        raise ValueError('the sitemap can\'t be decompressed: {}'.format(err))
+    for entry in read_events():
+        yield entry
+
+
+def get_robots_sitemaps(robots_txt):
+    """
+    Gets the sitemaps declared in a robots.txt.
+
+    :param robots_txt: the content of the robots.txt as a string
+    :return: the list of the URLs of the Sitemap lines, in order
+    """
+    sitemaps = []
+    for line in robots_txt.splitlines():
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(value.strip())
+    return sitemaps
+
+
+class SitemapSeeder:
+    """
+    The SitemapSeeder class reads the sitemaps declared in the robots.txt of a website, or its
+    /sitemap.xml if none is declared, following sitemap indexes, and queues the pages they list
+    in the frontier of a crawl. When a state file is given, the <lastmod> of the visited pages is
+    saved to it, and pages whose <lastmod> didn't change since are skipped by later crawls.
+    """
+
+    def __init__(self, state_path=None, max_sitemaps=100, enable_logging=True):
+        """
+        Constructor. Loads the state of the previous crawls, if any.
+
+        :param state_path: the path of the json file keeping the <lastmod> of the visited pages
+        :param max_sitemaps: the maximum number of sitemaps read for a crawl, indexes included
+        :param enable_logging: a flag being True if logs should be displayed
+        """
+        self.state_path = state_path
+        self.max_sitemaps = max_sitemaps
+        self.enable_logging = enable_logging
+        self.lastmods = {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r') as infile:
+                self.lastmods = json.load(infile)
+        # The <lastmod> of the seeded pages, stored once they are visited
+        self._pending_lastmods = {}
+
+    def _fetch(self, url, transport):
+        """
+        Fetches a sitemap or a robots.txt.
+
+        :param url: the URL of the document
+        :param transport: the transport used to send the request
+        :return: an iterator over the decoded chunks of the body
+        """
+        response = transport.send(url, 'GET', headers={'Accept-Encoding': ACCEPT_ENCODING})
+        return iter_body(response, url, max_size=MAX_SITEMAP_SIZE)
+
+    def get_sitemaps(self, start_url, transport):
+        """
+        Gets the sitemaps of the website of the given URL.
+
+        :param start_url: the URL from which the crawling starts
+        :param transport: the transport used to fetch robots.txt
+        :return: the list of the URLs of the sitemaps
+        """
+        split = urllib.parse.urlsplit(start_url)
+        robots_url = urllib.parse.urlunsplit((split.scheme, split.netloc, '/robots.txt', '', ''))
+        try:
+            robots_txt = b''.join(self._fetch(robots_url, transport)).decode('utf-8', errors='replace')
+            sitemaps = get_robots_sitemaps(robots_txt)
+        except urllib.error.URLError:
+            sitemaps = []
+        return sitemaps or [urllib.parse.urlunsplit((split.scheme, split.netloc, '/sitemap.xml', '', ''))]
+
+    def iter_pages(self, start_url, transport):
+        """
+        Reads the sitemaps of the website of the given URL, following the indexes breadth first.
+
+        :param start_url: the URL from which the crawling starts
+        :param transport: the transport used to fetch the sitemaps
+        :return: an iterator over tuples (url, lastmod), one for each page listed
+        """
+        sitemaps = deque(self.get_sitemaps(start_url, transport))
+        already_read = set(sitemaps)
+        read_count = 0
+        while sitemaps and read_count < self.max_sitemaps:
+            sitemap_url = sitemaps.popleft()
+            read_count += 1
+            try:
+                for kind, loc, lastmod in iter_sitemap(self._fetch(sitemap_url, transport)):
+                    if kind == 'url':
+                        yield loc, lastmod
+                    elif loc not in already_read and urllib.parse.urlsplit(loc).scheme in ('http', 'https'):
+                        already_read.add(loc)
+                        sitemaps.append(loc)
+            except (urllib.error.URLError, ValueError, etree.XMLSyntaxError) as err:
+                if self.enable_logging:
+                    logging.warning('Sitemap {} can\'t be read: {}'.format(sitemap_url, err))
+
+    def seed(self, start_url, frontier, transport, is_valid, limit=None):
+        """
+        Queues the pages listed by the sitemaps of the website of the given URL. Pages whose
+        <lastmod> is the same as the one stored by a previous crawl are marked as already seen
+        instead, so that they aren't visited even if other pages link them.
+
+        :param start_url: the URL from which the crawling starts
+        :param frontier: the Frontier of the crawl
+        :param transport: the transport used to fetch the sitemaps
+        :param is_valid: the function telling if a URL belongs to the crawl
+        :param limit: the number of pages in the frontier after which the sitemaps aren't read anymore
+        :return: the tuple (queued, skipped) with the number of pages queued and skipped
+        """
+        queued = skipped = 0
+        for url, lastmod in self.iter_pages(start_url, transport):
+            if limit is not None and len(frontier) >= limit:
+                break
+            if not is_valid(url):
+                continue
+            if lastmod is not None and self.lastmods.get(url) == lastmod:
+                skipped += frontier.mark_seen(url)
+            # The pages listed by the sitemaps are as far from the start URL as the pages it links
+            elif frontier.add(url, 1):
+                queued += 1
+                if lastmod is not None:
+                    self._pending_lastmods[url] = lastmod
+        if self.enable_logging:
+            logging.info('Sitemaps of {}: {} pages queued, {} unchanged pages skipped'
+                         .format(start_url, queued, skipped))
+        return queued, skipped
+
+    def page_visited(self, url):
+        """
+        Records the <lastmod> of a seeded page once it has been visited.
+
+        :param url: the URL of the page
+        """
+        lastmod = self._pending_lastmods.pop(url, None)
+        if lastmod is not None:
+            self.lastmods[url] = lastmod
+
+    def save(self):
+        """
+        Saves the <lastmod> of the visited pages to the state file, if any.
+        """
+        if self.state_path:
+            with open(self.state_path, 'w') as outfile:
+                json.dump(self.lastmods, outfile)
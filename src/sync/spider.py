@@ -1,7 +1,18 @@
 import json
 import logging
+import time
 
+from src.sync.classification_cache import ClassificationCache
+from src.sync.content import DEFAULT_MAX_BODY_SIZE
+from src.sync.frontier import Frontier
+from src.sync.metrics import CrawlMetrics
+from src.sync.parse_pipeline import ParsePipeline
+from src.sync.politeness import THROTTLING_CODES, PoliteTransport, is_paced
+from src.sync.retry import RETRY_CODES, RetryingTransport
+from src.sync.transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_TIMEOUT, PooledTransport
+from src.sync.url_table import CompactResults
 from src.sync.url_parser import URLParser
+from src.sync.visited import MemoryVisitedSet
 
 
 class Spider:
@@ -9,16 +20,91 @@ class Spider:
     The Spider class implements the main crawling functionality.
     """
 
-    def __init__(self, enable_logging=True):
+    def __init__(self, enable_logging=True, max_workers=1, cache=None, strict=False, transport=None,
+                 parse_workers=0, politeness=None, metrics=None, progress_interval=None, visited_set=None,
+                 max_body_size=DEFAULT_MAX_BODY_SIZE, compression=True, timeout=DEFAULT_TIMEOUT,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, max_retries=2, deadline=None, seeder=None,
+                 duplicate_index=None, result_store=None, frontier=None, max_depth=None):
         """
         Constructor. Simply gets an instance of the URLParser object in
         order to perform the analysis on the links.
 
         :param enable_logging: a flag being True if logs should be displayed during the
         crawling, False otherwise.
+        :param max_workers: the number of threads used by the URLParser to classify the
+        links of each page
+        :param cache: the ClassificationCache shared by the crawls of this spider. If not
+        given, an empty cache with the default size is created.
+        :param strict: if True, every link is classified with a HEAD request. Otherwise, links
+        are classified from their tag and extension whenever possible.
+        :param transport: the transport used to send the HTTP requests. If not given, a
+        PooledTransport keeping the connections alive is used.
+        :param parse_workers: the number of processes parsing the pages while the next ones are
+        fetched. With no workers, pages are parsed in the current process.
+        :param politeness: an optional PolitenessScheduler pacing the requests to each host.
+        When given, pages disallowed by robots.txt are not visited. Requests are paced above the
+        given transport, unless it already wraps a PoliteTransport pacing them, e.g. below a
+        cache so that the responses it serves aren't paced, or it doesn't use the network.
+        :param metrics: the CrawlMetrics recording the measures of the crawls of this spider. If
+        not given, a new one is created.
+        :param progress_interval: if given, a progress line is logged at most once every this many
+        seconds while crawling
+        :param visited_set: the function creating the set of the URLs already queued by each crawl,
+        e.g. one of the classes of src.sync.visited.VISITED_SETS. If not given, the URLs are kept
+        in memory.
+        :param max_body_size: the maximum number of bytes of a page, once decoded. Larger pages are
+        abandoned as soon as the limit is exceeded. None for no limit.
+        :param compression: if True, pages are requested compressed and decoded while being read
+        :param timeout: the number of seconds the default transport waits for each read before
+        giving up on a request
+        :param connect_timeout: the number of seconds the default transport waits for a connection
+        to be established
+        :param max_retries: the number of times a request failing for a transient reason (timeout,
+        connection error, temporary server error) is retried, with an exponential backoff
+        :param deadline: if given, each crawl stops after this many seconds, returning the results
+        of the pages visited so far
+        :param seeder: an optional SitemapSeeder queuing the pages listed by the sitemaps of the
+        website before the crawl starts
+        :param duplicate_index: the function creating the DuplicateIndex of each crawl, e.g. the
+        DuplicateIndex class. When given, pages whose content has already been seen aren't parsed,
+        their links aren't followed and their results have an 'alias_of' key with the URL of the
+        page they duplicate.
+        :param result_store: an optional ResultStore where the result of each page is saved while
+        crawling, together with its status code, final URL and timings
+        :param frontier: the function creating the Frontier of each crawl, called with its visited
+        set, e.g. the PriorityFrontier class. If not given, pages are visited in the order they
+        have been discovered.
+        :param max_depth: if given, the links of the pages this many links away from the start URL
+        aren't followed
         """
         self.enable_logging = enable_logging
-        self.url_parser = URLParser(enable_logging=enable_logging)
+        self.cache = cache if cache is not None else ClassificationCache()
+        self.parse_workers = parse_workers
+        self.politeness = politeness
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+        self.progress_interval = progress_interval
+        self.visited_set = visited_set if visited_set is not None else MemoryVisitedSet
+        self.deadline = deadline
+        self.seeder = seeder
+        self.duplicate_index = duplicate_index
+        self.result_store = result_store
+        self.frontier = frontier if frontier is not None else Frontier
+        self.max_depth = max_depth
+        if transport is None:
+            transport = PooledTransport(max_connections_per_host=max_workers, timeout=timeout,
+                                        connect_timeout=connect_timeout)
+        self.transport = transport
+        if politeness is not None:
+            self.transport = PoliteTransport(self.transport, politeness, pace=not is_paced(self.transport))
+        if max_retries:
+            # Throttling responses are already retried by the PoliteTransport, after the backoff of the host
+            retry_codes = RETRY_CODES - THROTTLING_CODES if politeness is not None else RETRY_CODES
+            self.transport = RetryingTransport(self.transport, max_retries=max_retries, retry_codes=retry_codes,
+                                               metrics=self.metrics)
+        self.url_parser = URLParser(enable_logging=enable_logging, max_workers=max_workers, cache=self.cache,
+                                    strict=strict, transport=self.transport, metrics=self.metrics,
+                                    max_body_size=max_body_size, compression=compression,
+                                    page_details={} if result_store is not None else None)
 
     def crawl(self, start_url, max_pages):
         """
@@ -34,33 +120,155 @@ class Spider:
         :return: a json object containing the URLs visited together with their static
         assets.
         """
+        # Results are kept compact while crawling and expanded one page at a time
+        results = CompactResults()
+        results.extend(self.iter_crawl(start_url, max_pages))
+        return '[' + ', '.join(json.dumps(result) for result in results) + ']'
+
+    def iter_crawl(self, start_url, max_pages, checkpoint=None, resume=False):
+        """
+        Generator implementing the crawling functionality of the crawl method: the result of
+        each page is yielded as soon as the page has been parsed, without keeping the results
+        of the previous pages in memory.
+
+        :param start_url: the URL from which the crawling starts
+        :param max_pages: the maximum number of pages that can be visited
+        :param checkpoint: an optional Checkpoint periodically saving the state of the crawl
+        :param resume: True if the crawl should continue from the last state saved by the
+        checkpoint. The results of the pages visited before are yielded first.
+        :return: an iterator over dictionaries containing the URL of a visited page together
+        with its static assets
+        """
         # Feeds the URLParser with the starting URL
         self.url_parser.set_base_url(start_url)
-        # Keeps track of the pages that still need to be visited
-        pages_to_visit = [start_url]
-        # Keeps track of the pages that have been already visited
-        already_visited = []
+        duplicates = self.duplicate_index() if self.duplicate_index is not None else None
+        self.url_parser.duplicates = duplicates
+        if self.url_parser.page_details is not None:
+            self.url_parser.page_details.clear()
+        # Keeps track of the number of pages that have been already visited
+        pages_visited = 0
+        last_progress_time = time.monotonic()
+        deadline_time = last_progress_time + self.deadline if self.deadline is not None else None
 
-        results = []
-        # While there are stil pages that need to be visited and we've not reached
-        # the maximum admitted number of visits
-        while pages_to_visit and len(already_visited) < max_pages:
-            # Gets the first URL and pop it from the queue
-            current_url = pages_to_visit.pop(0)
-            if self.enable_logging:
-                logging.info('Started crawling URL: {}'.format(current_url))
-            # If the current URL has not been already visited...
-            if current_url not in already_visited:
+        state = checkpoint.start(start_url, resume) if checkpoint is not None else None
+        if state is not None:
+            frontier = state['frontier']
+        else:
+            # Keeps track of the pages that still need to be visited, each page is queued only once
+            frontier = self.frontier(visited=self.visited_set())
+            frontier.add(start_url)
+            if self.seeder is not None:
+                self.seeder.seed(start_url, frontier, self.transport, self._is_allowed, limit=max_pages)
+        pipeline = ParsePipeline(self.url_parser, self.parse_workers) if self.parse_workers else None
+        try:
+            if state is not None:
+                pages_visited = state['pages_visited']
+                self.cache.restore(state['classifications'])
+                for result in checkpoint.iter_results():
+                    if self.result_store is not None:
+                        self.result_store.add(result)
+                    yield result
+            # While there are stil pages that need to be visited and we've not reached
+            # the maximum admitted number of visits
+            while frontier and pages_visited < max_pages:
+                if deadline_time is not None and time.monotonic() >= deadline_time:
+                    if self.enable_logging:
+                        logging.warning('Deadline of {} seconds reached after {} pages, {} pages left in the '
+                                        'frontier'.format(self.deadline, pages_visited, len(frontier)))
+                    break
+                if pipeline is not None:
+                    # Pages are kept in the frontier until they are parsed, so that checkpoints are consistent
+                    pipeline.prefetch(frontier.peek(min(pipeline.window, max_pages - pages_visited)))
+                # Gets the first URL and pop it from the queue
+                current_url, depth = frontier.pop_with_depth()
+                if self.enable_logging:
+                    logging.info('Started crawling URL: {}'.format(current_url))
                 # Gets it's static assets and the links that should be subsequently crawled
-                static_assets, links_to_follow = self.url_parser.parse_url(current_url)
+                page_start_time = time.perf_counter()
+                if pipeline is not None:
+                    static_assets, links_to_follow = pipeline.parse_url(current_url)
+                else:
+                    static_assets, links_to_follow = self.url_parser.parse_url(current_url)
+                if current_url in self.url_parser.discarded_pages:
+                    self.url_parser.discarded_pages.discard(current_url)
+                    # Links classified as pages without a request may turn out to be missing or to leave the
+                    # website: they aren't reported, nor counted as visited
+                    if current_url != start_url:
+                        if self.enable_logging:
+                            logging.info('Discarded URL: {} is not a page of the website'.format(current_url))
+                        if self.url_parser.page_details is not None:
+                            self.url_parser.page_details.pop(current_url, None)
+                        continue
                 if self.enable_logging:
                     logging.info('Finished crawling URL: {} - Found {} static assets and {} links to follow'
-                                 .format(current_url, len(static_assets), len(static_assets)))
-                # Builds up incrementally the results
-                results.append({'url': current_url, 'assets': static_assets})
-                # Updates the list of pages that should be visited next, and the list of the already
-                # visited ones
-                pages_to_visit += links_to_follow
-                already_visited.append(current_url)
-        return json.dumps(results)
+                                 .format(current_url, len(static_assets), len(links_to_follow)))
+                # Updates the pages that should be visited next: already queued or visited pages are discarded
+                with self.metrics.timer('enqueue'):
+                    # Links beyond the maximum depth aren't queued, so they can still be found closer to the start
+                    if self.max_depth is None or depth < self.max_depth:
+                        for link in links_to_follow:
+                            if self.politeness is None or self.politeness.allowed(link):
+                                frontier.add(link, depth + 1)
+                if self.seeder is not None:
+                    self.seeder.page_visited(current_url)
+                pages_visited += 1
+                self.metrics.record_page(len(frontier))
+                if self.enable_logging and self.progress_interval is not None \
+                        and time.monotonic() - last_progress_time >= self.progress_interval:
+                    last_progress_time = time.monotonic()
+                    logging.info('Progress: {}'.format(self.metrics.progress_line()))
+                result = {'url': current_url, 'assets': static_assets}
+                alias = duplicates.pop_alias(current_url) if duplicates is not None else None
+                if alias is not None:
+                    result['alias_of'] = alias
+                if self.result_store is not None:
+                    self.result_store.add(result, self.url_parser.page_details.pop(current_url, None),
+                                          time.perf_counter() - page_start_time)
+                if checkpoint is not None:
+                    checkpoint.record(result, frontier, pages_visited, self.cache)
+                # Returns the result as soon as it is available
+                yield result
+            if checkpoint is not None:
+                checkpoint.save(frontier, pages_visited, self.cache)
+        finally:
+            # Releases the threads used to classify the links and the processes used to parse the pages
+            self.url_parser.close()
+            if pipeline is not None:
+                pipeline.close()
+            if checkpoint is not None:
+                checkpoint.close()
+            if self.seeder is not None:
+                self.seeder.save()
+            if self.result_store is not None:
+                self.result_store.flush()
+            frontier.close()
+        if self.enable_logging:
+            logging.info('Metrics: {}'.format(self.metrics.progress_line()))
+            logging.info('Classification cache: {entries} entries, {hits} hits, {misses} misses'
+                         .format(**self.cache.stats()))
+            logging.info('Transport: {}'.format(', '.join('{} {}'.format(value, name.replace('_', ' '))
+                                                          for name, value in sorted(self.transport.stats().items()))))
+            if duplicates is not None:
+                logging.info('Duplicates: {exact_duplicates} exact and {near_duplicates} near duplicates of '
+                             '{pages} pages, {parses_saved} parses and {head_requests_saved} HEAD requests saved'
+                             .format(**duplicates.stats()))
+            if self.politeness is not None:
+                for host, metrics in sorted(self.politeness.metrics().items()):
+                    logging.info('Politeness for {}: {rate} requests/s, {requests} requests, {throttled} throttled'
+                                 .format(host, **metrics))
+
+    def _is_allowed(self, url):
+        """
+        Tells if a URL found outside of the pages, e.g. in a sitemap, belongs to the crawl.
+
+        :param url: an absolute URL
+        :return: True if the URL is on the website being crawled and robots.txt allows it
+        """
+        return self.url_parser._is_a_valid_url(url) and (self.politeness is None or self.politeness.allowed(url))
+
+    def close(self):
+        """
+        Closes the connections kept alive by the transport of the spider.
+        """
+        self.transport.close()
 
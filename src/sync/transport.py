@@ -0,0 +1,351 @@
+"""
+This module contains the transports used by the URLParser to send HTTP requests. A transport
+exposes a send(url, method, headers=None, timeout=None) method returning a response with the
+same interface of the ones returned by urllib.request.urlopen (read, geturl, info, getcode),
+raising urllib.error.HTTPError for error responses and urllib.error.URLError when the server
+can't be reached.
+"""
+import http.client
+import io
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+REDIRECT_CODES = frozenset([301, 302, 303, 307, 308])
+
+# The default number of seconds waited for a connection to be established, and for each read
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_TIMEOUT = 30
+
+# The maximum number of bytes read from the body of a redirect or of an error response. Longer bodies are
+# truncated and their connection is closed instead of being reused.
+MAX_DRAINED_BODY_SIZE = 64 * 1024
+
+# The same User-Agent sent by urllib.request.urlopen
+USER_AGENT = 'Python-urllib/{}.{}'.format(*sys.version_info[:2])
+
+
+class UrllibTransport:
+    """
+    The UrllibTransport class sends every request with urllib.request.urlopen, opening a new
+    connection each time.
+    """
+
+    def __init__(self, timeout=None):
+        """
+        Constructor. Initializes the statistics of the transport.
+
+        :param timeout: the default timeout in seconds for the blocking operations, connecting
+        included. If None, the requests wait forever.
+        """
+        self.timeout = timeout
+        self.requests_served = 0
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Given an URL and a method, send the related HTTP request and returns the response.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :param timeout: an optional timeout in seconds for the blocking operations
+        :return: the related HTTP response
+        """
+        request = urllib.request.Request(url, headers=headers or {}, method=method)
+        self.requests_served += 1
+        timeout = timeout if timeout is not None else self.timeout
+        if timeout is None:
+            return urllib.request.urlopen(request)
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def stats(self):
+        """
+        Returns the usage statistics of the transport.
+
+        :return: a dictionary with the number of connections opened and requests served
+        """
+        return {'connections_opened': self.requests_served, 'requests_served': self.requests_served}
+
+    def close(self):
+        """
+        Nothing to release: urlopen closes its connections on its own.
+        """
+
+
+class PooledResponse:
+    """
+    The PooledResponse class wraps an http.client.HTTPResponse coming from a pooled connection.
+    The connection goes back to the pool as soon as the body has been entirely read, while it
+    is discarded if the response is closed before.
+    """
+
+    def __init__(self, transport, key, connection, response, url):
+        """
+        Constructor.
+
+        :param transport: the PooledTransport the connection belongs to
+        :param key: the (scheme, host, port) tuple identifying the pool of the connection
+        :param connection: the connection the response has been received from
+        :param response: the http.client.HTTPResponse
+        :param url: the requested URL
+        """
+        self._transport = transport
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.code = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+    def read(self, amt=None):
+        """
+        Reads the body of the response, releasing the connection once the body is over.
+
+        :param amt: the maximum number of bytes to read, None to read the whole body
+        :return: the bytes read
+        """
+        if self._connection is None:
+            return b''
+        data = self._response.read() if amt is None else self._response.read(amt)
+        if self._response.isclosed():
+            self._release()
+        return data
+
+    def _release(self):
+        """
+        Gives the connection back to the pool, unless the server asked to close it.
+        """
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._transport._release(self._key, connection, reusable=not self._response.will_close)
+
+    def close(self):
+        """
+        Closes the response. A connection with unread data can't be reused and is closed as well.
+        """
+        if self._connection is None:
+            return
+        if self._response.isclosed():
+            self._release()
+        else:
+            connection, self._connection = self._connection, None
+            self._response.close()
+            self._transport._release(self._key, connection, reusable=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PooledTransport:
+    """
+    The PooledTransport class sends HTTP/1.1 requests over persistent connections. Idle
+    connections are kept in a pool for each host, so that subsequent requests to the same
+    host don't pay a new TCP (and TLS) handshake. Redirects are followed like urlopen does.
+    The transport is thread safe.
+    """
+
+    def __init__(self, max_connections_per_host=8, idle_timeout=30, max_redirects=10, timeout=None,
+                 connect_timeout=None):
+        """
+        Constructor. Initializes an empty pool.
+
+        :param max_connections_per_host: the maximum number of idle connections kept for each host
+        :param idle_timeout: the number of seconds after which an idle connection is discarded
+        :param max_redirects: the maximum number of redirects followed for a request
+        :param timeout: the default timeout in seconds for the blocking operations
+        :param connect_timeout: the timeout in seconds for establishing a new connection. If None,
+        the timeout of the request is used.
+        """
+        if max_connections_per_host < 1:
+            raise ValueError('The size of the pool must be a positive integer.')
+        self.max_connections_per_host = max_connections_per_host
+        self.idle_timeout = idle_timeout
+        self.max_redirects = max_redirects
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.connections_opened = 0
+        self.requests_served = 0
+        self._idle_connections = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(url):
+        """
+        Returns the key of the pool serving the given URL.
+
+        :param url: an absolute http or https URL
+        :return: the tuple (scheme, host, port)
+        """
+        split = urllib.parse.urlsplit(url)
+        scheme = split.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise urllib.error.URLError('unknown url type: {}'.format(scheme))
+        if not split.hostname:
+            raise urllib.error.URLError('no host given')
+        port = split.port or (443 if scheme == 'https' else 80)
+        return scheme, split.hostname, port
+
+    def _acquire(self, key, timeout):
+        """
+        Returns an idle connection for the given key, or a new one if none is available.
+
+        :param key: the (scheme, host, port) tuple
+        :param timeout: the timeout of the blocking operations of the connection
+        :return: the tuple (connection, reused)
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle_connections = self._idle_connections.get(key, [])
+            while idle_connections:
+                connection, last_used = idle_connections.pop()
+                if now - last_used <= self.idle_timeout:
+                    connection.timeout = timeout
+                    if connection.sock is not None:
+                        connection.sock.settimeout(timeout)
+                    return connection, True
+                connection.close()
+            self.connections_opened += 1
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=timeout)
+        if self.connect_timeout is not None:
+            # Connects with its own timeout, the following reads wait for the timeout of the request
+            connection.timeout = self.connect_timeout
+            try:
+                connection.connect()
+            except OSError as err:
+                connection.close()
+                raise urllib.error.URLError(err)
+            connection.timeout = timeout
+            connection.sock.settimeout(timeout)
+        return connection, False
+
+    def _release(self, key, connection, reusable=True):
+        """
+        Puts a connection back into the pool of its host, or closes it.
+
+        :param key: the (scheme, host, port) tuple
+        :param connection: the connection
+        :param reusable: False if the connection can't be used for further requests
+        """
+        with self._lock:
+            idle_connections = self._idle_connections.setdefault(key, [])
+            if reusable and len(idle_connections) < self.max_connections_per_host:
+                idle_connections.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def _send_once(self, url, method, headers, timeout):
+        """
+        Sends a single request, without following redirects.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: the request headers
+        :param timeout: the timeout of the blocking operations
+        :return: the PooledResponse
+        """
+        key = self._get_key(url)
+        split = urllib.parse.urlsplit(url)
+        target = urllib.parse.urlunsplit(('', '', split.path or '/', split.query, ''))
+        request_headers = {'User-Agent': USER_AGENT}
+        request_headers.update(headers or {})
+        while True:
+            connection, reused = self._acquire(key, timeout)
+            try:
+                connection.request(method, target, headers=request_headers)
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError) as err:
+                connection.close()
+                # The server may have dropped an idle connection: tries once more with a new one
+                if reused and isinstance(err, (http.client.RemoteDisconnected, ConnectionError)):
+                    continue
+                raise urllib.error.URLError(err)
+            with self._lock:
+                self.requests_served += 1
+            pooled_response = PooledResponse(self, key, connection, response, url)
+            if method == 'HEAD':
+                # The response has no body: the connection can be reused straight away
+                self._drain(pooled_response)
+            return pooled_response
+
+    @staticmethod
+    def _drain(response):
+        """
+        Reads the body of a response which isn't returned to the caller, e.g. of a redirect or of
+        an error, at most MAX_DRAINED_BODY_SIZE bytes of it.
+
+        :param response: the PooledResponse
+        :return: the body read
+        :raise urllib.error.URLError: if the body can't be read, e.g. because of a timeout
+        """
+        try:
+            body = response.read(MAX_DRAINED_BODY_SIZE + 1)
+        except (http.client.HTTPException, OSError) as err:
+            response.close()
+            raise urllib.error.URLError(err)
+        # The rest of a longer body isn't worth downloading: the connection is discarded instead
+        response.close()
+        return body[:MAX_DRAINED_BODY_SIZE]
+
+    def send(self, url, method, headers=None, timeout=None):
+        """
+        Given an URL and a method, send the related HTTP request over a pooled connection and
+        returns the response, following redirects.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :param timeout: an optional timeout in seconds, overriding the default one
+        :return: the related HTTP response
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        for _ in range(self.max_redirects + 1):
+            response = self._send_once(url, method, headers, timeout)
+            location = response.headers.get('Location')
+            if response.status in REDIRECT_CODES and location:
+                self._drain(response)
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303 and method != 'HEAD':
+                    method = 'GET'
+                continue
+            if not 200 <= response.status < 300:
+                body = self._drain(response)
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+            return response
+        raise urllib.error.HTTPError(url, response.status, 'Too many redirects', response.headers, io.BytesIO(b''))
+
+    def stats(self):
+        """
+        Returns the usage statistics of the transport.
+
+        :return: a dictionary with the number of connections opened and requests served
+        """
+        return {'connections_opened': self.connections_opened, 'requests_served': self.requests_served}
+
+    def close(self):
+        """
+        Closes all the idle connections of the pool.
+        """
+        with self._lock:
+            idle_connections, self._idle_connections = self._idle_connections, {}
+        for connections in idle_connections.values():
+            for connection, _ in connections:
+                connection.close()
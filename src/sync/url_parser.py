@@ -1,9 +1,19 @@
+import http.client
 import logging
+import time
 import urllib.request
 import urllib.error
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from lxml import html
 
+from src.sync.content import ACCEPT_ENCODING, is_html, iter_body
+from src.sync.dedup import get_fingerprint
+from src.sync.link_classifier import PAGE, classify_link
+from src.sync.link_extractor import LinkExtractor, parse_charset
+from src.sync.retry import is_timeout
+from src.sync.transport import UrllibTransport
+
 
 class URLParser:
     """
@@ -11,13 +21,54 @@ class URLParser:
     its links, and classify them as static or non-static assets.
     """
 
-    def __init__(self, enable_logging=True):
+    def __init__(self, enable_logging=True, max_workers=1, cache=None, strict=True, transport=None, metrics=None,
+                 max_body_size=None, compression=False, duplicates=None, page_details=None):
         """
         Constructor. Mainly initializes the base_url variable. This variable
         will be used to avoid returning subdomains of the original domain.
+
+        :param enable_logging: a flag being True if logs should be displayed, False otherwise
+        :param max_workers: the number of threads used to send the HEAD requests classifying
+        the links of a page. With a single worker the requests are sent serially.
+        :param cache: an optional ClassificationCache. When given, URLs already classified or
+        already fetched are not requested again.
+        :param strict: if True, every link is classified by sending a HEAD request. Otherwise,
+        links whose tag or extension tells what they point to are classified locally and a HEAD
+        request is sent only for the ambiguous ones.
+        :param transport: the transport used to send the HTTP requests. If not given, every
+        request is sent with urllib.request.urlopen.
+        :param metrics: an optional CrawlMetrics recording the requests sent and the time spent
+        fetching, parsing and classifying
+        :param max_body_size: the maximum number of bytes of a page, once decoded. Larger pages are
+        abandoned as soon as the limit is exceeded. If not given, pages are read at once, whatever
+        their size.
+        :param compression: if True, pages are requested compressed with gzip, deflate or, when the
+        brotli package is installed, brotli, and they are decoded while being read
+        :param duplicates: an optional DuplicateIndex. When given, pages whose content has already
+        been seen are not parsed: they get the static assets of the page they duplicate, and no
+        links to follow.
+        :param page_details: an optional dictionary where the details of each page fetched are
+        recorded, by URL: a dictionary with its status code, final URL, Content-Type, error and
+        the seconds spent fetching it, its body included
         """
+        if max_workers < 1:
+            raise ValueError('The number of workers must be a positive integer.')
         self.base_url = None
         self.enable_logging = enable_logging
+        self.max_workers = max_workers
+        self.cache = cache
+        self.strict = strict
+        self.transport = transport if transport is not None else UrllibTransport()
+        self.metrics = metrics
+        self.max_body_size = max_body_size
+        self.compression = compression
+        self.duplicates = duplicates
+        self.page_details = page_details
+        # The URLs fetched as pages that answered an HTTP error or redirected to another website
+        self.discarded_pages = set()
+        self._executor = None
+        self._base_url_split = None
+        self._extractor = None
 
     def set_base_url(self, base_url):
         """
@@ -26,6 +77,9 @@ class URLParser:
         :param base_url: the URL that will be taken as baseline
         """
         self.base_url = base_url
+        self._base_url_split = urllib.parse.urlsplit(base_url) if base_url else None
+        # The extractor precomputes what it needs from the base URL once per crawl
+        self._extractor = LinkExtractor(base_url) if base_url else None
 
     def _is_a_valid_url(self, url):
         """
@@ -38,13 +92,32 @@ class URLParser:
         """
         if not self.base_url:
             raise ValueError('Base URL not set before asking to parse the content of {}.'.format(url))
-        base_url_split = urllib.parse.urlsplit(self.base_url)
+        base_url_split = self._base_url_split
         current_url_split = urllib.parse.urlsplit(url)
         # The following doesn't take into account the scheme when checking the validity and checks
         # that the two network location paths are equal. The path part should not be equal in order
         # to discard urls which are completely equal to the base one
         return current_url_split.netloc == base_url_split.netloc and base_url_split.path != current_url_split.path
 
+    def _get_valid_links(self, page):
+        """
+        Given a HTML page as a string, gets all the valid links in it together with the
+        context they have been found in.
+
+        :param page: an HTML page as a string
+        :return: a list of tuples (url, tag, attribute, rel), one for each valid link in the page
+        """
+        valid_links = []
+        # Gets all the link within the page with lxml
+        for element, attribute, link, _ in html.iterlinks(page):
+            # Merges the base_url with each url found in the page to bring relative URLs to absolute
+            # Note: absolute URLs won't be affected, they will stay the same
+            linked_url = urllib.parse.urljoin(self.base_url, link)
+            # Filters and gets only the valid URLs
+            if self._is_a_valid_url(linked_url):
+                valid_links.append((linked_url, element.tag, attribute, element.get('rel')))
+        return valid_links
+
     def _get_valid_linked_urls(self, page):
         """
         Given a HTML page as a string, gets all the valid linked URLs in it.
@@ -52,14 +125,7 @@ class URLParser:
         :param page: an HTML page as a string
         :return: all the valid linked URLs contained in the page
         """
-        # Gets all the link within the page with lxml
-        links = html.iterlinks(page)
-        # Merges the base_url with each url found in the page to bring relative URLs to absolute
-        # Note: absolute URLs won't be affected, they will stay the same
-        linked_urls = [urllib.parse.urljoin(self.base_url, link[2]) for link in links]
-        # Filters and gets only the valid URLs
-        valid_linked_urls = [linked_url for linked_url in linked_urls if self._is_a_valid_url(linked_url)]
-        return valid_linked_urls
+        return [valid_link[0] for valid_link in self._get_valid_links(page)]
 
     @staticmethod
     def _send_http_request(url, method):
@@ -70,38 +136,351 @@ class URLParser:
         :param method: HTTP method
         :return: the related HTTP response
         """
-        request = urllib.request.Request(url, method=method)
-        response = urllib.request.urlopen(request)
+        # Kept for the callers of the former helper, the requests go through a parser with the default transport
+        return URLParser(enable_logging=False)._request(url, method)
+
+    def _request(self, url, method, headers=None):
+        """
+        Sends an HTTP request through the transport of the parser.
+
+        :param url: input URL
+        :param method: HTTP method
+        :param headers: an optional dictionary of request headers
+        :return: the related HTTP response
+        """
+        if self.metrics is None:
+            return self.transport.send(url, method, headers=headers)
+        try:
+            response = self.transport.send(url, method, headers=headers)
+        except urllib.error.HTTPError as http_err:
+            self.metrics.record_request(method, http_err.code)
+            raise
+        except urllib.error.URLError as url_err:
+            self.metrics.record_request(method)
+            if is_timeout(url_err):
+                self.metrics.record_timeout()
+            raise
+        self.metrics.record_request(method, getattr(response, 'status', 200))
         return response
 
-    def _get_assets(self, page):
+    def _classify_url(self, url):
         """
-        Given an HTML page as a string, returns its static and non-static assets.
+        Checks what a valid URL contains by sending a HEAD request.
 
-        :param page: an HTML page as a string
+        :param url: a valid URL
+        :return: the tuple (actual_url, is_html) where actual_url is the real URL in case of
+        redirect and is_html is True if the URL points to an HTML page, or None if the request
+        failed
+        """
+        if self.cache is not None:
+            entry = self.cache.get(url)
+            if entry is not None:
+                actual_url, is_html, error_code = entry
+                return None if error_code else (actual_url, is_html)
+        try:
+            response = self._request(url, 'HEAD')
+        except urllib.error.HTTPError as http_err:
+            if self.enable_logging:
+                logging.error('HTTPError returned in sending a HEAD request to {} - HTTP code {}'
+                              .format(url, http_err.code))
+            if self.cache is not None:
+                self.cache.put(url, url, False, http_err.code)
+            return None
+        except urllib.error.URLError as url_err:
+            # The failure may be transient: the URL isn't cached, so that other pages linking it retry
+            if self.enable_logging:
+                logging.error('URLError returned in sending a HEAD request to {}: {}'.format(url, url_err.reason))
+            return None
+        # Gets the real URL in case of redirect
+        actual_url = response.geturl()
+        is_html = 'text/html' in response.info()['Content-Type']
+        if self.cache is not None:
+            self.cache.put(url, actual_url, is_html)
+        return actual_url, is_html
+
+    def _get_executor(self):
+        """
+        Returns the thread pool used to classify the links, creating it if needed.
+
+        :return: the thread pool of the parser
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self):
+        """
+        Releases the thread pool of the parser, if any. The parser can still be used afterwards.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _classify_urls(self, urls):
+        """
+        Classifies the given URLs by sending HEAD requests. When the parser has more than one
+        worker, the requests are sent in parallel.
+
+        :param urls: a list of valid URLs
+        :return: an iterator over the classifications returned by _classify_url, in the order
+        of the input URLs
+        """
+        if self.max_workers > 1 and len(urls) > 1:
+            # Executor.map yields the results in the order of the input URLs
+            return self._get_executor().map(self._classify_url, urls)
+        return map(self._classify_url, urls)
+
+    def _get_assets(self, page, encoding=None):
+        """
+        Given an HTML page as a string, returns its static and non-static assets. Unless the parser
+        is strict, links are extracted by the LinkExtractor, which returns every link only once,
+        and are classified locally whenever possible, so that HEAD requests are sent only for the
+        ambiguous ones. In any case the results follow the order of the links in the page.
+
+        :param page: an HTML page as a string or bytes
+        :param encoding: the charset declared by the server for a page given as bytes, if any
+        :return: the tuple (static_assets, links_to_follow) where the former element represents the
+        list of static assets found while the latter is a list of non-static assets found in the page.
+        """
+        return self._classify_links(self._extract_valid_links(page, encoding))
+
+    def _extract_valid_links(self, page, encoding=None):
+        """
+        Given an HTML page, returns its valid links, as _get_valid_links does for a strict parser
+        and as the LinkExtractor does otherwise.
+
+        :param page: an HTML page as a string or bytes
+        :param encoding: the charset declared by the server for a page given as bytes, if any
+        :return: a list of tuples (url, tag, attribute, rel)
+        """
+        start_time = self.metrics.clock() if self.metrics is not None else None
+        if self.strict:
+            valid_links = [(valid_url, None, None, None) for valid_url in self._get_valid_linked_urls(page)]
+        else:
+            if self._extractor is None:
+                raise ValueError('Base URL not set before asking to parse the content of a page.')
+            valid_links = self._extractor.extract(page, encoding)
+        if self.metrics is not None:
+            self.metrics.record_phase('parse', self.metrics.clock() - start_time)
+        return valid_links
+
+    def _find_duplicate(self, url, page):
+        """
+        Fingerprints a page and looks up the page it duplicates in the DuplicateIndex.
+
+        :param url: the URL of the page
+        :param page: the content of the page
+        :return: the tuple (fingerprint, static_assets) where static_assets are the ones of the page
+        it duplicates, or None if the page has to be parsed
+        """
+        fingerprint = get_fingerprint(page)
+        duplicate = self.duplicates.find(fingerprint)
+        if duplicate is None:
+            return fingerprint, None
+        original_url, static_assets, classified_urls, is_exact = duplicate
+        # Links already in the cache would have been classified without a request
+        head_requests_saved = sum(1 for classified_url in classified_urls
+                                  if self.cache is None or classified_url not in self.cache)
+        self.duplicates.record_duplicate(url, original_url, is_exact, head_requests_saved)
+        if self.enable_logging:
+            logging.info('{} is a duplicate of {}, it won\'t be parsed'.format(url, original_url))
+        return fingerprint, list(static_assets)
+
+    def _index_page(self, url, fingerprint, valid_links, static_assets):
+        """
+        Adds a parsed page to the DuplicateIndex.
+
+        :param url: the URL of the page
+        :param fingerprint: the fingerprint returned by _find_duplicate
+        :param valid_links: the valid links of the page
+        :param static_assets: the static assets of the page
+        """
+        classified_urls = [valid_link[0] for valid_link in valid_links
+                           if self.strict or classify_link(*valid_link) is None]
+        self.duplicates.add(url, fingerprint, static_assets, classified_urls)
+
+    def _parse_page(self, url, page, encoding=None):
+        """
+        Returns the static and non-static assets of a fetched page, reusing the ones of the page
+        it duplicates, if any.
+
+        :param url: the URL of the page
+        :param page: the content of the page
+        :param encoding: the charset declared by the server for a page given as bytes, if any
+        :return: the tuple (static_assets, links_to_follow)
+        """
+        fingerprint, static_assets = self._find_duplicate(url, page)
+        if static_assets is not None:
+            # The links of the duplicated page have already been followed
+            return static_assets, []
+        valid_links = self._extract_valid_links(page, encoding)
+        static_assets, links_to_follow = self._classify_links(valid_links)
+        self._index_page(url, fingerprint, valid_links, static_assets)
+        return static_assets, links_to_follow
+
+    def _classify_links(self, valid_links):
+        """
+        Given the valid links of a page, returns its static and non-static assets.
+
+        :param valid_links: a list of tuples (url, tag, attribute, rel) as returned by _get_valid_links
         :return: the tuple (static_assets, links_to_follow) where the former element represents the
         list of static assets found while the latter is a list of non-static assets found in the page.
         """
-        valid_linked_urls = self._get_valid_linked_urls(page)
+        if self.metrics is None:
+            return self._classify_valid_links(valid_links)
+        with self.metrics.timer('classify'):
+            return self._classify_valid_links(valid_links)
+
+    def _classify_valid_links(self, valid_links):
+        """
+        Classifies the valid links of a page, locally whenever possible and with HEAD requests otherwise.
+
+        :param valid_links: a list of tuples (url, tag, attribute, rel) as returned by _get_valid_links
+        :return: the tuple (static_assets, links_to_follow)
+        """
+        valid_linked_urls = [valid_link[0] for valid_link in valid_links]
+        if self.strict:
+            local_classifications = [None] * len(valid_links)
+        else:
+            local_classifications = [classify_link(*valid_link) for valid_link in valid_links]
+        ambiguous_urls = [valid_url for valid_url, local_classification
+                          in zip(valid_linked_urls, local_classifications) if local_classification is None]
+        remote_classifications = self._classify_urls(ambiguous_urls)
         static_assets = []
         links_to_follow = []
-        # Checks what a valid URLs contains by sending HEAD requests...
-        for valid_url in valid_linked_urls:
-            try:
-                response = self._send_http_request(valid_url, method='HEAD')
-                # Gets the real URL in case of redirect
-                actual_url = response.geturl()
-                if 'text/html' in response.info()['Content-Type']:
-                    links_to_follow.append(actual_url)
-                else:
-                    static_assets.append(actual_url)
-            except urllib.error.HTTPError as http_err:
-                if self.enable_logging:
-                    logging.error('HTTPError returned in sending a HEAD request to {} - HTTP code {}'
-                                  .format(actual_url, http_err.code))
+        for valid_url, local_classification in zip(valid_linked_urls, local_classifications):
+            if local_classification is None:
+                classification = next(remote_classifications)
+            else:
+                classification = valid_url, local_classification == PAGE
+            if classification is None:
                 continue
+            actual_url, is_html = classification
+            if is_html:
+                links_to_follow.append(actual_url)
+            else:
+                static_assets.append(actual_url)
         return static_assets, links_to_follow
 
+    def _record_page_details(self, url, **details):
+        """
+        Records some details of a fetched page, if the parser records them.
+
+        :param url: the URL of the page
+        :param details: the details to record, among status, final_url, content_type, error and fetch_seconds
+        """
+        if self.page_details is not None:
+            self.page_details.setdefault(url, {'status': None, 'final_url': None, 'content_type': None,
+                                               'error': None, 'fetch_seconds': None}).update(details)
+
+    def _open_page(self, url):
+        """
+        Sends the GET request of a page and checks its Content-Type before reading its body. Pages
+        answering an HTTP error or redirecting to another website are added to discarded_pages.
+
+        :param url: the URL of the page
+        :return: the tuple (http_response, content_type), or None if the URL doesn't point to an HTML page
+        """
+        headers = {'Accept-Encoding': ACCEPT_ENCODING} if self.compression else None
+        # Fetches the page at the given URL in a synchronous way
+        try:
+            http_response = self._request(url, 'GET', headers)
+        except urllib.error.HTTPError:
+            self.discarded_pages.add(url)
+            raise
+        content_type = http_response.info()['Content-Type'] or ''
+        if self.page_details is not None:
+            self._record_page_details(url, status=getattr(http_response, 'status', 200),
+                                      final_url=http_response.geturl(), content_type=content_type or None)
+        if url != self.base_url and urllib.parse.urlsplit(http_response.geturl()).netloc != self._base_url_split.netloc:
+            # Links classified as pages without a HEAD request may redirect to another website
+            if self.enable_logging:
+                logging.info('Skipped {}: it redirects to {}'.format(url, http_response.geturl()))
+            self.discarded_pages.add(url)
+            close = getattr(http_response, 'close', None)
+            if close is not None:
+                close()
+            return None
+        if self.cache is not None and url not in self.cache:
+            # A fetched page doesn't need to be classified again when linked by other pages
+            self.cache.put(url, http_response.geturl(), 'text/html' in content_type)
+        if not is_html(content_type):
+            if self.enable_logging:
+                logging.info('Skipped the body of {}: {} is not an HTML page'.format(url, content_type))
+            close = getattr(http_response, 'close', None)
+            if close is not None:
+                close()
+            return None
+        return http_response, content_type
+
+    def _read_page(self, http_response, url):
+        """
+        Reads the body of a page. Unless the parser has a maximum body size or asks for compressed
+        pages, the body is read at once.
+
+        :param http_response: the response returned by _open_page
+        :param url: the URL of the page
+        :return: an iterator over the chunks of the body
+        :raise urllib.error.URLError: if the body can't be read, e.g. because of a timeout
+        """
+        try:
+            if self.max_body_size is None and not self.compression:
+                chunks = [http_response.read()]
+            else:
+                chunks = iter_body(http_response, url, max_size=self.max_body_size, decode=self.compression)
+            for chunk in chunks:
+                if self.metrics is not None:
+                    self.metrics.record_bytes(len(chunk))
+                yield chunk
+        except urllib.error.URLError as url_err:
+            # Transports keeping a copy of the body already report the errors of the connection as URLError
+            if self.metrics is not None and is_timeout(url_err):
+                self.metrics.record_timeout()
+            raise
+        except (http.client.HTTPException, OSError) as err:
+            # Errors of the connection while reading the body are reported like the ones of the request
+            if self.metrics is not None and is_timeout(err):
+                self.metrics.record_timeout()
+            raise urllib.error.URLError(err)
+
+    def _fetch_page(self, url):
+        """
+        Fetches the content of the page at the given URL.
+
+        :param url: the URL of the page
+        :return: the tuple (page, encoding) where page is the content of the page and encoding is the
+        charset declared by the server, if any, or None if the page couldn't be fetched
+        """
+        if not self.base_url:
+            raise ValueError('Base URL not set before asking to parse the content of {}.'.format(url))
+        start_time = self.metrics.clock() if self.metrics is not None else None
+        fetch_start_time = time.perf_counter() if self.page_details is not None else None
+        try:
+            opened_page = self._open_page(url)
+            if opened_page is None:
+                return None
+            http_response, content_type = opened_page
+            chunks = list(self._read_page(http_response, url))
+            page = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        except urllib.error.HTTPError as http_err:
+            self._record_page_details(url, status=http_err.code, error=str(http_err))
+            if self.enable_logging:
+                logging.error('HTTPError returned in fetching the content for {} - HTTP code {}'
+                              .format(url, http_err.code))
+            return None
+        except urllib.error.URLError as url_err:
+            self._record_page_details(url, error=str(url_err.reason))
+            if self.enable_logging:
+                logging.error('URLError returned for {}'.format(url))
+                logging.error(url_err)
+            return None
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_phase('fetch', self.metrics.clock() - start_time)
+            if fetch_start_time is not None:
+                self._record_page_details(url, fetch_seconds=time.perf_counter() - fetch_start_time)
+        return page, parse_charset(content_type)
+
     def parse_url(self, url):
         """
         Parse the HTML content of the current URL in order to find static and non-static assets.
@@ -111,22 +490,88 @@ class URLParser:
         :return: the tuple (static_assets, links_to_follow) where the former element represents the
         list of static assets found while the latter is a list of non-static assets found in the page.
         """
-        if not self.base_url:
+        if self.strict or self.duplicates is not None:
+            fetched_page = self._fetch_page(url)
+            if fetched_page is None:
+                return [], []
+            page, encoding = fetched_page
+            if self.duplicates is not None:
+                # The whole page is needed to fingerprint it before parsing it
+                return self._parse_page(url, page, encoding)
+            # Gets the assets of the page
+            return self._get_assets(page, encoding)
+        valid_links = self._stream_valid_links(url)
+        if valid_links is None:
+            return [], []
+        return self._classify_links(valid_links)
+
+    def _stream_valid_links(self, url):
+        """
+        Fetches the page at the given URL and extracts its valid links with the LinkExtractor, feeding
+        it the body as it is read, so that the whole page is never kept in memory.
+
+        :param url: the URL of the page
+        :return: a list of tuples (url, tag, attribute, rel), or None if the page couldn't be fetched
+        """
+        if self._extractor is None:
             raise ValueError('Base URL not set before asking to parse the content of {}.'.format(url))
+        start_time = self.metrics.clock() if self.metrics is not None else None
+        # The body is read while it is parsed, so the fetch time of the page includes the parsing
+        fetch_start_time = time.perf_counter() if self.page_details is not None else None
         try:
-            # Fetches the page at the given URL in a synchronous way
-            http_response = self._send_http_request(url, method="GET")
-            page = http_response.read()
+            try:
+                opened_page = self._open_page(url)
+            finally:
+                if self.metrics is not None:
+                    self.metrics.record_phase('fetch', self.metrics.clock() - start_time)
+            if opened_page is None:
+                return None
+            http_response, content_type = opened_page
+            # Downloading the rest of the body overlaps with parsing, both are measured as parsing
+            start_time = self.metrics.clock() if self.metrics is not None else None
+            valid_links = self._extractor.extract_chunks(self._read_page(http_response, url),
+                                                         parse_charset(content_type))
+            if self.metrics is not None:
+                self.metrics.record_phase('parse', self.metrics.clock() - start_time)
+            return valid_links
         except urllib.error.HTTPError as http_err:
+            self._record_page_details(url, status=http_err.code, error=str(http_err))
             if self.enable_logging:
                 logging.error('HTTPError returned in fetching the content for {} - HTTP code {}'
                               .format(url, http_err.code))
-            return [], []
+            return None
         except urllib.error.URLError as url_err:
+            self._record_page_details(url, error=str(url_err.reason))
             if self.enable_logging:
                 logging.error('URLError returned for {}'.format(url))
                 logging.error(url_err)
-            return [], []
-        else:
-            # Gets the assets of the page
-            return self._get_assets(page)
+            return None
+        finally:
+            if fetch_start_time is not None:
+                self._record_page_details(url, fetch_seconds=time.perf_counter() - fetch_start_time)
+
+
+# The extractors of the current process, by base URL, so that memoized links are reused across pages
+_extractors = {}
+
+
+def extract_valid_links(page, base_url, strict=True, encoding=None):
+    """
+    Gets the valid links of a page, together with the context they have been found in. This
+    function doesn't need a URLParser instance, so that it can run in another process.
+
+    :param page: an HTML page as bytes or string
+    :param base_url: the URL that will be taken as baseline
+    :param strict: if True, every link found by lxml's iterlinks is returned, as a strict
+    URLParser does. Otherwise, links are extracted by a LinkExtractor
+    :param encoding: the charset declared by the server for a page given as bytes, if any
+    :return: a list of tuples (url, tag, attribute, rel), one for each valid link in the page
+    """
+    if not strict:
+        if base_url not in _extractors:
+            _extractors.clear()
+            _extractors[base_url] = LinkExtractor(base_url)
+        return _extractors[base_url].extract(page, encoding)
+    parser = URLParser(enable_logging=False)
+    parser.set_base_url(base_url)
+    return parser._get_valid_links(page)
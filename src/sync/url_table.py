@@ -0,0 +1,103 @@
+from array import array
+
+
+class URLTable:
+    """
+    The URLTable class interns URLs: every distinct URL is stored once and identified by an
+    integer id, assigned in the order the URLs are first seen.
+    """
+
+    def __init__(self):
+        """
+        Constructor. Initializes an empty table.
+        """
+        self.urls = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.urls)
+
+    def intern(self, url):
+        """
+        Returns the id of a URL, adding it to the table if needed.
+
+        :param url: a URL
+        :return: the id of the URL
+        """
+        url_id = self._ids.get(url)
+        if url_id is None:
+            url_id = self._ids[url] = len(self.urls)
+            self.urls.append(url)
+        return url_id
+
+    def url(self, url_id):
+        """
+        :param url_id: the id of a URL
+        :return: the URL with the given id
+        """
+        return self.urls[url_id]
+
+
+class CompactResults:
+    """
+    The CompactResults class keeps the results of a crawl in memory in a compact form: assets
+    are interned in a URLTable and the assets of each page are stored as an array of ids, so
+    that assets shared by many pages are stored only once. Iterating over it returns the
+    results in the usual form.
+    """
+
+    def __init__(self, table=None):
+        """
+        Constructor.
+
+        :param table: the URLTable the assets are interned in. If not given, a new one is created.
+        """
+        self.table = table if table is not None else URLTable()
+        self._pages = []
+        self._assets = []
+        # Maps the indexes of the duplicate pages to the URL of the page they duplicate
+        self._aliases = {}
+
+    def __len__(self):
+        return len(self._pages)
+
+    def append(self, result):
+        """
+        Adds the result of a page.
+
+        :param result: a dictionary containing the URL of a page together with its static assets
+        """
+        if 'alias_of' in result:
+            self._aliases[len(self._pages)] = result['alias_of']
+        self._pages.append(result['url'])
+        self._assets.append(array('I', map(self.table.intern, result['assets'])))
+
+    def extend(self, results):
+        """
+        Adds the results of several pages.
+
+        :param results: an iterable over the results of the pages
+        """
+        for result in results:
+            self.append(result)
+
+    def __getitem__(self, index):
+        """
+        :param index: the index of a page, in the order the results were added
+        :return: a dictionary containing the URL of the page together with its static assets
+        """
+        if index < 0:
+            index += len(self._pages)
+        urls = self.table.urls
+        result = {'url': self._pages[index], 'assets': [urls[asset_id] for asset_id in self._assets[index]]}
+        if index in self._aliases:
+            result['alias_of'] = self._aliases[index]
+        return result
+
+    def __iter__(self):
+        """
+        :return: an iterator over dictionaries containing the URL of a visited page together with
+        its static assets
+        """
+        for index in range(len(self._pages)):
+            yield self[index]
@@ -0,0 +1,266 @@
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+
+
+class MemoryVisitedSet:
+    """
+    The MemoryVisitedSet class keeps the canonical URLs added to a Frontier in a Python set.
+    It is exact and fast, but it holds every URL in memory.
+    """
+
+    def __init__(self):
+        """
+        Constructor. Initializes an empty set.
+        """
+        self._urls = set()
+
+    def __len__(self):
+        return len(self._urls)
+
+    def __contains__(self, url):
+        return url in self._urls
+
+    def add(self, url):
+        """
+        Adds a URL to the set.
+
+        :param url: a canonical URL
+        :return: True if the URL has been added, False if it was already in the set
+        """
+        if url in self._urls:
+            return False
+        self._urls.add(url)
+        return True
+
+    def close(self):
+        """
+        Releases the resources of the set. There are none to release.
+        """
+
+
+class _BloomFilter:
+    """
+    A Bloom filter with a fixed capacity, using double hashing to compute the positions of the
+    bits of each key.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.count = 0
+        self.bit_count = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.bit_count / capacity * math.log(2))))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+
+    def _positions(self, first_hash, second_hash):
+        return [(first_hash + i * second_hash) % self.bit_count for i in range(self.hash_count)]
+
+    def contains(self, first_hash, second_hash):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(first_hash,
+                                                                                                  second_hash))
+
+    def add(self, first_hash, second_hash):
+        bits = self.bits
+        for position in self._positions(first_hash, second_hash):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class BloomVisitedSet:
+    """
+    The BloomVisitedSet class keeps the canonical URLs added to a Frontier in a scalable Bloom
+    filter: a series of Bloom filters, each one larger and stricter than the previous one, so
+    that the number of URLs doesn't need to be known in advance. It takes a few bytes per URL,
+    whatever its length, but it is not exact: a URL never added can be reported as already
+    added with a probability bounded by the error rate, in which case the page isn't visited.
+    """
+
+    def __init__(self, error_rate=0.001, initial_capacity=100000, growth=2, tightening=0.5):
+        """
+        Constructor. Initializes an empty set.
+
+        :param error_rate: the maximum probability that a new URL is reported as already added
+        :param initial_capacity: the number of URLs of the first Bloom filter
+        :param growth: how much larger each Bloom filter is than the previous one
+        :param tightening: how much smaller the error rate of each Bloom filter is than the one
+        of the previous filter
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError('The error rate must be between 0 and 1.')
+        if not 0 < tightening < 1:
+            raise ValueError('The tightening ratio must be between 0 and 1.')
+        self.error_rate = error_rate
+        self.initial_capacity = initial_capacity
+        self.growth = growth
+        self.tightening = tightening
+        self._count = 0
+        # The error rates of the filters are a geometric series whose sum is error_rate
+        self._filters = [_BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def __len__(self):
+        """
+        :return: the number of URLs added to the set
+        """
+        return self._count
+
+    @staticmethod
+    def _hash(url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        # The second hash must be odd, so that it is coprime with the number of bits of any filter
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def __contains__(self, url):
+        first_hash, second_hash = self._hash(url)
+        return any(bloom_filter.contains(first_hash, second_hash) for bloom_filter in self._filters)
+
+    def add(self, url):
+        """
+        Adds a URL to the set.
+
+        :param url: a canonical URL
+        :return: True if the URL has been added, False if it was, or it is believed to be,
+        already in the set
+        """
+        first_hash, second_hash = self._hash(url)
+        if any(bloom_filter.contains(first_hash, second_hash) for bloom_filter in self._filters):
+            return False
+        current_filter = self._filters[-1]
+        if current_filter.count >= current_filter.capacity:
+            error_rate = self.error_rate * (1 - self.tightening) * self.tightening ** len(self._filters)
+            current_filter = _BloomFilter(current_filter.capacity * self.growth, error_rate)
+            self._filters.append(current_filter)
+        current_filter.add(first_hash, second_hash)
+        self._count += 1
+        return True
+
+    @property
+    def size_in_bytes(self):
+        """
+        :return: the number of bytes of the bit arrays of the filters
+        """
+        return sum(len(bloom_filter.bits) for bloom_filter in self._filters)
+
+    def close(self):
+        """
+        Releases the resources of the set. There are none to release.
+        """
+
+
+class SQLiteVisitedSet:
+    """
+    The SQLiteVisitedSet class keeps the canonical URLs added to a Frontier in an SQLite
+    database on disk, so that crawls aren't bound by the available memory while staying exact.
+    Changes are committed every commit_every URLs and when the set is closed. Each URL is stored
+    with its insertion order, so that a set unpickled from a Checkpoint drops the URLs added
+    after the frontier was saved and matches the saved state of the crawl.
+    """
+
+    def __init__(self, path=None, cache_size=2000, reset=False, commit_every=1000):
+        """
+        Constructor. Opens or creates the database.
+
+        :param path: the path of the database. If not given, a temporary file deleted when the
+        set is closed is used.
+        :param cache_size: the number of database pages SQLite keeps in memory
+        :param reset: if True, the URLs left in the database by a previous crawl are deleted
+        :param commit_every: the number of URLs added in each transaction
+        """
+        if commit_every < 1:
+            raise ValueError('The number of URLs of each transaction must be a positive integer.')
+        self.cache_size = cache_size
+        self.commit_every = commit_every
+        self._temporary = path is None
+        if path is None:
+            file_descriptor, path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(file_descriptor)
+        self.path = path
+        self._connect()
+        if reset:
+            self._connection.execute('DELETE FROM visited')
+            self._connection.commit()
+            self._count = self._last_seq = 0
+
+    def _connect(self, last_seq=None):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute('PRAGMA cache_size = {}'.format(int(self.cache_size)))
+        self._connection.execute('CREATE TABLE IF NOT EXISTS visited (url TEXT PRIMARY KEY, seq INTEGER) WITHOUT ROWID')
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(visited)')]
+        if 'seq' not in columns:
+            # Databases written by older versions have no insertion order
+            self._connection.execute('ALTER TABLE visited ADD COLUMN seq INTEGER DEFAULT 0')
+            self._connection.commit()
+        if last_seq is not None:
+            # The URLs added after the set was pickled aren't in the saved frontier
+            self._connection.execute('DELETE FROM visited WHERE seq > ?', (last_seq,))
+            self._connection.commit()
+        self._count, self._last_seq = self._connection.execute(
+            'SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM visited').fetchone()
+        self._uncommitted = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, url):
+        return self._connection.execute('SELECT 1 FROM visited WHERE url = ?', (url,)).fetchone() is not None
+
+    def add(self, url):
+        """
+        Adds a URL to the set, committing the pending URLs if the transaction is full.
+
+        :param url: a canonical URL
+        :return: True if the URL has been added, False if it was already in the set
+        """
+        added = self._connection.execute('INSERT OR IGNORE INTO visited VALUES (?, ?)',
+                                         (url, self._last_seq + 1)).rowcount == 1
+        if added:
+            self._count += 1
+            self._last_seq += 1
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+        return added
+
+    def commit(self):
+        """
+        Commits the URLs added since the last commit.
+        """
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def __getstate__(self):
+        if self._temporary:
+            raise TypeError('A temporary SQLiteVisitedSet can\'t be saved, give it a path.')
+        self.commit()
+        return {'path': self.path, 'cache_size': self.cache_size, 'commit_every': self.commit_every,
+                'seq': self._last_seq}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.cache_size = state['cache_size']
+        self.commit_every = state.get('commit_every', 1000)
+        self._temporary = False
+        self._connect(last_seq=state.get('seq'))
+
+    def close(self):
+        """
+        Commits the pending URLs and closes the database. A temporary database is deleted.
+        """
+        if self._connection is None:
+            return
+        if not self._temporary:
+            self.commit()
+        self._connection.close()
+        self._connection = None
+        if self._temporary:
+            os.remove(self.path)
+
+
+# The visited set backends, by name
+VISITED_SETS = {
+    'memory': MemoryVisitedSet,
+    'bloom': BloomVisitedSet,
+    'sqlite': SQLiteVisitedSet,
+}
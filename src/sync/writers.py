@@ -0,0 +1,125 @@
+"""
+This module contains the writers used to stream the results of a crawl. A writer receives
+the result of each page as soon as it is available and writes it to one or more text
+streams, so that no result needs to be kept in memory.
+"""
+import json
+
+from src.sync.url_table import URLTable
+
+
+class JSONArrayWriter:
+    """
+    The JSONArrayWriter class writes the results as a json array, one element at a time. The
+    output is well-formed once the writer is closed, and is the same returned by Spider.crawl.
+    """
+
+    def __init__(self, streams):
+        """
+        Constructor.
+
+        :param streams: the list of text streams the results are written to
+        """
+        self.streams = streams
+        self.count = 0
+
+    def _write(self, text):
+        """
+        Writes a chunk of text to every stream, flushing it so that consumers see it immediately.
+
+        :param text: the text to write
+        """
+        for stream in self.streams:
+            stream.write(text)
+            stream.flush()
+
+    def write(self, result):
+        """
+        Writes the result of a page.
+
+        :param result: a dictionary containing the URL of a page together with its static assets
+        """
+        self._write(('[' if self.count == 0 else ', ') + json.dumps(result))
+        self.count += 1
+
+    def close(self):
+        """
+        Terminates the json array. The streams are left open.
+        """
+        self._write(('[' if self.count == 0 else '') + ']\n')
+
+
+class NDJSONWriter(JSONArrayWriter):
+    """
+    The NDJSONWriter class writes the results as newline delimited json: one json object per line.
+    """
+
+    def write(self, result):
+        """
+        Writes the result of a page on its own line.
+
+        :param result: a dictionary containing the URL of a page together with its static assets
+        """
+        self._write(json.dumps(result) + '\n')
+        self.count += 1
+
+    def close(self):
+        """
+        Nothing to terminate: every line is a complete json object. The streams are left open.
+        """
+
+
+class CompactJSONWriter(JSONArrayWriter):
+    """
+    The CompactJSONWriter class writes the results as a json object whose 'pages' array lists
+    every page with the ids of its assets, followed by an 'assets' array mapping each id to its
+    URL. Assets shared by many pages are written only once, in the table written when the
+    writer is closed. read_compact brings the output back to the usual results.
+    """
+
+    def __init__(self, streams):
+        """
+        Constructor.
+
+        :param streams: the list of text streams the results are written to
+        """
+        super().__init__(streams)
+        self.table = URLTable()
+
+    def write(self, result):
+        """
+        Writes the result of a page, interning its assets.
+
+        :param result: a dictionary containing the URL of a page together with its static assets
+        """
+        compact_result = {'url': result['url'], 'assets': [self.table.intern(asset) for asset in result['assets']]}
+        if 'alias_of' in result:
+            compact_result['alias_of'] = result['alias_of']
+        self._write(('{"pages": [' if self.count == 0 else ', ') + json.dumps(compact_result))
+        self.count += 1
+
+    def close(self):
+        """
+        Terminates the pages array and writes the asset table. The streams are left open.
+        """
+        self._write(('{"pages": [' if self.count == 0 else '') + '], "assets": ' + json.dumps(self.table.urls) + '}\n')
+
+
+def read_compact(data):
+    """
+    Expands the output of a CompactJSONWriter to the results returned by Spider.crawl.
+
+    :param data: the json object written by a CompactJSONWriter, already decoded
+    :return: a list of dictionaries containing the URL of a visited page together with its static assets
+    """
+    assets = data['assets']
+    results = []
+    for page in data['pages']:
+        result = {'url': page['url'], 'assets': [assets[asset_id] for asset_id in page['assets']]}
+        if 'alias_of' in page:
+            result['alias_of'] = page['alias_of']
+        results.append(result)
+    return results
+
+
+WRITERS = {'json': JSONArrayWriter, 'ndjson': NDJSONWriter, 'compact': CompactJSONWriter}
@@ -1,8 +1,218 @@
 import argparse
+import cProfile
+import functools
 import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
 import time
 
+from src.sync.archive import HTTPArchive, RecordingTransport, ReplayTransport
+from src.sync.checkpoint import Checkpoint
+from src.sync.classification_cache import ClassificationCache
+from src.sync.dedup import DuplicateIndex
+from src.sync.distributed import DistributedCrawler, SQLiteFrontierStore
+from src.sync.frontier import PriorityFrontier
+from src.sync.http_cache import CachingTransport, HTTPCache
+from src.sync.metrics import CrawlMetrics, MetricsServer
+from src.sync.politeness import PolitenessScheduler, PoliteTransport
+from src.sync.result_store import ResultStore
+from src.sync.scoring import DepthScorer, InlinkScorer, PathFilter, PatternScorer, parse_pattern_weight
+from src.sync.service import CrawlService, ServiceServer
+from src.sync.sitemap import SitemapSeeder
 from src.sync.spider import Spider
+from src.sync.transport import PooledTransport, UrllibTransport
+from src.sync.url_table import CompactResults
+from src.sync.visited import VISITED_SETS, BloomVisitedSet, SQLiteVisitedSet
+from src.sync.writers import WRITERS
+
+
+def write_results(results, output_format, path_to_file=None):
+    """
+    Writes the results of a crawl to the standard output and, if needed, to a file, one page at a time.
+
+    :param results: an iterable over the results of the pages
+    :param output_format: the name of the output format, one of the keys of WRITERS
+    :param path_to_file: the full path of the file the results should be saved to, if any
+    """
+    outfile = open(path_to_file, 'w') if path_to_file else None
+    writer = WRITERS[output_format]([sys.stdout] + ([outfile] if outfile else []))
+    try:
+        for result in results:
+            writer.write(result)
+        writer.close()
+    finally:
+        if outfile:
+            outfile.close()
+
+
+def build_transport(args, politeness=None):
+    """
+    Builds the transport described by the command line arguments.
+
+    :param args: the parsed command line arguments
+    :param politeness: the PolitenessScheduler pacing the requests sent over the network, if any
+    :return: a transport
+    """
+    if args.replay:
+        return ReplayTransport(HTTPArchive(args.replay))
+    if args.no_keep_alive:
+        transport = UrllibTransport(timeout=args.timeout)
+    else:
+        transport = PooledTransport(max_connections_per_host=args.pool_size, idle_timeout=args.idle_timeout,
+                                    timeout=args.timeout, connect_timeout=args.connect_timeout)
+    if politeness is not None:
+        # Paced below the cache, so that cache hits are served at once. The spider honors robots.txt
+        transport = PoliteTransport(transport, politeness, robots=False)
+    if args.http_cache:
+        transport = CachingTransport(transport, HTTPCache(args.http_cache, max_size=args.http_cache_size * 1024 * 1024),
+                                     max_body_size=int(args.max_body_size * 1024 * 1024))
+    if args.record:
+        transport = RecordingTransport(transport, HTTPArchive(args.record, mode='a'),
+                                       max_body_size=int(args.max_body_size * 1024 * 1024))
+    return transport
+
+
+def get_spider_options(args):
+    """
+    Returns the keyword arguments of the Spider described by the command line arguments, except
+    its cache, metrics and transport.
+
+    :param args: the parsed command line arguments
+    :return: a dictionary
+    """
+    politeness = None
+    if args.polite:
+        politeness = PolitenessScheduler(rate=args.rate, min_rate=min(0.5, args.rate), max_rate=args.max_rate,
+                                         respect_robots=not args.ignore_robots)
+    if args.visited == 'bloom':
+        visited_set = functools.partial(BloomVisitedSet, error_rate=args.bloom_error_rate)
+    elif args.visited == 'sqlite':
+        # A checkpoint needs the database to outlive the crawl, so that it can be resumed
+        visited_path = args.visited_path or (args.checkpoint + '.visited' if args.checkpoint else None)
+        visited_set = functools.partial(SQLiteVisitedSet, visited_path, reset=True)
+    else:
+        visited_set = VISITED_SETS[args.visited]
+    duplicate_index = functools.partial(DuplicateIndex, max_distance=args.dedup_distance) if args.dedup else None
+    frontier = None
+    if args.priority or args.prefer or args.allow_paths or args.deny_paths:
+        scorers = [DepthScorer(), InlinkScorer()]
+        if args.prefer:
+            scorers.append(PatternScorer(args.prefer))
+        if args.allow_paths or args.deny_paths:
+            scorers.append(PathFilter(allow=args.allow_paths or (), deny=args.deny_paths or ()))
+        frontier = functools.partial(PriorityFrontier, scorers=scorers)
+    seeder = None
+    if args.sitemaps:
+        seeder = SitemapSeeder(state_path=args.sitemap_state, max_sitemaps=args.max_sitemaps,
+                               enable_logging=not args.hide_logs)
+    return {'max_workers': args.max_workers, 'strict': args.strict, 'parse_workers': args.parse_workers,
+            'politeness': politeness, 'progress_interval': args.progress_interval, 'visited_set': visited_set,
+            'max_body_size': int(args.max_body_size * 1024 * 1024), 'compression': not args.no_compression,
+            # A response replayed from an archive doesn't change when retried
+            'max_retries': 0 if args.replay else args.retries, 'deadline': args.deadline, 'seeder': seeder,
+            'duplicate_index': duplicate_index, 'frontier': frontier, 'max_depth': args.max_depth}
+
+
+def build_spider(args, cache, metrics, result_store=None):
+    """
+    Builds the Spider described by the command line arguments.
+
+    :param args: the parsed command line arguments
+    :param cache: the ClassificationCache of the spider
+    :param metrics: the CrawlMetrics of the spider
+    :param result_store: the ResultStore the results are saved to while crawling, if any
+    :return: a Spider
+    """
+    options = get_spider_options(args)
+    transport = build_transport(args, options['politeness'])
+    return Spider(enable_logging=not args.hide_logs, cache=cache, transport=transport, metrics=metrics,
+                  result_store=result_store, **options)
+
+
+def parse_address(address):
+    """
+    Parses the address the service listens on.
+
+    :param address: a port, host:port, or the path of a Unix socket
+    :return: the tuple (host, port), or the path of the Unix socket
+    """
+    if '/' in address:
+        return address
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def serve(args, cache):
+    """
+    Runs the crawler as a service accepting crawl jobs through its API, until it is interrupted.
+
+    :param args: the parsed command line arguments
+    :param cache: the ClassificationCache shared by the jobs
+    """
+    options = get_spider_options(args)
+    service = CrawlService(build_transport(args, options['politeness']), cache, max_jobs=args.max_jobs,
+                           max_queued_jobs=args.max_queued_jobs, max_job_pages=args.max_job_pages,
+                           max_job_seconds=args.max_job_seconds, enable_logging=not args.hide_logs, **options)
+    try:
+        server = ServiceServer(service, parse_address(args.serve))
+        # Stops gracefully when terminated, as when interrupted
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        logging.info('Serving crawl jobs at {}'.format(server.url))
+        try:
+            threading.Event().wait()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.close()
+    finally:
+        service.close()
+
+
+def run_distributed_worker(args):
+    """
+    Runs a worker of a distributed crawl, whose results are only stored in the shared store.
+
+    :param args: the parsed command line arguments
+    """
+    spider = build_spider(args, ClassificationCache(max_size=args.cache_size), CrawlMetrics())
+    store = SQLiteFrontierStore(args.distributed, shared_filesystem=args.shared_filesystem)
+    try:
+        for _ in DistributedCrawler(spider, store, lease_seconds=args.lease).crawl(args.website, args.max_pages):
+            pass
+    finally:
+        store.close()
+        spider.close()
+
+
+def crawl_distributed(spider, args):
+    """
+    Takes part in a distributed crawl, together with args.processes - 1 worker processes started
+    here and any other worker sharing the same store, and returns the results of all of them once
+    the crawl is over.
+
+    :param spider: the Spider of the current process
+    :param args: the parsed command line arguments
+    :return: an iterator over the results of every page visited by the workers
+    """
+    store = SQLiteFrontierStore(args.distributed, shared_filesystem=args.shared_filesystem)
+    # The crawl is seeded before starting the other processes, so that they don't race to do it
+    store.seed(args.website, args.max_pages)
+    workers = [multiprocessing.Process(target=run_distributed_worker, args=(args,))
+               for _ in range(args.processes - 1)]
+    try:
+        for worker in workers:
+            worker.start()
+        for _ in DistributedCrawler(spider, store, lease_seconds=args.lease).crawl(args.website, args.max_pages):
+            pass
+        for worker in workers:
+            worker.join()
+        for result in store.results():
+            yield result
+    finally:
+        store.close()
 
 
 def main():
@@ -12,30 +222,236 @@ def main():
     """
     # Acquires input arguments from the user
     parser = argparse.ArgumentParser(description='A simple synchronous web crawler')
-    parser.add_argument('website', help='the website you want to start the crawling from')
+    parser.add_argument('website', nargs='?', help='the website you want to start the crawling from')
     parser.add_argument('-m', dest='max_pages', type=int, default=5,
                         help='the maximum number of pages that will be visited')
     parser.add_argument('-l', dest='hide_logs', action='store_true', default=False,
                         help='a flag that tells if logs should be hidden')
     parser.add_argument('-s', dest='path_to_file', type=str,
                         help='tells if the results should be saved to file and provides the full path for saving')
+    parser.add_argument('-w', dest='max_workers', type=int, default=8,
+                        help='the number of threads sending in parallel the HEAD requests that classify the links')
+    parser.add_argument('--parse-workers', dest='parse_workers', type=int, default=0,
+                        help='the number of processes parsing the pages while the next ones are fetched')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=100000,
+                        help='the maximum number of URL classifications kept in memory')
+    parser.add_argument('--cache-file', dest='cache_file', type=str,
+                        help='a json file the URL classifications are loaded from and saved to')
+    parser.add_argument('--strict', dest='strict', action='store_true', default=False,
+                        help='a flag that tells if every link should be classified with a HEAD request. Otherwise '
+                             'links to pages are only checked when fetched, and files whose URL looks like the one of '
+                             'a page may be reported as pages')
+    parser.add_argument('--no-keep-alive', dest='no_keep_alive', action='store_true', default=False,
+                        help='a flag that tells if a new connection should be opened for every request')
+    parser.add_argument('--pool-size', dest='pool_size', type=int, default=8,
+                        help='the maximum number of idle connections kept alive for each host')
+    parser.add_argument('--idle-timeout', dest='idle_timeout', type=float, default=30,
+                        help='the number of seconds after which an idle connection is closed')
+    parser.add_argument('--max-body-size', dest='max_body_size', type=float, default=10,
+                        help='the maximum size in megabytes of a page, larger pages are abandoned')
+    parser.add_argument('--no-compression', dest='no_compression', action='store_true', default=False,
+                        help='a flag that tells if pages should be requested without compression')
+    parser.add_argument('--timeout', dest='timeout', type=float, default=30,
+                        help='the number of seconds waited for each read of a response before giving up')
+    parser.add_argument('--connect-timeout', dest='connect_timeout', type=float, default=10,
+                        help='the number of seconds waited for a connection to be established')
+    parser.add_argument('--retries', dest='retries', type=int, default=2,
+                        help='the number of times a request failing for a transient reason is retried')
+    parser.add_argument('--deadline', dest='deadline', type=float,
+                        help='the number of seconds after which the crawl stops, returning the pages visited so far')
+    parser.add_argument('--http-cache', dest='http_cache', type=str,
+                        help='a directory where HTTP responses are cached and revalidated across crawls')
+    parser.add_argument('--http-cache-size', dest='http_cache_size', type=int, default=1024,
+                        help='the maximum size in megabytes of the HTTP cache')
+    parser.add_argument('--record', dest='record', type=str,
+                        help='the path of a compressed WARC archive where every response is recorded')
+    parser.add_argument('--replay', dest='replay', type=str,
+                        help='the path of an archive written by --record, serving the whole crawl without network')
+    parser.add_argument('--polite', dest='polite', action='store_true', default=False,
+                        help='a flag that tells if requests should be paced per host, honoring robots.txt')
+    parser.add_argument('--rate', dest='rate', type=float, default=5.0,
+                        help='the initial number of requests per second sent to each host in polite mode')
+    parser.add_argument('--max-rate', dest='max_rate', type=float, default=50.0,
+                        help='the maximum number of requests per second sent to each host in polite mode')
+    parser.add_argument('--ignore-robots', dest='ignore_robots', action='store_true', default=False,
+                        help='a flag that tells if robots.txt should be ignored in polite mode')
+    parser.add_argument('--sitemaps', dest='sitemaps', action='store_true', default=False,
+                        help='a flag that tells if the pages listed by the sitemaps should be queued before crawling')
+    parser.add_argument('--sitemap-state', dest='sitemap_state', type=str,
+                        help='a json file keeping the <lastmod> of the visited pages, so that unchanged pages '
+                             'are skipped by later crawls')
+    parser.add_argument('--max-sitemaps', dest='max_sitemaps', type=int, default=100,
+                        help='the maximum number of sitemaps read before crawling, indexes included')
+    parser.add_argument('--dedup', dest='dedup', action='store_true', default=False,
+                        help='a flag that tells if pages whose content has already been seen should not be parsed')
+    parser.add_argument('--dedup-distance', dest='dedup_distance', type=int, default=3,
+                        help='the maximum number of bits differing between the SimHashes of near duplicate pages')
+    parser.add_argument('--priority', dest='priority', action='store_true', default=False,
+                        help='a flag that tells if the pages closer to the start and linked by more pages should be '
+                             'visited first, instead of in the order they are found')
+    parser.add_argument('--prefer', dest='prefer', type=parse_pattern_weight, action='append',
+                        help='a PATTERN=WEIGHT pair adding WEIGHT to the priority of the URLs matching the regular '
+                             'expression PATTERN, e.g. "/calendar/=-5". Can be repeated, implies --priority')
+    parser.add_argument('--allow-path', dest='allow_paths', type=str, action='append',
+                        help='a path prefix the crawl is restricted to. Can be repeated, implies --priority')
+    parser.add_argument('--deny-path', dest='deny_paths', type=str, action='append',
+                        help='a path prefix that is never visited. Can be repeated, implies --priority')
+    parser.add_argument('--max-depth', dest='max_depth', type=int,
+                        help='the maximum number of links followed from the start page to reach a page')
+    parser.add_argument('--visited', dest='visited', choices=sorted(VISITED_SETS), default='memory',
+                        help='where the URLs already queued are kept: in memory, in a Bloom filter or on disk')
+    parser.add_argument('--bloom-error-rate', dest='bloom_error_rate', type=float, default=0.001,
+                        help='the probability that the Bloom filter wrongly reports a new URL as already queued')
+    parser.add_argument('--visited-path', dest='visited_path', type=str,
+                        help='the path of the SQLite database keeping the URLs already queued')
+    parser.add_argument('--distributed', dest='distributed', type=str,
+                        help='the path of the SQLite database shared by the workers of a distributed crawl')
+    parser.add_argument('--shared-filesystem', dest='shared_filesystem', action='store_true', default=False,
+                        help='a flag that tells if the database of --distributed is shared by several machines')
+    parser.add_argument('--processes', dest='processes', type=int, default=1,
+                        help='the number of local worker processes taking part in a distributed crawl')
+    parser.add_argument('--lease', dest='lease', type=float, default=60,
+                        help='the number of seconds a worker of a distributed crawl has to visit a page before '
+                             'it is given to another worker')
+    parser.add_argument('--serve', dest='serve', type=str,
+                        help='runs the crawler as a service accepting crawl jobs through a JSON API, listening on '
+                             'a port, host:port or the path of a Unix socket')
+    parser.add_argument('--max-jobs', dest='max_jobs', type=int, default=2,
+                        help='the number of crawl jobs run concurrently by the service')
+    parser.add_argument('--max-queued-jobs', dest='max_queued_jobs', type=int, default=16,
+                        help='the maximum number of crawl jobs waiting to be run by the service')
+    parser.add_argument('--max-job-pages', dest='max_job_pages', type=int, default=10000,
+                        help='the maximum number of pages a crawl job submitted to the service can visit')
+    parser.add_argument('--max-job-seconds', dest='max_job_seconds', type=float, default=3600,
+                        help='the maximum number of seconds a crawl job submitted to the service can run')
+    parser.add_argument('--progress', dest='progress_interval', type=float,
+                        help='the number of seconds between two progress lines logged while crawling')
+    parser.add_argument('--metrics-out', dest='metrics_out', type=str,
+                        help='the path of the JSON file the metrics of the crawl should be saved to')
+    parser.add_argument('--metrics-port', dest='metrics_port', type=int,
+                        help='the port serving the metrics of the crawl in the Prometheus text format at /metrics')
+    parser.add_argument('--profile', dest='profile', type=str,
+                        help='the path of the file the cProfile statistics of the crawl should be saved to')
+    parser.add_argument('-f', dest='output_format', choices=sorted(WRITERS), default='json',
+                        help='the format of the results: a json array, newline delimited json or a compact '
+                             'json object listing every asset once')
+    parser.add_argument('--stream', dest='stream', action='store_true', default=False,
+                        help='a flag that tells if results should be written as soon as each page is crawled')
+    parser.add_argument('--store', dest='store', type=str,
+                        help='the path of an SQLite database where the pages, their assets, status codes and timings '
+                             'are saved while crawling, instead of being kept in memory')
+    parser.add_argument('--checkpoint', dest='checkpoint', type=str,
+                        help='the full path of a file where the state of the crawl is periodically saved')
+    parser.add_argument('--checkpoint-every', dest='checkpoint_every', type=int,
+                        help='the maximum number of pages visited between two checkpoints')
+    parser.add_argument('--checkpoint-seconds', dest='checkpoint_seconds', type=float, default=60,
+                        help='the number of seconds between two checkpoints')
+    parser.add_argument('--resume', dest='resume', action='store_true', default=False,
+                        help='a flag that tells if the crawl should continue from the last checkpoint')
     args = parser.parse_args()
+    if args.serve:
+        if args.website:
+            parser.error('the websites are given by the jobs submitted to --serve')
+        # Options writing to a single file, or describing a single crawl, can't be shared by the jobs
+        for option, name in ((args.distributed, '--distributed'), (args.checkpoint, '--checkpoint'),
+                             (args.sitemaps, '--sitemaps'), (args.visited_path, '--visited-path'),
+                             (args.store, '--store'),
+                             (args.stream, '--stream'), (args.path_to_file, '-s'), (args.profile, '--profile'),
+                             (args.metrics_out, '--metrics-out'), (args.metrics_port is not None, '--metrics-port')):
+            if option:
+                parser.error('{} is not supported by --serve'.format(name))
+    elif not args.website:
+        parser.error('the website is required')
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if args.distributed and args.checkpoint:
+        parser.error('--distributed keeps the state of the crawl in its store, --checkpoint is not needed')
+    if args.distributed and args.sitemaps:
+        parser.error('--sitemaps is not supported by distributed crawls')
+    if args.distributed and args.dedup:
+        parser.error('--dedup is not supported by distributed crawls')
+    if args.distributed and (args.priority or args.prefer or args.allow_paths or args.deny_paths
+                             or args.max_depth is not None):
+        parser.error('--priority, --prefer, --allow-path, --deny-path and --max-depth are not supported by '
+                     'distributed crawls')
+    if args.distributed and args.store:
+        parser.error('--distributed already stores the results in its database, --store is not needed')
+    if args.record and args.replay:
+        parser.error('--record and --replay can\'t be used together')
+    if args.replay and args.http_cache:
+        parser.error('--replay serves every response from the archive, --http-cache is not needed')
+    if args.replay and not os.path.exists(args.replay):
+        parser.error('{} does not exist'.format(args.replay))
+    if args.distributed and args.record:
+        parser.error('--record is not supported by distributed crawls')
+    if args.sitemap_state and not args.sitemaps:
+        parser.error('--sitemap-state requires --sitemaps')
+    if args.processes > 1 and not args.distributed:
+        parser.error('--processes requires --distributed')
+    if args.shared_filesystem and not args.distributed:
+        parser.error('--shared-filesystem requires --distributed')
     # Sets up the main Logger of the program to the INFO level, this means that everything with a severity
     # greater than or equal to the INFO level will be shown (e.g.: warnings, errors)
     logging.getLogger().setLevel(logging.INFO)
     # Storing the current time
     start_time = time.time()
     # Setting up the Spider for crawling
-    spider = Spider(enable_logging=not args.hide_logs)
-    result = spider.crawl(args.website, args.max_pages)
-    print('Result of the crawling for {} returned in {:.2f} seconds:'.format(args.website, time.time()-start_time))
-    print(result)
-    # In addition, saves the result to a file if needed
-    if args.path_to_file:
-        with open(args.path_to_file, 'w') as outfile:
-            # Result is already a json string!
-            outfile.write(result)
-    # Cleans up the environment deleting spider
+    cache = ClassificationCache(max_size=args.cache_size)
+    if args.cache_file and os.path.exists(args.cache_file):
+        cache.load(args.cache_file)
+    if args.serve:
+        serve(args, cache)
+        if args.cache_file:
+            cache.save(args.cache_file)
+        return
+    metrics = CrawlMetrics()
+    metrics_server = MetricsServer(metrics, args.metrics_port) if args.metrics_port is not None else None
+    # A resumed crawl adds its pages to the results of the previous run
+    result_store = ResultStore(args.store, reset=not args.resume) if args.store else None
+    spider = build_spider(args, cache, metrics, result_store)
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = Checkpoint(args.checkpoint, interval=args.checkpoint_every, seconds=args.checkpoint_seconds)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    if args.distributed:
+        results = crawl_distributed(spider, args)
+    else:
+        results = spider.iter_crawl(args.website, args.max_pages, checkpoint=checkpoint, resume=args.resume)
+    if args.stream:
+        # Only results go to the standard output, so that it can be consumed while crawling
+        write_results(results, args.output_format, args.path_to_file)
+        if not args.hide_logs:
+            logging.info('Crawling of {} finished in {:.2f} seconds'.format(args.website, time.time()-start_time))
+    else:
+        if result_store is not None:
+            # The results are saved to the store while crawling and read back one page at a time
+            for _ in results:
+                pass
+            results = result_store.iter_results()
+        else:
+            # Keeps the results compact until they are written
+            compact_results = CompactResults()
+            compact_results.extend(results)
+            results = compact_results
+        print('Result of the crawling for {} returned in {:.2f} seconds:'.format(args.website,
+                                                                              time.time()-start_time))
+        # In addition, saves the result to a file if needed
+        write_results(results, args.output_format, args.path_to_file)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    if args.metrics_out:
+        metrics.save(args.metrics_out)
+    if metrics_server is not None:
+        metrics_server.close()
+    if args.cache_file:
+        cache.save(args.cache_file)
+    if result_store is not None:
+        result_store.close()
+    # Cleans up the environment closing the connections and deleting spider
+    spider.close()
     del spider
 
 if __name__ == '__main__':
@@ -0,0 +1,21 @@
+import tests.sync.mocks as mocks
+
+
+async def mocked_parse_url(*args):
+    """
+    This coroutine is used to mock the parse_url method of the AsyncURLParser object.
+
+    :param args: the input arguments
+    :return: the mocked object
+    """
+    return mocks.mocked_parse_url(*args)
+
+
+async def mocked_get_assets(*args):
+    """
+    This coroutine is used to mock the _get_assets method of the AsyncURLParser object.
+
+    :param args: the input arguments
+    :return: the mocked response
+    """
+    return mocks.mocked_get_assets(*args)
@@ -0,0 +1,61 @@
+import json
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import tests.asynchronous.mocks as async_mocks
+import tests.sync.mocks as mocks
+from src.asynchronous.spider import AsyncSpider
+from src.sync.spider import Spider
+from src.sync.transport import UrllibTransport
+
+
+class TestAsyncSpider(TestCase):
+    """
+    Collection of test cases for the AsyncSpider class.
+    """
+
+    @patch('src.asynchronous.url_parser.AsyncURLParser.parse_url', side_effect=async_mocks.mocked_parse_url)
+    def test_crawl_one(self, mock_parse_url):
+        """
+        Tests the crawl method for max_urls=1.
+        """
+        spider = AsyncSpider()
+        current_json_response = spider.crawl('http://www.sample.com/', 1)
+        expected_json_response = json.dumps([{'url': 'http://www.sample.com/',
+                                              'assets': ['https://www.sample.com/some_img.png']}])
+        self.assertEqual(current_json_response, expected_json_response)
+        del spider
+
+    @patch('src.asynchronous.url_parser.AsyncURLParser.parse_url', side_effect=async_mocks.mocked_parse_url)
+    def test_crawl_three(self, mock_parse_url):
+        """
+        Tests the crawl method for max_urls=3.
+        """
+        spider = AsyncSpider()
+        current_json_response = spider.crawl('http://www.sample.com/', 3)
+        expected_json_response = json.dumps([{'url': 'http://www.sample.com/',
+                                              'assets': ['https://www.sample.com/some_img.png']},
+                                             {'url': 'http://www.sample.com/test1/',
+                                              'assets': ['https://www.sample.com/some_img.png',
+                                                         'https://www.sample.com/some_img1.png']},
+                                             {'url': 'http://www.sample.com/test2/',
+                                              'assets': ['https://www.sample.com/some_img2.png']}])
+        self.assertEqual(current_json_response, expected_json_response)
+        del spider
+
+    @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
+    @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
+    def test_crawl_same_as_sync(self, mock_req, mock_resp):
+        """
+        Tests that the AsyncSpider returns the same results of the Spider configured like it: strict,
+        without retries, compression nor limit on the size of the pages.
+        """
+        for max_pages in range(1, 4):
+            self.assertEqual(AsyncSpider(enable_logging=False).crawl('http://someurl.com/test', max_pages),
+                             Spider(enable_logging=False, strict=True, transport=UrllibTransport(), max_retries=0,
+                                    max_body_size=None, compression=False).crawl('http://someurl.com/test',
+                                                                                 max_pages))
+
+
+if __name__ == '__main__':
+    main()
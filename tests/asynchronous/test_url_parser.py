@@ -0,0 +1,147 @@
+import asyncio
+import http.client
+import threading
+import time
+import urllib.error
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import tests.asynchronous.mocks as async_mocks
+import tests.sync.mocks as mocks
+from src.asynchronous.url_parser import AsyncURLParser
+
+
+class TestAsyncURLParser(TestCase):
+    """
+    Collection of test cases for the AsyncURLParser class.
+    """
+
+    @staticmethod
+    def run_coroutine(parser, coroutine):
+        """
+        Runs the given coroutine in a new event loop and releases the resources of the parser.
+
+        :param parser: the parser used by the coroutine
+        :param coroutine: the coroutine that should be run
+        :return: the value returned by the coroutine
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            parser.close()
+            loop.close()
+
+    def test_creation_with_invalid_limits(self):
+        """
+        Tests that non-positive concurrency limits are refused.
+        """
+        with self.assertRaises(ValueError):
+            AsyncURLParser(max_concurrency=0)
+        with self.assertRaises(ValueError):
+            AsyncURLParser(max_concurrency_per_host=0)
+
+    @patch('src.sync.url_parser.URLParser._get_valid_linked_urls', side_effect=mocks.mocked_get_valid_linked_urls)
+    @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
+    @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
+    def test_get_assets(self, mock_urls, mock_req, mock_resp):
+        """
+        Tests the _get_assets coroutine.
+        """
+        parser = AsyncURLParser()
+        parser.set_base_url('http://someurl.com/')
+        assets = self.run_coroutine(parser, parser._get_assets(
+            "<html><body><a href='http://someurl.com/other'></a></body></html>"))
+        self.assertEqual(assets, ([], ['http://someurl.com/other']))
+        assets = self.run_coroutine(parser, parser._get_assets("<html><body>404 Error<body></html>"))
+        self.assertEqual(assets, ([], []))
+        del parser
+
+    @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
+    @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
+    @patch('src.asynchronous.url_parser.AsyncURLParser._get_assets', side_effect=async_mocks.mocked_get_assets)
+    def test_parse_url(self, mock_req, mock_resp, mock_assets):
+        """
+        Tests the parse_url coroutine.
+        """
+        parser = AsyncURLParser()
+        parser.set_base_url('http://someurl.com/')
+        result = self.run_coroutine(parser, parser.parse_url('http://someurl.com/test'))
+        self.assertEqual(result, ([], ['http://someurl.com/other']))
+        result = self.run_coroutine(parser, parser.parse_url('http://errorurl.com/'))
+        self.assertEqual(result, ([], []))
+        del parser
+
+    def test_parse_url_with_missing_base_url(self):
+        """
+        Tests the parse_url coroutine when no base_url has been previously fed to the parser.
+        """
+        parser = AsyncURLParser()
+        with self.assertRaises(ValueError):
+            self.run_coroutine(parser, parser.parse_url('https://www.google.it/'))
+        del parser
+
+    def test_concurrency_limits(self):
+        """
+        Tests that HEAD requests run concurrently without exceeding the per-host limit.
+        """
+        lock = threading.Lock()
+        counters = {'running': 0, 'peak': 0}
+
+        def slow_head(url):
+            with lock:
+                counters['running'] += 1
+                counters['peak'] = max(counters['peak'], counters['running'])
+            time.sleep(0.05)
+            with lock:
+                counters['running'] -= 1
+            return url, 'image/png'
+
+        parser = AsyncURLParser(max_concurrency=10, max_concurrency_per_host=3)
+        parser.set_base_url('http://someurl.com/')
+        links = ['http://someurl.com/{}.png'.format(i) for i in range(9)]
+        with patch.object(parser, '_get_valid_linked_urls', return_value=links), \
+                patch.object(parser, '_head', side_effect=slow_head):
+            static_assets, links_to_follow = self.run_coroutine(parser, parser._get_assets(''))
+        self.assertEqual(static_assets, links)
+        self.assertEqual(links_to_follow, [])
+        self.assertEqual(counters['peak'], 3)
+        del parser
+
+    def test_unreachable_links(self):
+        """
+        Tests that links whose HEAD request fails without an HTTP response are skipped, like HTTP errors.
+        """
+        def head(url):
+            if url.endswith('/down'):
+                raise urllib.error.URLError('timed out')
+            return url, 'text/html'
+
+        parser = AsyncURLParser(enable_logging=False)
+        parser.set_base_url('http://someurl.com/')
+        links = ['http://someurl.com/down', 'http://someurl.com/up']
+        with patch.object(parser, '_get_valid_linked_urls', return_value=links), \
+                patch.object(parser, '_head', side_effect=head):
+            assets = self.run_coroutine(parser, parser._get_assets(''))
+        self.assertEqual(assets, ([], ['http://someurl.com/up']))
+        del parser
+
+    def test_unreadable_pages(self):
+        """
+        Tests that a page whose body can't be read has no assets, and that links without a Content-Type are
+        considered static assets.
+        """
+        parser = AsyncURLParser(enable_logging=False, timeout=5)
+        self.assertEqual(parser.transport.timeout, 5)
+        parser.set_base_url('http://someurl.com/')
+        with patch.object(parser, '_get_page_bytes', side_effect=http.client.IncompleteRead(b'', 100)):
+            self.assertEqual(self.run_coroutine(parser, parser.parse_url('http://someurl.com/test')), ([], []))
+        with patch.object(parser, '_get_valid_linked_urls', return_value=['http://someurl.com/file']), \
+                patch.object(parser, '_head', return_value=('http://someurl.com/file', None)):
+            assets = self.run_coroutine(parser, parser._get_assets(''))
+        self.assertEqual(assets, (['http://someurl.com/file'], []))
+        del parser
+
+
+if __name__ == '__main__':
+    main()
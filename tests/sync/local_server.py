@@ -0,0 +1,123 @@
+import http.server
+import socketserver
+import threading
+import time
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class LocalHTTPServer:
+    """
+    Runs a local HTTP/1.1 server in a background thread, serving the routes it is given.
+    Each route maps a path to a function receiving the request handler and returning the
+    tuple (status_code, headers, body), or None if the route wrote the response itself. Every request and connection is recorded, so that
+    tests can check what the crawler sent.
+    """
+
+    def __init__(self, routes):
+        """
+        Constructor. Starts the server on a free port of the loopback interface.
+
+        :param routes: a dictionary mapping paths (including the query string) to functions
+        """
+        self.routes = routes
+        self.requests = []
+        self.connections = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def _handle(self):
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                route = server.routes.get(self.path)
+                if route is None:
+                    status_code, headers, body = 404, {'Content-Type': 'text/html'}, b'Not found'
+                else:
+                    response = route(self)
+                    if response is None:
+                        return
+                    status_code, headers, body = response
+                self.send_response(status_code)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = _handle
+            do_HEAD = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def html_route(body, headers=None):
+    """
+    Returns a route serving the given HTML body.
+
+    :param body: the body as a string
+    :param headers: additional response headers
+    :return: the route function
+    """
+    response_headers = {'Content-Type': 'text/html; charset=utf-8'}
+    response_headers.update(headers or {})
+    return lambda handler: (200, response_headers, body.encode('utf-8'))
+
+
+def redirect_route(location):
+    """
+    Returns a route redirecting to the given location.
+
+    :param location: the value of the Location header
+    :return: the route function
+    """
+    return lambda handler: (301, {'Location': location}, b'')
+
+
+def stalled_route(status_code, headers, delay):
+    """
+    Returns a route sending the status and headers of a response announcing a body, and then
+    stalling for the given number of seconds before closing the connection without sending it.
+
+    :param status_code: the status code of the response
+    :param headers: the response headers
+    :param delay: the number of seconds the body is delayed
+    :return: the route function
+    """
+    def route(handler):
+        handler.send_response(status_code)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', '100')
+        handler.end_headers()
+        handler.wfile.flush()
+        time.sleep(delay)
+        handler.close_connection = True
+    return route
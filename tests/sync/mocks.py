@@ -40,11 +40,12 @@ def mocked_http_request(*args, **kwargs):
     return MockHTTPRequest(args[0], kwargs['method'])
 
 
-def mocked_http_response(*args):
+def mocked_http_response(*args, **kwargs):
     """
     This method is used by the mock to replace urllib.request.urlopen.
 
     :param args: the input arguments of the urllib.request.urlopen call
+    :param kwargs: the keyword arguments of the urllib.request.urlopen call, e.g. the timeout
     :return: the mocked response
     """
     mock_request = args[0]
@@ -0,0 +1,149 @@
+import gzip
+import json
+import os
+import tempfile
+import urllib.error
+from unittest import TestCase, main
+
+from src.sync.archive import HTTPArchive, RecordingTransport, ReplayTransport
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from tests.sync.local_server import LocalHTTPServer, html_route, stalled_route
+
+ROUTES = {
+    '/': html_route("<a href='/old'></a><a href='/missing'></a><a href='/about'></a><img src='/logo.png'>"),
+    '/old': lambda handler: (301, {'Location': '/new'}, b''),
+    '/new': html_route("<a href='/'></a><img src='/logo.png'>"),
+    '/about': html_route("<p>About</p>"),
+    '/logo.png': lambda handler: (200, {'Content-Type': 'image/png'}, b''),
+}
+
+
+class TestArchive(TestCase):
+    """
+    Collection of test cases for the HTTPArchive and the recording and replay transports.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'crawl.warc.gz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_archive(self):
+        """
+        Tests that records are read back by request, that the last record of a request wins and that
+        the index is rebuilt when it is missing or behind the archive.
+        """
+        archive = HTTPArchive(self.path, mode='a')
+        archive.put('GET', 'http://www.sample.com/', {'url': 'http://www.sample.com/home', 'status': 200,
+                                                      'reason': 'OK', 'headers': [('Content-Type', 'text/html')],
+                                                      'body': b'<html>\r\n\r\n</html>'})
+        archive.put('HEAD', 'http://www.sample.com/a.png', {'error': 'timed out'})
+        archive.put('HEAD', 'http://www.sample.com/a.png', {'url': 'http://www.sample.com/a.png', 'status': 404,
+                                                            'reason': 'Not Found', 'headers': [], 'body': b''})
+        archive.close()
+        # The archive is a valid multi-member gzip file of WARC records
+        with gzip.open(self.path) as infile:
+            self.assertEqual(infile.read().count(b'WARC/1.1\r\n'), 3)
+        archive = HTTPArchive(self.path)
+        self.assertEqual(len(archive), 2)
+        self.assertEqual(archive.get('GET', 'http://www.sample.com/'),
+                         {'url': 'http://www.sample.com/home', 'status': 200, 'reason': 'OK',
+                          'headers': [('Content-Type', 'text/html')], 'body': b'<html>\r\n\r\n</html>'})
+        self.assertEqual(archive.get('HEAD', 'http://www.sample.com/a.png')['status'], 404)
+        self.assertIsNone(archive.get('HEAD', 'http://www.sample.com/'))
+        self.assertEqual([(method, url) for method, url, _ in archive.iter_records()],
+                         [('GET', 'http://www.sample.com/'), ('HEAD', 'http://www.sample.com/a.png')])
+        archive.close()
+        with open(self.path + '.idx') as infile:
+            lines = infile.readlines()
+        # A crawl killed before indexing its last record, or while writing a record, loses nothing else
+        with open(self.path + '.idx', 'w') as outfile:
+            outfile.writelines(lines[:1])
+        with open(self.path, 'ab') as outfile:
+            outfile.write(b'\x1f\x8b\x08')
+        archive = HTTPArchive(self.path, mode='a')
+        self.assertEqual(archive.get('HEAD', 'http://www.sample.com/a.png')['status'], 404)
+        archive.put('GET', 'http://www.sample.com/b', {'url': 'http://www.sample.com/b', 'error': 'refused'})
+        archive.close()
+        os.remove(self.path + '.idx')
+        archive = HTTPArchive(self.path)
+        self.assertEqual(len(archive), 3)
+        self.assertEqual(archive.get('GET', 'http://www.sample.com/b'),
+                         {'url': 'http://www.sample.com/b', 'error': 'refused'})
+        archive.close()
+
+    def test_record_and_replay(self):
+        """
+        Tests that a crawl replayed from the archive of a recorded crawl returns the same results
+        without sending any request.
+        """
+        with LocalHTTPServer(ROUTES) as server:
+            transport = RecordingTransport(PooledTransport(), HTTPArchive(self.path, mode='a'))
+            spider = Spider(enable_logging=False, strict=True, transport=transport, max_retries=0)
+            results = json.loads(spider.crawl(server.url + '/', 10))
+            spider.close()
+            # Every request is recorded once, the redirect followed by /old included
+            records = transport.stats()['archive_records']
+            self.assertEqual(records, len(server.requests) - 1)
+            # Failed requests are recorded as well
+            transport = RecordingTransport(PooledTransport(), HTTPArchive(self.path, mode='a'))
+            with self.assertRaises(urllib.error.URLError):
+                transport.send('http://127.0.0.1:1/', 'GET')
+            transport.close()
+            requests = len(server.requests)
+            transport = ReplayTransport(HTTPArchive(self.path))
+            spider = Spider(enable_logging=False, strict=True, transport=transport, max_retries=0)
+            self.assertEqual(json.loads(spider.crawl(server.url + '/', 10)), results)
+            self.assertEqual(len(server.requests), requests)
+            self.assertEqual(transport.stats(), {'replay_hits': records, 'replay_misses': 0})
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                transport.send(server.url + '/missing', 'HEAD')
+            self.assertEqual(context.exception.code, 404)
+            # A HEAD request is answered by the recorded GET response, without its body
+            self.assertIsNone(transport.archive.get('HEAD', server.url + '/'))
+            response = transport.send(server.url + '/', 'HEAD')
+            self.assertEqual((response.getcode(), response.read()), (200, b''))
+            self.assertEqual(transport.send(server.url + '/old', 'HEAD').geturl(), server.url + '/new')
+            with self.assertRaises(urllib.error.URLError):
+                transport.send('http://127.0.0.1:1/', 'GET')
+            with self.assertRaises(urllib.error.URLError):
+                transport.send(server.url + '/unknown', 'GET')
+            self.assertEqual(transport.stats()['replay_misses'], 1)
+            spider.close()
+
+    def test_bodies_not_read(self):
+        """
+        Tests that bodies are recorded as far as the crawler reads them, that failures while reading
+        them are recorded, and that such responses are replayed with the same results.
+        """
+        routes = {'/': html_route("<a href='/file'></a><a href='/large'></a><a href='/stalled'></a>"),
+                  '/file': lambda handler: (200, {'Content-Type': 'application/pdf'}, b'%PDF' * 100000),
+                  '/large': html_route("<a href='/'></a>" * 1000),
+                  '/stalled': stalled_route(200, {'Content-Type': 'text/html'}, 1.0)}
+        with LocalHTTPServer(routes) as server:
+            transport = RecordingTransport(PooledTransport(timeout=0.2), HTTPArchive(self.path, mode='a'),
+                                           max_body_size=1000)
+            spider = Spider(enable_logging=False, transport=transport, max_retries=0, max_body_size=1000)
+            results = json.loads(spider.crawl(server.url + '/', 10))
+            spider.close()
+        archive = HTTPArchive(self.path)
+        for path in ('/file', '/large'):
+            entry = archive.get('GET', server.url + path)
+            self.assertTrue(entry['truncated'])
+            self.assertLessEqual(len(entry['body']), 1000)
+        self.assertNotIn('truncated', archive.get('GET', server.url + '/'))
+        self.assertIn('error', archive.get('GET', server.url + '/stalled'))
+        transport = ReplayTransport(archive)
+        spider = Spider(enable_logging=False, transport=transport, max_retries=0, max_body_size=1000)
+        self.assertEqual(json.loads(spider.crawl(server.url + '/', 10)), results)
+        response = transport.send(server.url + '/large', 'GET')
+        with self.assertRaises(urllib.error.URLError):
+            response.read()
+        spider.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import tests.sync.mocks as mocks
+from src.sync.checkpoint import Checkpoint
+from src.sync.spider import Spider
+
+
+class FakeClock:
+    """
+    A clock whose time is set by the test.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCheckpoint(TestCase):
+    """
+    Collection of test cases for the Checkpoint class.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'crawl.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @patch('src.sync.url_parser.URLParser.parse_url', side_effect=mocks.mocked_parse_url)
+    def test_resume(self, mock_parse_url):
+        """
+        Tests that an interrupted crawl resumes from the last checkpoint without visiting again the pages
+        and returns the same results of an uninterrupted crawl.
+        """
+        expected_results = json.loads(Spider().crawl('http://www.sample.com/', 3))
+        mock_parse_url.reset_mock()
+        results = Spider().iter_crawl('http://www.sample.com/', 3, checkpoint=Checkpoint(self.path, interval=1))
+        next(results)
+        next(results)
+        # Simulates a crash: the generator is dropped after two pages
+        del results
+        self.assertEqual(mock_parse_url.call_count, 2)
+        resumed_results = list(Spider().iter_crawl('http://www.sample.com/', 3, checkpoint=Checkpoint(self.path),
+                                                   resume=True))
+        self.assertEqual(resumed_results, expected_results)
+        self.assertEqual(mock_parse_url.call_count, 3)
+
+    @patch('src.sync.url_parser.URLParser.parse_url', side_effect=mocks.mocked_parse_url)
+    def test_results_after_checkpoint_are_discarded(self, mock_parse_url):
+        """
+        Tests that pages visited after the last checkpoint are visited again on resume.
+        """
+        results = Spider().iter_crawl('http://www.sample.com/', 3, checkpoint=Checkpoint(self.path, interval=2))
+        next(results)
+        next(results)
+        next(results)
+        del results
+        # Only the first two pages have been checkpointed
+        self.assertEqual(len(list(Checkpoint(self.path).iter_results())), 3)
+        resumed_results = list(Spider().iter_crawl('http://www.sample.com/', 3, checkpoint=Checkpoint(self.path),
+                                                   resume=True))
+        self.assertEqual([result['url'] for result in resumed_results],
+                         ['http://www.sample.com/', 'http://www.sample.com/test1/', 'http://www.sample.com/test2/'])
+        self.assertEqual(mock_parse_url.call_count, 4)
+
+    @patch('src.sync.url_parser.URLParser.parse_url', side_effect=mocks.mocked_parse_url)
+    def test_time_based_checkpoints(self, mock_parse_url):
+        """
+        Tests that by default the state is saved once enough time has passed, whatever the number of pages.
+        """
+        clock = FakeClock()
+        checkpoint = Checkpoint(self.path, seconds=60, clock=clock)
+        results = Spider().iter_crawl('http://www.sample.com/', 3, checkpoint=checkpoint)
+        next(results)
+        next(results)
+        self.assertFalse(os.path.exists(self.path))
+        clock.now += 60
+        next(results)
+        del results
+        resumed_results = list(Spider().iter_crawl('http://www.sample.com/', 3, checkpoint=Checkpoint(self.path),
+                                                   resume=True))
+        self.assertEqual(len(resumed_results), 3)
+        self.assertEqual(mock_parse_url.call_count, 3)
+
+    def test_resume_other_crawl(self):
+        """
+        Tests that a checkpoint can't be used to resume a crawl with another starting URL.
+        """
+        checkpoint = Checkpoint(self.path)
+        self.assertIsNone(checkpoint.start('http://www.sample.com/', resume=True))
+        checkpoint.save(None, 0, Spider().cache)
+        checkpoint.close()
+        with self.assertRaises(ValueError):
+            Checkpoint(self.path).start('http://www.other.com/', resume=True)
+        with self.assertRaises(ValueError):
+            Checkpoint(self.path, interval=0)
+        with self.assertRaises(ValueError):
+            Checkpoint(self.path, seconds=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import tests.sync.mocks as mocks
+from src.sync.classification_cache import ClassificationCache
+from src.sync.url_parser import URLParser
+
+
+class TestClassificationCache(TestCase):
+    """
+    Collection of test cases for the ClassificationCache class.
+    """
+
+    def test_get_and_put(self):
+        """
+        Tests the get and put methods together with the hit/miss counters.
+        """
+        cache = ClassificationCache()
+        self.assertIsNone(cache.get('http://someurl.com/test'))
+        cache.put('http://someurl.com/test', 'http://someurl.com/test/', True)
+        self.assertEqual(cache.get('http://someurl.com/test'), ('http://someurl.com/test/', True, None))
+        self.assertEqual(cache.stats(), {'entries': 1, 'hits': 1, 'misses': 1})
+        del cache
+
+    def test_lru_eviction(self):
+        """
+        Tests that the least recently used entry is evicted when the cache is full.
+        """
+        cache = ClassificationCache(max_size=2)
+        cache.put('http://someurl.com/a', 'http://someurl.com/a', True)
+        cache.put('http://someurl.com/b', 'http://someurl.com/b', False)
+        cache.get('http://someurl.com/a')
+        cache.put('http://someurl.com/c', 'http://someurl.com/c', False, 404)
+        self.assertEqual(len(cache), 2)
+        self.assertIn('http://someurl.com/a', cache)
+        self.assertNotIn('http://someurl.com/b', cache)
+        self.assertIn('http://someurl.com/c', cache)
+        with self.assertRaises(ValueError):
+            ClassificationCache(max_size=0)
+        del cache
+
+    def test_save_and_load(self):
+        """
+        Tests that a saved cache can be loaded back, without the errors that may be transient.
+        """
+        cache = ClassificationCache()
+        cache.put('http://someurl.com/a', 'http://someurl.com/a/', True)
+        cache.put('http://someurl.com/b.png', 'http://someurl.com/b.png', False, 404)
+        cache.put('http://someurl.com/c', 'http://someurl.com/c', False, 503)
+        self.assertNotIn('http://someurl.com/c', cache)
+        cache.restore([['http://someurl.com/d', 'http://someurl.com/d', False, 429]])
+        self.assertEqual(len(cache), 2)
+        file_descriptor, path = tempfile.mkstemp(suffix='.json')
+        os.close(file_descriptor)
+        try:
+            cache.save(path)
+            loaded_cache = ClassificationCache()
+            loaded_cache.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(loaded_cache.get('http://someurl.com/a'), ('http://someurl.com/a/', True, None))
+        self.assertEqual(loaded_cache.get('http://someurl.com/b.png'), ('http://someurl.com/b.png', False, 404))
+        del cache, loaded_cache
+
+    @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
+    @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
+    def test_url_parser_with_cache(self, mock_req, mock_resp):
+        """
+        Tests that a URLParser fed with a cache sends a single HEAD request for each URL and doesn't
+        classify again the pages it has already fetched.
+        """
+        cache = ClassificationCache()
+        parser = URLParser(cache=cache)
+        parser.set_base_url('http://someotherurl.com/')
+        for _ in range(3):
+            self.assertEqual(parser._classify_url('http://someotherurl.com/test.png'),
+                             ('http://someotherurl.com/test.png', False))
+        self.assertEqual(mock_resp.call_count, 1)
+        parser.parse_url('http://someotherurl.com/test')
+        calls = mock_resp.call_count
+        self.assertEqual(parser._classify_url('http://someotherurl.com/test'), ('http://someotherurl.com/test', True))
+        self.assertEqual(mock_resp.call_count, calls)
+        del parser, cache
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import zlib
+from unittest import TestCase, main
+
+from src.sync.classification_cache import ClassificationCache
+from src.sync.content import BodyTooLargeError, ContentDecodingError, is_html, iter_body
+from src.sync.http_cache import CachingTransport, HTTPCache
+from src.sync.link_extractor import LinkExtractor
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from src.sync.url_parser import URLParser
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+PAGE = ("<html><head><link rel='stylesheet' href='/style.css'></head><body>" +
+        ''.join("<a href='/{}'></a><img src='/{}.png'>".format(i, i) for i in range(200)) +
+        "</body></html>")
+
+
+class FakeResponse:
+    """
+    A response whose body is read from memory, recording whether it has been closed.
+    """
+
+    def __init__(self, body, headers):
+        self._body = io.BytesIO(body)
+        self.headers = headers
+        self.closed = False
+
+    def geturl(self):
+        return 'http://www.sample.com/'
+
+    def getcode(self):
+        return 200
+
+    def info(self):
+        return self.headers
+
+    def read(self, amt=None):
+        return self._body.read() if amt is None else self._body.read(amt)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport:
+    """
+    A transport returning the same response to every request.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+    def send(self, url, method, headers=None, timeout=None):
+        return self.response
+
+    def close(self):
+        pass
+
+
+def compressed_route(body, encoding):
+    """
+    Returns a route serving the given HTML body compressed with the given encoding.
+    """
+    def route(handler):
+        data = body.encode('utf-8')
+        if encoding == 'gzip':
+            data = gzip.compress(data)
+        elif encoding == 'deflate':
+            data = zlib.compress(data)
+        elif encoding == 'raw-deflate':
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            data = compressor.compress(data) + compressor.flush()
+        return 200, {'Content-Type': 'text/html; charset=utf-8',
+                     'Content-Encoding': 'deflate' if encoding == 'raw-deflate' else encoding}, data
+    return route
+
+
+class TestContent(TestCase):
+    """
+    Collection of test cases for the compressed and bounded reads of the pages.
+    """
+
+    def test_is_html(self):
+        """
+        Tests the is_html function.
+        """
+        self.assertTrue(is_html('text/html; charset=utf-8'))
+        self.assertTrue(is_html('application/xhtml+xml'))
+        self.assertTrue(is_html(None))
+        self.assertFalse(is_html('application/pdf'))
+        self.assertFalse(is_html('text/css'))
+
+    def test_iter_body(self):
+        """
+        Tests that bodies are decoded chunk by chunk and closed once read.
+        """
+        data = PAGE.encode('utf-8')
+        for body, encoding in ((gzip.compress(data), 'gzip'), (zlib.compress(data), 'deflate'), (data, None)):
+            response = FakeResponse(body, {'Content-Encoding': encoding} if encoding else {})
+            chunks = list(iter_body(response, 'http://www.sample.com/', chunk_size=256))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(b''.join(chunks), data)
+            self.assertTrue(response.closed)
+        response = FakeResponse(gzip.compress(data), {'Content-Encoding': 'gzip'})
+        self.assertEqual(b''.join(iter_body(response, 'http://www.sample.com/', decode=False)), gzip.compress(data))
+        with self.assertRaises(ContentDecodingError):
+            list(iter_body(FakeResponse(b'not gzip', {'Content-Encoding': 'gzip'}), 'http://www.sample.com/'))
+        with self.assertRaises(ContentDecodingError):
+            list(iter_body(FakeResponse(data, {'Content-Encoding': 'compress'}), 'http://www.sample.com/'))
+
+    def test_max_size(self):
+        """
+        Tests that a body announcing a larger Content-Length isn't read, and that a body exceeding
+        the limit once decoded is abandoned without being read to the end.
+        """
+        response = FakeResponse(b'x' * 1000, {'Content-Length': '1000'})
+        with self.assertRaises(BodyTooLargeError):
+            list(iter_body(response, 'http://www.sample.com/', max_size=100))
+        self.assertEqual(response._body.tell(), 0)
+        self.assertTrue(response.closed)
+        # Ten megabytes of zeros are compressed to about ten kilobytes
+        body = gzip.compress(b'\0' * 10 * 1024 * 1024)
+        response = FakeResponse(body, {'Content-Encoding': 'gzip', 'Content-Length': str(len(body))})
+        with self.assertRaises(BodyTooLargeError):
+            list(iter_body(response, 'http://www.sample.com/', max_size=1024 * 1024, chunk_size=1024))
+        self.assertLess(response._body.tell(), len(body))
+
+    def test_extract_chunks(self):
+        """
+        Tests that a page extracted in chunks has the same links as the whole page.
+        """
+        extractor = LinkExtractor('http://www.sample.com/')
+        data = PAGE.encode('utf-8')
+        chunks = [data[i:i + 100] for i in range(0, len(data), 100)]
+        self.assertEqual(extractor.extract_chunks(chunks, 'utf-8'), extractor.extract(data, 'utf-8'))
+        self.assertEqual(extractor.extract_chunks([]), [])
+
+    def test_compressed_pages(self):
+        """
+        Tests that compressed pages are requested, decoded and parsed like uncompressed ones.
+        """
+        routes = {'/': html_route(PAGE)}
+        for encoding in ('gzip', 'deflate', 'raw-deflate'):
+            routes['/' + encoding] = compressed_route(PAGE, encoding)
+        with LocalHTTPServer(routes) as server:
+            transport = PooledTransport()
+            parser = URLParser(enable_logging=False, strict=False, transport=transport, compression=True,
+                               max_body_size=1024 * 1024)
+            parser.set_base_url(server.url + '/')
+            expected = parser.parse_url(server.url + '/')
+            self.assertEqual(len(expected[0]), 201)
+            for encoding in ('gzip', 'deflate', 'raw-deflate'):
+                self.assertEqual(parser.parse_url(server.url + '/' + encoding), expected)
+            self.assertIn('gzip', server.requests[0][2]['Accept-Encoding'])
+            parser.close()
+            transport.close()
+
+    def test_bounded_pages(self):
+        """
+        Tests that pages larger than the limit and responses that aren't HTML are skipped, without
+        reading their body.
+        """
+        routes = {'/': html_route("<a href='/large'></a><a href='/file'></a>"),
+                  '/large': html_route(PAGE * 10),
+                  '/file': lambda handler: (200, {'Content-Type': 'application/pdf'}, b'%PDF' * 100000)}
+        with LocalHTTPServer(routes) as server:
+            transport = PooledTransport()
+            parser = URLParser(enable_logging=False, strict=False, transport=transport, compression=True,
+                               max_body_size=len(PAGE), cache=ClassificationCache())
+            parser.set_base_url(server.url + '/')
+            self.assertEqual(parser.parse_url(server.url + '/large'), ([], []))
+            self.assertEqual(parser.parse_url(server.url + '/file'), ([], []))
+            self.assertEqual(parser._fetch_page(server.url + '/file'), None)
+            self.assertFalse(parser.cache.get(server.url + '/file')[1])
+            parser.close()
+            transport.close()
+
+    def test_bounded_pages_with_http_cache(self):
+        """
+        Tests that the body limit still stops the download of a large page behind the HTTP cache,
+        and that the page isn't stored.
+        """
+        body = b'<p>' + b'x' * 10 * 1024 * 1024
+        response = FakeResponse(body, {'Content-Type': 'text/html'})
+        directory = tempfile.mkdtemp()
+        try:
+            transport = CachingTransport(FakeTransport(response), HTTPCache(directory), max_body_size=1024 * 1024)
+            parser = URLParser(enable_logging=False, transport=transport, max_body_size=1024 * 1024)
+            parser.set_base_url('http://www.sample.com/')
+            self.assertEqual(parser.parse_url('http://www.sample.com/'), ([], []))
+            self.assertLess(response._body.tell(), len(body))
+            self.assertTrue(response.closed)
+            self.assertEqual(len(transport.cache), 0)
+            parser.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_spider_with_compression(self):
+        """
+        Tests that the results of a crawl don't depend on the compression of the pages.
+        """
+        routes = {'/': compressed_route("<a href='/about'></a><img src='/logo.png'>", 'gzip'),
+                  '/about': compressed_route("<a href='/'></a><script src='/app.js'></script>", 'gzip')}
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False)
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+            uncompressed_spider = Spider(enable_logging=False, compression=False)
+            routes['/'] = html_route("<a href='/about'></a><img src='/logo.png'>")
+            routes['/about'] = html_route("<a href='/'></a><script src='/app.js'></script>")
+            expected = json.loads(uncompressed_spider.crawl(server.url + '/', 5))
+            uncompressed_spider.close()
+        self.assertEqual(results, expected)
+        self.assertEqual(results[0]['assets'], [server.url + '/logo.png'])
+
+
+    def test_unknown_charset(self):
+        """
+        Tests that a page declaring a charset unknown to Python is parsed with the detected encoding.
+        """
+        routes = {'/': lambda handler: (200, {'Content-Type': 'text/html; charset=x-unknown'},
+                                        b"<a href='/about'></a><img src='/logo.png'>"),
+                  '/about': html_route("<p>About</p>"),
+                  '/logo.png': lambda handler: (200, {'Content-Type': 'image/png'}, b'')}
+        with LocalHTTPServer(routes) as server:
+            for strict in (False, True):
+                spider = Spider(enable_logging=False, strict=strict)
+                results = json.loads(spider.crawl(server.url + '/', 5))
+                spider.close()
+                self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/about'])
+                self.assertEqual(results[0]['assets'], [server.url + '/logo.png'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import json
+from unittest import TestCase, main
+
+from src.sync.dedup import DuplicateIndex, get_features, get_fingerprint, hamming_distance, simhash
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from src.sync.url_parser import URLParser
+from src.sync.url_table import CompactResults
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+ARTICLE = ("<html><head><title>Article</title><script>var session = '{session}';</script></head><body>"
+           "<p>The quick brown fox jumps over the lazy dog while the crawler reads the same article "
+           "again and again under a different address, wasting requests on content it has already seen.</p>"
+           "<a href='/about'></a><a href='/contact?sid={session}'></a><img src='/photo.jpg'>"
+           "<a href='/download'></a></body></html>")
+
+OTHER_ARTICLE = ("<html><body><p>A completely different page talks about the weather, the mountains and "
+                 "the rivers of a country far away, with nothing in common with the first one.</p>"
+                 "<a href='/about'></a><img src='/map.png'></body></html>")
+
+
+class TestDedup(TestCase):
+    """
+    Collection of test cases for the DuplicateIndex class.
+    """
+
+    def test_simhash(self):
+        """
+        Tests that similar sets of features have close SimHashes, and different ones don't.
+        """
+        features = set(b'feature %d' % i for i in range(100))
+        self.assertEqual(simhash(features), simhash(set(features)))
+        self.assertLessEqual(hamming_distance(simhash(features), simhash(features | {b'session 1'})), 3)
+        self.assertGreater(hamming_distance(simhash(features), simhash(set(b'other %d' % i for i in range(100)))), 10)
+        self.assertEqual(hamming_distance(0b1011, 0b0110), 3)
+        self.assertIn(b'/about', get_features(ARTICLE))
+        self.assertIn(b'the quick brown', get_features(ARTICLE))
+        self.assertNotIn(b'var session', get_features(ARTICLE))
+
+    def test_find(self):
+        """
+        Tests that exact and near duplicates are found, and that pages with too few features are only
+        compared by their digest.
+        """
+        index = DuplicateIndex()
+        fingerprint = get_fingerprint(ARTICLE.format(session='1'))
+        index.add('http://www.sample.com/article', fingerprint, ['http://www.sample.com/photo.jpg'])
+        self.assertEqual(index.find(get_fingerprint(ARTICLE.format(session='1'))),
+                         ('http://www.sample.com/article', ('http://www.sample.com/photo.jpg',), (), True))
+        self.assertEqual(index.find(get_fingerprint(ARTICLE.format(session='2')))[0], 'http://www.sample.com/article')
+        self.assertFalse(index.find(get_fingerprint(ARTICLE.format(session='2')))[3])
+        self.assertIsNone(index.find(get_fingerprint(OTHER_ARTICLE)))
+        self.assertIsNone(DuplicateIndex(near_duplicates=False).find(get_fingerprint(ARTICLE.format(session='2'))))
+        index.add('http://www.sample.com/empty', get_fingerprint("<a href='/1'></a>"), [])
+        self.assertIsNone(index.find(get_fingerprint("<a href='/2'></a>")))
+        self.assertEqual(len(index), 2)
+
+    def test_head_requests_saved(self):
+        """
+        Tests that a strict parser without a cache doesn't classify again the links of a duplicate page.
+        """
+        routes = {'/a': html_route(ARTICLE.format(session='1')), '/b': html_route(ARTICLE.format(session='2')),
+                  '/about': html_route(''), '/download': html_route(''),
+                  '/photo.jpg': lambda handler: (200, {'Content-Type': 'image/jpeg'}, b'')}
+        with LocalHTTPServer(routes) as server:
+            transport = PooledTransport()
+            duplicates = DuplicateIndex()
+            parser = URLParser(enable_logging=False, strict=True, transport=transport, duplicates=duplicates)
+            parser.set_base_url(server.url + '/')
+            expected = parser.parse_url(server.url + '/a')
+            head_requests = sum(1 for method, _, _ in server.requests if method == 'HEAD')
+            self.assertEqual(parser.parse_url(server.url + '/b'), (expected[0], []))
+            self.assertEqual(sum(1 for method, _, _ in server.requests if method == 'HEAD'), head_requests)
+            parser.close()
+            transport.close()
+        self.assertEqual(duplicates.stats(), {'pages': 1, 'exact_duplicates': 0, 'near_duplicates': 1,
+                                              'parses_saved': 1, 'head_requests_saved': head_requests})
+        self.assertEqual(duplicates.pop_alias(server.url + '/b'), server.url + '/a')
+
+    def test_spider_with_duplicates(self):
+        """
+        Tests that duplicate pages are reported as aliases, and that their links aren't followed.
+        """
+        routes = {'/': html_route("<a href='/article?utm_source=1'></a><a href='/article?sort=asc'></a>"
+                                  "<a href='/article?sid=2'></a><a href='/other'></a>"),
+                  '/article?utm_source=1': html_route(ARTICLE.format(session='1')),
+                  '/article?sort=asc': html_route(ARTICLE.format(session='1')),
+                  '/article?sid=2': html_route(ARTICLE.format(session='2').replace('/download', '/download?sid=2')),
+                  '/other': html_route(OTHER_ARTICLE),
+                  '/about': html_route('About'), '/contact?sid=1': html_route('Contact'),
+                  '/download': html_route('Download')}
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False, duplicate_index=DuplicateIndex)
+            results = json.loads(spider.crawl(server.url + '/', 10))
+            duplicates = spider.url_parser.duplicates
+            spider.close()
+        urls = [result['url'] for result in results]
+        self.assertEqual(urls, [server.url + '/', server.url + '/article?utm_source=1', server.url + '/article?sort=asc',
+                                server.url + '/article?sid=2', server.url + '/other', server.url + '/about',
+                                server.url + '/contact?sid=1', server.url + '/download'])
+        self.assertEqual(results[2], {'url': server.url + '/article?sort=asc', 'assets': results[1]['assets'],
+                                      'alias_of': server.url + '/article?utm_source=1'})
+        self.assertEqual(results[3]['alias_of'], server.url + '/article?utm_source=1')
+        self.assertNotIn('alias_of', results[4])
+        # The links of the duplicates, like /contact?sid=2, aren't followed
+        self.assertEqual(duplicates.stats()['exact_duplicates'], 1)
+        self.assertEqual(duplicates.stats()['near_duplicates'], 1)
+        self.assertEqual(duplicates.stats()['parses_saved'], 2)
+        compact_results = CompactResults()
+        compact_results.extend(results)
+        self.assertEqual(list(compact_results), results)
+
+
+if __name__ == '__main__':
+    main()
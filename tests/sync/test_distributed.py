@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase, main
+
+from src.sync.distributed import DistributedCrawler, FrontierStore, SQLiteFrontierStore
+from src.sync.spider import Spider
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+
+class FakeClock:
+    """
+    A clock whose time is set by the test.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDistributed(TestCase):
+    """
+    Collection of test cases for the SQLiteFrontierStore and DistributedCrawler classes.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'crawl.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_journal_mode(self):
+        """
+        Tests that a store shared by several machines is kept with a rollback journal, and that the
+        interface of the stores can't be instantiated.
+        """
+        store = SQLiteFrontierStore(self.path)
+        self.assertEqual(store._connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        store.close()
+        store = SQLiteFrontierStore(self.path, shared_filesystem=True)
+        self.assertEqual(store._connection.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        store.seed('http://www.sample.com/', 3)
+        self.assertEqual(store.claim('first', 10), 'http://www.sample.com/')
+        store.close()
+        with self.assertRaises(TypeError):
+            FrontierStore()
+
+    def test_leases(self):
+        """
+        Tests that URLs are leased once, that expired leases are given to other workers and that
+        the limit of pages is never exceeded.
+        """
+        clock = FakeClock()
+        first_store = SQLiteFrontierStore(self.path, clock=clock)
+        second_store = SQLiteFrontierStore(self.path, clock=clock)
+        first_store.seed('http://www.sample.com/', 3)
+        second_store.seed('http://www.sample.com/', 3)
+        with self.assertRaises(ValueError):
+            SQLiteFrontierStore(self.path).seed('http://www.other.com/', 3)
+        self.assertEqual(first_store.claim('first', 10), 'http://www.sample.com/')
+        self.assertIsNone(second_store.claim('second', 10))
+        self.assertFalse(second_store.is_finished())
+        self.assertTrue(first_store.complete('first', 'http://www.sample.com/', ['http://www.sample.com/a.png'],
+                                             ['http://www.sample.com/1', 'http://www.sample.com/2',
+                                              'http://www.sample.com/3', 'http://www.sample.com/#top']))
+        self.assertEqual(first_store.stats(), {'queued': 3, 'leased': 0, 'done': 1})
+        self.assertEqual(first_store.claim('first', 10), 'http://www.sample.com/1')
+        self.assertEqual(second_store.claim('second', 100), 'http://www.sample.com/2')
+        # One page done and two leased out of three: no other page can be claimed
+        self.assertIsNone(second_store.claim('second', 10))
+        # The first worker crashes: its lease expires and the page is given to the second worker
+        clock.now += 11
+        self.assertEqual(second_store.claim('second', 10), 'http://www.sample.com/1')
+        self.assertFalse(first_store.complete('first', 'http://www.sample.com/1', [], []))
+        self.assertTrue(second_store.complete('second', 'http://www.sample.com/1', [], []))
+        self.assertTrue(second_store.complete('second', 'http://www.sample.com/2', [], []))
+        self.assertTrue(second_store.is_finished())
+        self.assertEqual([result['url'] for result in first_store.results()],
+                         ['http://www.sample.com/', 'http://www.sample.com/1', 'http://www.sample.com/2'])
+        first_store.close()
+        second_store.close()
+
+    def test_distributed_crawl(self):
+        """
+        Tests that workers sharing a store visit every page once, within the limit of pages.
+        """
+        routes = {'/': html_route(''.join("<a href='/{}'></a>".format(i) for i in range(20)))}
+        for i in range(20):
+            routes['/{}'.format(i)] = html_route("<a href='/{}'></a><img src='/{}.png'>".format((i + 1) % 20, i))
+        with LocalHTTPServer(routes) as server:
+            results = {}
+
+            def run_worker(worker_id):
+                spider = Spider(enable_logging=False)
+                store = SQLiteFrontierStore(self.path)
+                crawler = DistributedCrawler(spider, store, worker_id=worker_id, poll_interval=0.01)
+                results[worker_id] = list(crawler.crawl(server.url + '/', 15))
+                store.close()
+                spider.close()
+
+            workers = [threading.Thread(target=run_worker, args=('worker-{}'.format(i),)) for i in range(3)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        store = SQLiteFrontierStore(self.path)
+        merged = list(store.results())
+        store.close()
+        self.assertEqual(len(merged), 15)
+        self.assertEqual(len(set(result['url'] for result in merged)), 15)
+        self.assertEqual(sorted(result['url'] for worker_results in results.values() for result in worker_results),
+                         sorted(result['url'] for result in merged))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+from unittest import TestCase, main
+
+from src.sync.frontier import Frontier, PriorityFrontier, canonicalize_url
+from src.sync.scoring import DepthScorer, PathFilter
+
+
+class TestFrontier(TestCase):
+    """
+    Collection of test cases for the Frontier class and the canonicalize_url function.
+    """
+
+    def test_canonicalize_url(self):
+        """
+        Tests that equivalent URLs share the same canonical form.
+        """
+        expected = 'http://www.sample.com/a'
+        self.assertEqual(canonicalize_url('http://www.sample.com/a'), expected)
+        self.assertEqual(canonicalize_url('http://www.sample.com/a#top'), expected)
+        self.assertEqual(canonicalize_url('http://www.sample.com/a/'), expected)
+        self.assertEqual(canonicalize_url('HTTP://WWW.Sample.com:80/a'), expected)
+        self.assertEqual(canonicalize_url('https://www.sample.com:443/'), 'https://www.sample.com/')
+        self.assertEqual(canonicalize_url('https://www.sample.com:8443'), 'https://www.sample.com:8443/')
+        self.assertEqual(canonicalize_url('http://www.sample.com/a?b=2&a=1&utm_source=x'),
+                         'http://www.sample.com/a?a=1&b=2')
+
+    def test_trailing_slash_policies(self):
+        """
+        Tests the different trailing slash policies.
+        """
+        self.assertEqual(canonicalize_url('http://www.sample.com/a', trailing_slash='add'), 'http://www.sample.com/a/')
+        self.assertEqual(canonicalize_url('http://www.sample.com/a.html', trailing_slash='add'),
+                         'http://www.sample.com/a.html')
+        self.assertEqual(canonicalize_url('http://www.sample.com/a/', trailing_slash='keep'),
+                         'http://www.sample.com/a/')
+        with self.assertRaises(ValueError):
+            canonicalize_url('http://www.sample.com/a/', trailing_slash='unknown')
+
+    def test_add_and_pop(self):
+        """
+        Tests that URLs are popped in insertion order and that duplicates are discarded when added.
+        """
+        frontier = Frontier()
+        self.assertTrue(frontier.add('http://www.sample.com/a'))
+        self.assertTrue(frontier.add('http://www.sample.com/b'))
+        self.assertFalse(frontier.add('http://www.sample.com/a#top'))
+        self.assertFalse(frontier.add('http://www.sample.com/a/'))
+        self.assertEqual(len(frontier), 2)
+        self.assertEqual(frontier.pop(), 'http://www.sample.com/a')
+        # Popped URLs are still known, so they won't be queued again
+        self.assertFalse(frontier.add('http://www.sample.com/a'))
+        self.assertIn('http://www.sample.com/a/', frontier)
+        self.assertEqual(frontier.pop(), 'http://www.sample.com/b')
+        self.assertEqual(len(frontier), 0)
+        self.assertEqual(frontier.seen_count, 2)
+        del frontier
+
+    def test_depth(self):
+        """
+        Tests that the depth of the URLs is returned with them.
+        """
+        frontier = Frontier()
+        frontier.add('http://www.sample.com/')
+        frontier.add('http://www.sample.com/a', 3)
+        self.assertEqual(frontier.peek(5), ['http://www.sample.com/', 'http://www.sample.com/a'])
+        self.assertEqual(frontier.pop_with_depth(), ('http://www.sample.com/', 0))
+        self.assertEqual(frontier.pop_with_depth(), ('http://www.sample.com/a', 3))
+
+    def test_priority_frontier(self):
+        """
+        Tests that URLs closer to the start and linked by more pages are popped first, that scores are
+        updated when links are found again, and that rejected URLs are never queued.
+        """
+        frontier = PriorityFrontier()
+        frontier.add('http://www.sample.com/deep', 3)
+        frontier.add('http://www.sample.com/a', 1)
+        frontier.add('http://www.sample.com/b', 1)
+        self.assertEqual(frontier.peek(2), ['http://www.sample.com/a', 'http://www.sample.com/b'])
+        # /b is now linked by two pages and /deep by four, one of them closer to the start
+        self.assertFalse(frontier.add('http://www.sample.com/b', 2))
+        for depth in (3, 3, 1):
+            self.assertFalse(frontier.add('http://www.sample.com/deep', depth))
+        self.assertEqual(len(frontier), 3)
+        self.assertEqual(frontier.pop_with_depth(), ('http://www.sample.com/deep', 1))
+        self.assertEqual(frontier.pop(), 'http://www.sample.com/b')
+        self.assertEqual(frontier.pop(), 'http://www.sample.com/a')
+        self.assertFalse(frontier.add('http://www.sample.com/a/'))
+        self.assertEqual(len(frontier), 0)
+        # Ties are broken by the order of discovery
+        frontier = PriorityFrontier(scorers=[DepthScorer(), PathFilter(deny=['/calendar'])])
+        self.assertFalse(frontier.add('http://www.sample.com/calendar/2020', 1))
+        for i in range(3000):
+            frontier.add('http://www.sample.com/{}'.format(i), 1)
+            frontier.add('http://www.sample.com/{}'.format(i), 1)
+        self.assertEqual([frontier.pop() for _ in range(3)],
+                         ['http://www.sample.com/0', 'http://www.sample.com/1', 'http://www.sample.com/2'])
+        self.assertNotIn('http://www.sample.com/calendar/2020', frontier.peek(3000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import gzip
+import http.client
+import io
+import os
+import pickle
+import shutil
+import socket
+import tempfile
+import urllib.error
+from unittest import TestCase, main
+
+from src.sync.http_cache import CachingTransport, HTTPCache, parse_cache_control
+from src.sync.transport import PooledTransport
+from tests.sync.local_server import LocalHTTPServer
+
+
+def etag_route(handler):
+    """
+    Serves a page with an ETag, answering 304 when the client already has it.
+    """
+    if handler.headers.get('If-None-Match') == '"v1"':
+        return 304, {'ETag': '"v1"'}, b''
+    return 200, {'Content-Type': 'text/html', 'ETag': '"v1"'}, b'<html>etag</html>'
+
+
+def negotiated_route(handler):
+    """
+    Serves a fresh page compressed with gzip only when the client accepts it.
+    """
+    headers = {'Content-Type': 'text/html', 'Cache-Control': 'max-age=3600', 'Vary': 'Accept-Encoding'}
+    if 'gzip' in handler.headers.get('Accept-Encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        return 200, headers, gzip.compress(b'<html>negotiated</html>')
+    return 200, headers, b'<html>negotiated</html>'
+
+
+class FakeResponse:
+    """
+    A response whose body is read from memory, optionally failing after the given number of bytes.
+    """
+
+    def __init__(self, body, content_type='text/html', fail_after=None):
+        self.body = io.BytesIO(body)
+        self.headers = http.client.HTTPMessage()
+        self.headers['Content-Type'] = content_type
+        self.fail_after = fail_after
+
+    def geturl(self):
+        return 'http://www.sample.com/'
+
+    def getcode(self):
+        return 200
+
+    def info(self):
+        return self.headers
+
+    def read(self, amt=None):
+        if self.fail_after is not None and self.body.tell() >= self.fail_after:
+            raise socket.timeout('timed out')
+        return self.body.read() if amt is None else self.body.read(amt)
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+    """
+    A transport returning the given responses, in order.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def send(self, url, method, headers=None, timeout=None):
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+class TestHTTPCache(TestCase):
+    """
+    Collection of test cases for the HTTPCache and CachingTransport classes.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = LocalHTTPServer({
+            '/etag': etag_route,
+            '/fresh': lambda handler: (200, {'Content-Type': 'text/html', 'Cache-Control': 'max-age=3600'},
+                                       b'<html>fresh</html>'),
+            '/private': lambda handler: (200, {'Content-Type': 'text/html', 'Cache-Control': 'no-store'},
+                                         b'<html>private</html>'),
+            '/negotiated': negotiated_route,
+            '/any': lambda handler: (200, {'Content-Type': 'text/html', 'Cache-Control': 'max-age=3600', 'Vary': '*'},
+                                     b'<html>any</html>'),
+        })
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def get_transport(self, max_size=1024 * 1024):
+        return CachingTransport(PooledTransport(), HTTPCache(self.directory, max_size=max_size))
+
+    def test_parse_cache_control(self):
+        """
+        Tests the parse_cache_control function.
+        """
+        self.assertEqual(parse_cache_control('public, max-age=60, no-cache'),
+                         {'public': True, 'max-age': '60', 'no-cache': True})
+        self.assertEqual(parse_cache_control(None), {})
+
+    def test_fresh_and_revalidated_responses(self):
+        """
+        Tests that fresh responses are served without requests and stale ones are revalidated, also
+        across different transports sharing the same directory.
+        """
+        transport = self.get_transport()
+        for _ in range(2):
+            self.assertEqual(transport.send(self.server.url + '/fresh', 'GET').read(), b'<html>fresh</html>')
+            self.assertEqual(transport.send(self.server.url + '/etag', 'GET').read(), b'<html>etag</html>')
+        transport.close()
+        transport = self.get_transport()
+        response = transport.send(self.server.url + '/etag', 'GET')
+        self.assertEqual(response.read(), b'<html>etag</html>')
+        self.assertEqual(response.info()['Content-Type'], 'text/html')
+        self.assertEqual(transport.send(self.server.url + '/fresh', 'HEAD').info()['Cache-Control'], 'max-age=3600')
+        transport.close()
+        self.assertEqual([request[:2] for request in self.server.requests],
+                         [('GET', '/fresh'), ('GET', '/etag'), ('GET', '/etag'), ('GET', '/etag')])
+        self.assertEqual(self.server.requests[2][2]['If-None-Match'], '"v1"')
+        self.assertEqual(transport.stats()['cache_hits'], 1)
+        self.assertEqual(transport.stats()['cache_revalidations'], 1)
+
+    def test_no_store_and_eviction(self):
+        """
+        Tests that no-store responses aren't stored and that the size cap is respected.
+        """
+        transport = self.get_transport()
+        transport.send(self.server.url + '/private', 'GET').read()
+        self.assertEqual(len(transport.cache), 0)
+        transport.send(self.server.url + '/fresh', 'GET').read()
+        entry_size = transport.cache.size
+        transport.close()
+        transport = self.get_transport(max_size=entry_size + 10)
+        transport.send(self.server.url + '/etag', 'GET').read()
+        self.assertEqual(len(transport.cache), 1)
+        self.assertEqual(transport.stats()['cache_evictions'], 1)
+        self.assertIsNone(transport.cache.get('GET', self.server.url + '/fresh'))
+        transport.close()
+
+    def test_bodies_not_read(self):
+        """
+        Tests that bodies are only downloaded as far as the caller reads them, and that incomplete
+        or too large bodies aren't stored.
+        """
+        responses = [FakeResponse(b'%PDF' * 1000, content_type='application/pdf'),
+                     FakeResponse(b'x' * 1000), FakeResponse(b'x' * 1000, fail_after=100), FakeResponse(b'x' * 100)]
+        transport = CachingTransport(FakeTransport(responses), HTTPCache(self.directory), max_body_size=500)
+        # The body of a response closed unread isn't downloaded
+        transport.send('http://www.sample.com/file.pdf', 'GET').close()
+        self.assertEqual(responses[0].body.tell(), 0)
+        # A body larger than the limit is returned whole, but not stored
+        self.assertEqual(transport.send('http://www.sample.com/large', 'GET').read(), b'x' * 1000)
+        # Errors while reading the body are reported as URLError
+        response = transport.send('http://www.sample.com/broken', 'GET')
+        self.assertEqual(response.read(100), b'x' * 100)
+        with self.assertRaises(urllib.error.URLError):
+            response.read(100)
+        response = transport.send('http://www.sample.com/small', 'GET')
+        while response.read(30):
+            pass
+        self.assertEqual(len(transport.cache), 1)
+        self.assertEqual(transport.cache.get('GET', 'http://www.sample.com/small')['body'], b'x' * 100)
+        transport.close()
+
+    def test_request_headers(self):
+        """
+        Tests that a response is only served to requests with the same Accept-Encoding header, so that a
+        compressed body isn't replayed to a client that didn't ask for it, and that Vary: * isn't stored.
+        """
+        url = self.server.url + '/negotiated'
+        transport = self.get_transport()
+        response = transport.send(url, 'GET', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzip.decompress(response.read()), b'<html>negotiated</html>')
+        transport.close()
+        transport = self.get_transport()
+        response = transport.send(url, 'GET')
+        self.assertIsNone(response.info()['Content-Encoding'])
+        self.assertEqual(response.read(), b'<html>negotiated</html>')
+        self.assertEqual(transport.send(url, 'GET').read(), b'<html>negotiated</html>')
+        transport.send(self.server.url + '/any', 'GET').read()
+        transport.send(self.server.url + '/any', 'GET').read()
+        transport.close()
+        self.assertEqual([request[:2] for request in self.server.requests],
+                         [('GET', '/negotiated'), ('GET', '/negotiated'), ('GET', '/any'), ('GET', '/any')])
+        self.assertEqual(transport.stats()['cache_hits'], 1)
+
+    def test_storage_format(self):
+        """
+        Tests that entries are stored as a JSON header followed by the raw body, and that files in any
+        other format, e.g. pickles, are dropped without being loaded.
+        """
+        cache = HTTPCache(self.directory)
+        entry = {'url': 'http://www.sample.com/', 'status': 200, 'reason': 'OK',
+                 'headers': [('Content-Type', 'text/html')], 'body': b'\x00<html>\n</html>', 'stored_at': 1.0}
+        cache.put('GET', 'http://www.sample.com/', entry)
+        self.assertEqual(cache.get('GET', 'http://www.sample.com/'), entry)
+        path = cache._get_path(cache._get_key('GET', 'http://www.sample.com/'))
+        with open(path, 'rb') as infile:
+            self.assertTrue(infile.read().startswith(b'{'))
+        with open(path, 'wb') as outfile:
+            pickle.dump(entry, outfile)
+        self.assertIsNone(HTTPCache(self.directory).get('GET', 'http://www.sample.com/'))
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    main()
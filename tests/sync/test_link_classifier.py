@@ -0,0 +1,89 @@
+import json
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from src.sync.link_classifier import PAGE, STATIC, classify_link, get_extension
+from src.sync.spider import Spider
+from src.sync.url_parser import URLParser
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+
+def offsite_redirect_route(handler):
+    """
+    Redirects to the same server under another host name, i.e. to another website.
+    """
+    return 301, {'Location': 'http://localhost:{}/about'.format(handler.server.server_port)}, b''
+
+
+class TestLinkClassifier(TestCase):
+    """
+    Collection of test cases for the link_classifier module.
+    """
+
+    def test_get_extension(self):
+        """
+        Tests the get_extension function.
+        """
+        self.assertEqual(get_extension('http://www.sample.com/static/app.JS?v=3'), '.js')
+        self.assertEqual(get_extension('http://www.sample.com/about/'), '')
+        self.assertEqual(get_extension('http://www.sample.com/v1.2/about'), '')
+
+    def test_classify_link_from_tag(self):
+        """
+        Tests that links are classified using the tag they come from.
+        """
+        self.assertEqual(classify_link('http://www.sample.com/logo', 'img', 'src'), STATIC)
+        self.assertEqual(classify_link('http://www.sample.com/app', 'script', 'src'), STATIC)
+        self.assertEqual(classify_link('http://www.sample.com/clip', 'source', 'src'), STATIC)
+        self.assertEqual(classify_link('http://www.sample.com/style', 'link', 'href', 'stylesheet'), STATIC)
+        self.assertEqual(classify_link('http://www.sample.com/bg', 'style', None), STATIC)
+        self.assertEqual(classify_link('http://www.sample.com/about', 'a', 'href'), PAGE)
+        self.assertEqual(classify_link('http://www.sample.com/index.php', 'a', 'href'), PAGE)
+
+    def test_classify_link_from_extension(self):
+        """
+        Tests that links are classified using their extension, and that ambiguous links are reported.
+        """
+        self.assertEqual(classify_link('http://www.sample.com/report.pdf', 'a', 'href'), STATIC)
+        self.assertEqual(classify_link('http://www.sample.com/image.png', 'link', 'href', 'preview'), STATIC)
+        self.assertIsNone(classify_link('http://www.sample.com/feed', 'link', 'href', 'alternate'))
+        self.assertIsNone(classify_link('http://www.sample.com/frame', 'iframe', 'src'))
+        self.assertIsNone(classify_link('http://www.sample.com/download.cgi', 'a', 'href'))
+
+    def test_url_parser_not_strict(self):
+        """
+        Tests that a URLParser which isn't strict sends HEAD requests only for the ambiguous links,
+        keeping the order of the links in the page.
+        """
+        page = ("<html><head><link rel='stylesheet' href='/style.css'></head><body>"
+                "<a href='/about'></a><img src='/logo'><iframe src='/widget'></iframe></body></html>")
+        parser = URLParser(strict=False)
+        parser.set_base_url('http://www.sample.com/')
+        with patch.object(parser, '_classify_url', return_value=('http://www.sample.com/widget/', True)) as mock:
+            static_assets, links_to_follow = parser._get_assets(page)
+        mock.assert_called_once_with('http://www.sample.com/widget')
+        self.assertEqual(static_assets, ['http://www.sample.com/style.css', 'http://www.sample.com/logo'])
+        self.assertEqual(links_to_follow, ['http://www.sample.com/about', 'http://www.sample.com/widget/'])
+        del parser
+
+    def test_pages_checked_when_fetched(self):
+        """
+        Tests that links classified as pages without a request aren't reported when they turn out to
+        be missing or to redirect to another website.
+        """
+        routes = {
+            '/': html_route("<a href='/missing'></a><a href='/moved'></a><a href='/about'></a>"),
+            '/moved': offsite_redirect_route,
+            '/about': html_route("<a href='/'></a>"),
+        }
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False, max_retries=0)
+            results = json.loads(spider.crawl(server.url + '/', 10))
+            spider.close()
+        self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/about'])
+        self.assertEqual(spider.url_parser.discarded_pages, set())
+        self.assertEqual(spider.metrics.snapshot()['pages'], 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import os
+from unittest import TestCase, main
+
+from src.sync.link_extractor import LinkExtractor, parse_charset
+from src.sync.url_parser import URLParser
+
+
+class TestLinkExtractor(TestCase):
+    """
+    Collection of test cases for the LinkExtractor class.
+    """
+
+    def test_parse_charset(self):
+        """
+        Tests the parse_charset function.
+        """
+        self.assertEqual(parse_charset('text/html; charset=ISO-8859-1'), 'ISO-8859-1')
+        self.assertEqual(parse_charset('text/html; charset="utf-8"'), 'utf-8')
+        self.assertIsNone(parse_charset('text/html'))
+        self.assertIsNone(parse_charset(None))
+
+    def test_extract(self):
+        """
+        Tests that only the relevant links are extracted, once and in order.
+        """
+        page = ("<html><head><link rel='stylesheet' href='/style.css'><style>a {background: url(/bg.png)}</style>"
+                "</head><body><a href='/about'></a><a href='/about'></a><a href='http://mail.sample.com/'></a>"
+                "<img srcset='/small.png 1x, /large.png 2x'><form action='/search'></form><a href='/'></a></body></html>")
+        extractor = LinkExtractor('http://www.sample.com/')
+        self.assertEqual(extractor.extract(page), [('http://www.sample.com/style.css', 'link', 'href', 'stylesheet'),
+                                                   ('http://www.sample.com/about', 'a', 'href', None),
+                                                   ('http://www.sample.com/small.png', 'img', 'srcset', None),
+                                                   ('http://www.sample.com/large.png', 'img', 'srcset', None)])
+        self.assertEqual(extractor.extract(b''), [])
+        with self.assertRaises(ValueError):
+            LinkExtractor('')
+
+    def test_extract_with_charset(self):
+        """
+        Tests that the charset declared by the server, or by the page itself, is respected.
+        """
+        extractor = LinkExtractor('http://www.sample.com/')
+        page = "<html><body><a href='/caf\xe9'></a></body></html>".encode('latin-1')
+        self.assertEqual(extractor.extract(page, 'iso-8859-1')[0][0], 'http://www.sample.com/caf\xe9')
+        page = "<html><head><meta charset='iso-8859-1'></head><body><a href='/caf\xe9'></a></body></html>"
+        self.assertEqual(extractor.extract(page.encode('latin-1'))[0][0], 'http://www.sample.com/caf\xe9')
+        # A charset unknown to Python and lxml is ignored
+        self.assertEqual(extractor.extract(page.encode('latin-1'), 'x-unknown')[0][0], 'http://www.sample.com/caf\xe9')
+
+    def test_same_links_as_iterlinks(self):
+        """
+        Tests that, on the Google sample, the extractor finds the links found by iterlinks in the tags it
+        looks at.
+        """
+        current_file_path = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(current_file_path, '../static/google.html'), 'rb') as google_html:
+            page = google_html.read()
+        parser = URLParser()
+        parser.set_base_url('https://www.google.it/')
+        expected_urls = []
+        for url, tag, attribute, _ in parser._get_valid_links(page):
+            if tag not in ('style', 'form') and url not in expected_urls:
+                expected_urls.append(url)
+        valid_links = LinkExtractor('https://www.google.it/').extract(page)
+        self.assertEqual([valid_link[0] for valid_link in valid_links], expected_urls)
+        del parser
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import urllib.request
+from unittest import TestCase, main
+
+from src.sync.metrics import CrawlMetrics, MetricsServer
+from src.sync.spider import Spider
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+
+class FakeClock:
+    """
+    A clock advancing by one second every time it is read.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class TestMetrics(TestCase):
+    """
+    Collection of test cases for the CrawlMetrics and MetricsServer classes.
+    """
+
+    def test_measures(self):
+        """
+        Tests that phases, requests, bytes and frontier sizes are recorded.
+        """
+        metrics = CrawlMetrics(clock=FakeClock())
+        with metrics.timer('fetch'):
+            pass
+        with metrics.timer('fetch'):
+            pass
+        metrics.record_request('GET', 200)
+        metrics.record_request('GET', 200)
+        metrics.record_request('HEAD', 404)
+        metrics.record_request('HEAD')
+        metrics.record_bytes(2048)
+        metrics.record_page(5)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['phases']['fetch'], {'count': 2, 'seconds': 2.0, 'max_seconds': 1.0})
+        self.assertEqual(snapshot['requests'], {'GET': {'200': 2}, 'HEAD': {'404': 1, 'error': 1}})
+        self.assertEqual(snapshot['total_requests'], 4)
+        self.assertEqual(snapshot['bytes_received'], 2048)
+        self.assertEqual(snapshot['pages'], 1)
+        self.assertEqual(snapshot['frontier_size'], 5)
+        self.assertIn('1 pages', metrics.progress_line())
+        prometheus = metrics.to_prometheus()
+        self.assertIn('crawler_requests_total{method="HEAD",status="404"} 1', prometheus)
+        self.assertIn('crawler_phase_seconds_total{phase="fetch"} 2.0', prometheus)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            metrics.save(path)
+            with open(path) as metrics_file:
+                self.assertEqual(json.load(metrics_file)['bytes_received'], 2048)
+
+    def test_frontier_samples(self):
+        """
+        Tests that the frontier size samples are bounded while still covering the whole crawl.
+        """
+        metrics = CrawlMetrics(max_samples=10)
+        for page in range(1, 101):
+            metrics.record_page(page)
+        samples = metrics.snapshot()['frontier_samples']
+        self.assertLess(len(samples), 10)
+        self.assertEqual(samples[-1][1], samples[-1][2])
+        self.assertGreater(samples[-1][1], 90)
+        self.assertEqual(metrics.snapshot()['frontier_size'], 100)
+
+    def test_crawl_metrics(self):
+        """
+        Tests the metrics recorded by the Spider while crawling a local server.
+        """
+        routes = {
+            '/': html_route("<a href='/page'></a><a href='/missing'></a><img src='/img.png'>"),
+            '/page': html_route("<a href='/'></a>"),
+        }
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False)
+            spider.crawl(server.url + '/', 10)
+            spider.close()
+        snapshot = spider.metrics.snapshot()
+        # The missing page is requested, but not counted as a visited page
+        self.assertEqual(snapshot['pages'], 2)
+        self.assertEqual(snapshot['requests'], {'GET': {'200': 2, '404': 1}})
+        self.assertEqual(snapshot['bytes_received'], sum(len(body) for body in (
+            "<a href='/page'></a><a href='/missing'></a><img src='/img.png'>", "<a href='/'></a>")))
+        for phase in ('fetch', 'parse', 'classify', 'enqueue'):
+            self.assertGreater(snapshot['phases'][phase]['count'], 0)
+
+    def test_metrics_server(self):
+        """
+        Tests that the metrics are served in the Prometheus text format.
+        """
+        metrics = CrawlMetrics()
+        metrics.record_page(3)
+        server = MetricsServer(metrics, 0)
+        try:
+            with urllib.request.urlopen(server.url) as response:
+                body = response.read().decode('utf-8')
+            self.assertIn('crawler_pages_total 1', body)
+            self.assertIn('crawler_frontier_size 3', body)
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
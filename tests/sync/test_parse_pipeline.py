@@ -0,0 +1,78 @@
+import os
+from unittest import TestCase, main
+
+from src.sync.frontier import PriorityFrontier
+from src.sync.parse_pipeline import ParsePipeline
+from src.sync.scoring import InlinkScorer
+from src.sync.spider import Spider
+from src.sync.url_parser import URLParser, extract_valid_links
+from tests.static.known_results import VALID_URLS_IN_SAMPLE_HOME
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+
+class TestParsePipeline(TestCase):
+    """
+    Collection of test cases for the ParsePipeline class.
+    """
+
+    def test_extract_valid_links(self):
+        """
+        Tests the extract_valid_links function used by the worker processes.
+        """
+        current_file_path = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(current_file_path, '../static/sample.html'), 'rb') as sample_html:
+            valid_links = extract_valid_links(sample_html.read(), 'https://www.sample.com/')
+        self.assertEqual([valid_link[0] for valid_link in valid_links], VALID_URLS_IN_SAMPLE_HOME)
+        self.assertEqual(valid_links[0][1:], ('a', 'href', None))
+
+    def test_crawl_with_parse_workers(self):
+        """
+        Tests that a crawl parsing the pages in worker processes returns the same results of a
+        crawl parsing them in the current process.
+        """
+        pages = {'/': html_route(''.join("<a href='/page/{}'></a>".format(i) for i in range(6)))}
+        for i in range(6):
+            pages['/page/{}'.format(i)] = html_route("<img src='/img/{}.png'><a href='/page/{}'></a>"
+                                                     .format(i, (i + 1) % 6))
+        with LocalHTTPServer(pages) as server:
+            for max_pages in (3, 10):
+                spider = Spider(enable_logging=False)
+                expected_results = spider.crawl(server.url + '/', max_pages)
+                spider.close()
+                spider = Spider(enable_logging=False, parse_workers=2)
+                self.assertEqual(spider.crawl(server.url + '/', max_pages), expected_results)
+                spider.close()
+            self.assertEqual(len([request for request in server.requests if request[0] == 'GET']), 20)
+
+    def test_prefetch_with_priority_frontier(self):
+        """
+        Tests that pages prefetched from a PriorityFrontier and then demoted are discarded, so that the window
+        holds the pages at the head of the frontier.
+        """
+        pages = {'/page/{}'.format(i): html_route("<img src='/img/{}.png'>".format(i)) for i in range(3)}
+        with LocalHTTPServer(pages) as server:
+            urls = [server.url + '/page/{}'.format(i) for i in range(3)]
+            frontier = PriorityFrontier(scorers=[InlinkScorer()])
+            for url in urls:
+                frontier.add(url)
+            url_parser = URLParser(enable_logging=False)
+            url_parser.set_base_url(server.url + '/')
+            pipeline = ParsePipeline(url_parser, 1, window=2)
+            try:
+                pipeline.prefetch(frontier.peek(pipeline.window))
+                self.assertEqual(list(pipeline._pending), urls[:2])
+                # More links to the last page move it to the head of the frontier
+                for _ in range(3):
+                    frontier.add(urls[2])
+                self.assertEqual(frontier.peek(pipeline.window), [urls[2], urls[0]])
+                pipeline.prefetch(frontier.peek(pipeline.window))
+                self.assertEqual(sorted(pipeline._pending), [urls[0], urls[2]])
+                self.assertEqual(frontier.pop(), urls[2])
+                pipeline.parse_url(urls[2])
+                self.assertEqual(list(pipeline._pending), [urls[0]])
+            finally:
+                pipeline.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, main
+
+from src.sync.archive import HTTPArchive, RecordingTransport, ReplayTransport
+from src.sync.http_cache import CachingTransport, HTTPCache
+from src.sync.politeness import MAX_ROBOTS_SIZE, PolitenessScheduler, PoliteTransport, RobotsDisallowedError, parse_retry_after
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from tests.sync.local_server import LocalHTTPServer, html_route, stalled_route
+
+
+class FakeClock:
+    """
+    A clock whose time only advances when sleeping.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestPoliteness(TestCase):
+    """
+    Collection of test cases for the PolitenessScheduler and PoliteTransport classes.
+    """
+
+    def get_scheduler(self, **kwargs):
+        self.clock = FakeClock()
+        return PolitenessScheduler(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_parse_retry_after(self):
+        """
+        Tests the parse_retry_after function.
+        """
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertEqual(parse_retry_after('Thu, 01 Jan 1970 00:01:40 GMT', now=40), 60.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_token_bucket(self):
+        """
+        Tests that requests to the same host are paced at the configured rate, while other hosts aren't affected.
+        """
+        scheduler = self.get_scheduler(rate=2.0)
+        waits = [scheduler.acquire('http://www.sample.com/{}'.format(i)) for i in range(4)]
+        self.assertEqual(waits, [0.0, 0.5, 0.5, 0.5])
+        self.assertEqual(scheduler.acquire('http://www.other.com/'), 0.0)
+        self.assertEqual(scheduler.metrics()['www.sample.com']['requests'], 4)
+        with self.assertRaises(ValueError):
+            PolitenessScheduler(rate=100.0, max_rate=50.0)
+
+    def test_adaptive_rate(self):
+        """
+        Tests that throttling responses halve the rate and pause the host, and that healthy responses ramp it up.
+        """
+        scheduler = self.get_scheduler(rate=4.0, min_rate=1.0, max_rate=5.0)
+        self.assertEqual(scheduler.record('http://www.sample.com/', 429, '3'), 3.0)
+        self.assertEqual(scheduler.metrics()['www.sample.com']['rate'], 2.0)
+        self.assertEqual(scheduler.acquire('http://www.sample.com/'), 3.0)
+        # Without Retry-After the backoff is exponential
+        self.assertEqual(scheduler.record('http://www.sample.com/', 503), 2.0)
+        self.assertEqual(scheduler.record('http://www.sample.com/', 503), 4.0)
+        self.assertEqual(scheduler.metrics()['www.sample.com']['rate'], 1.0)
+        scheduler.record('http://www.sample.com/', 200)
+        self.assertEqual(scheduler.metrics()['www.sample.com']['rate'], 1.25)
+        for _ in range(50):
+            scheduler.record('http://www.sample.com/', 200)
+        self.assertEqual(scheduler.metrics()['www.sample.com']['rate'], 5.0)
+        self.assertEqual(scheduler.metrics()['www.sample.com']['throttled'], 3)
+
+    def test_polite_crawl(self):
+        """
+        Tests a crawl of a local server honoring robots.txt and retrying throttled requests.
+        """
+        throttled = []
+
+        def throttled_route(handler):
+            if not throttled:
+                throttled.append(handler.path)
+                return 429, {'Retry-After': '1'}, b''
+            return 200, {'Content-Type': 'text/html'}, b'<html></html>'
+
+        routes = {
+            '/robots.txt': lambda handler: (200, {'Content-Type': 'text/plain'},
+                                            b'User-agent: *\nDisallow: /private\nCrawl-delay: 0.01\n'),
+            '/': html_route("<a href='/private/page'></a><a href='/public'></a>"),
+            '/public': throttled_route,
+        }
+        with LocalHTTPServer(routes) as server:
+            scheduler = self.get_scheduler(rate=10.0, min_rate=1.0)
+            spider = Spider(enable_logging=False, politeness=scheduler)
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+            self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/public'])
+            self.assertNotIn('/private/page', [request[1] for request in server.requests])
+            self.assertIn(1.0, self.clock.sleeps)
+            self.assertEqual(scheduler.metrics()['127.0.0.1:{}'.format(server.url.rsplit(':', 1)[1])]['throttled'], 1)
+            transport = PoliteTransport(PooledTransport(), scheduler)
+            with self.assertRaises(RobotsDisallowedError):
+                transport.send(server.url + '/private/page', 'GET')
+            transport.close()
+
+    def test_local_responses_not_paced(self):
+        """
+        Tests that the responses served by a cache or an archive aren't paced, while robots.txt is
+        still honored.
+        """
+        routes = {
+            '/robots.txt': lambda handler: (200, {'Content-Type': 'text/plain'},
+                                            b'User-agent: *\nDisallow: /private\n'),
+            '/': lambda handler: (200, {'Content-Type': 'text/html', 'Cache-Control': 'max-age=3600'},
+                                  b"<a href='/private/page'></a><a href='/public'></a>"),
+            '/public': lambda handler: (200, {'Content-Type': 'text/html', 'Cache-Control': 'max-age=3600'},
+                                        b'<html></html>'),
+        }
+        with LocalHTTPServer(routes) as server, tempfile.TemporaryDirectory() as directory:
+            host = '127.0.0.1:{}'.format(server.url.rsplit(':', 1)[1])
+            scheduler = self.get_scheduler(rate=1.0, min_rate=1.0)
+            archive_path = os.path.join(directory, 'crawl.warc.gz')
+            cache = HTTPCache(os.path.join(directory, 'cache'))
+            transport = PoliteTransport(PooledTransport(), scheduler, robots=False)
+            transport = RecordingTransport(CachingTransport(transport, cache), HTTPArchive(archive_path, mode='a'))
+            spider = Spider(enable_logging=False, politeness=scheduler, transport=transport, max_retries=0)
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/public'])
+            requests = scheduler.metrics()[host]['requests']
+            self.assertEqual(requests, len(server.requests))
+            # The second crawl is served by the cache, without waiting
+            sleeps = len(self.clock.sleeps)
+            self.assertEqual(json.loads(spider.crawl(server.url + '/', 5)), results)
+            self.assertEqual(scheduler.metrics()[host]['requests'], requests)
+            self.assertEqual(len(self.clock.sleeps), sleeps)
+            spider.close()
+            # A replayed crawl isn't paced either, and robots.txt comes from the archive
+            scheduler = self.get_scheduler(rate=1.0, min_rate=1.0)
+            transport = ReplayTransport(HTTPArchive(archive_path))
+            spider = Spider(enable_logging=False, politeness=scheduler, transport=transport, max_retries=0)
+            self.assertEqual(json.loads(spider.crawl(server.url + '/', 5)), results)
+            self.assertEqual(scheduler.metrics()[host]['requests'], 0)
+            self.assertEqual(self.clock.sleeps, [])
+            self.assertEqual(len(server.requests), requests)
+            spider.close()
+
+    def test_unreadable_robots(self):
+        """
+        Tests that a truncated robots.txt allows everything, and that only the beginning of a large
+        robots.txt is parsed.
+        """
+        routes = {'/robots.txt': stalled_route(200, {'Content-Type': 'text/plain'}, 0),
+                  '/': html_route("<a href='/about'></a>"),
+                  '/about': html_route('About')}
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False, politeness=self.get_scheduler(rate=50.0), max_retries=0)
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+            self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/about'])
+            robots_txt = b'User-agent: *\nDisallow: /private\n' + b'#' * MAX_ROBOTS_SIZE + b'\nDisallow: /about\n'
+            routes['/robots.txt'] = lambda handler: (200, {'Content-Type': 'text/plain'}, robots_txt)
+            scheduler = self.get_scheduler()
+            transport = PooledTransport()
+            scheduler.load_robots(server.url + '/', transport)
+            transport.close()
+            self.assertFalse(scheduler.allowed(server.url + '/private'))
+            self.assertTrue(scheduler.allowed(server.url + '/about'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, main
+
+from src.sync.result_store import ResultStore
+from src.sync.spider import Spider
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+RESULTS = [
+    {'url': 'http://www.sample.com/', 'assets': ['http://www.sample.com/a.js', 'http://www.sample.com/b.css']},
+    {'url': 'http://www.sample.com/about', 'assets': []},
+    {'url': 'http://www.sample.com/copy', 'assets': ['http://www.sample.com/a.js', 'http://www.sample.com/b.css'],
+     'alias_of': 'http://www.sample.com/'},
+    {'url': 'http://www.sample.com/contact', 'assets': ['http://www.sample.com/a.js']},
+]
+
+
+class TestResultStore(TestCase):
+    """
+    Collection of test cases for the ResultStore class.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_store(self):
+        """
+        Tests that results are written in batches, exported back in order and queried.
+        """
+        store = ResultStore(self.path, batch_size=3)
+        for result in RESULTS:
+            store.add(result, {'status': 200, 'final_url': result['url']}, total_seconds=0.5)
+        # The first batch has been written, the last page is still pending
+        other_store = ResultStore(self.path)
+        self.assertEqual(len(other_store), 3)
+        other_store.close()
+        self.assertEqual(list(store.iter_results()), RESULTS)
+        self.assertEqual(store.pages_using('http://www.sample.com/a.js'),
+                         ['http://www.sample.com/', 'http://www.sample.com/copy', 'http://www.sample.com/contact'])
+        self.assertEqual(store.assets_of('http://www.sample.com/copy'), RESULTS[2]['assets'])
+        self.assertIsNone(store.assets_of('http://www.sample.com/missing'))
+        self.assertEqual(store.get_page('http://www.sample.com/about')['status'], 200)
+        self.assertEqual(store.stats(), {'pages': 4, 'assets': 2, 'edges': 5, 'statuses': {'200': 4},
+                                         'total_seconds': 2.0})
+        # A page stored again replaces the previous one
+        store.add({'url': 'http://www.sample.com/', 'assets': ['http://www.sample.com/c.png']})
+        store.close()
+        store = ResultStore(self.path)
+        self.assertEqual(store.assets_of('http://www.sample.com/'), ['http://www.sample.com/c.png'])
+        self.assertEqual(store.pages_using('http://www.sample.com/b.css'), ['http://www.sample.com/copy'])
+        self.assertEqual(len(store), 4)
+        store.close()
+        store = ResultStore(self.path, reset=True)
+        self.assertEqual(list(store.iter_results()), [])
+        store.close()
+
+    def test_spider_with_store(self):
+        """
+        Tests that a Spider saves its results to the store, with the status, final URL and timings of the pages.
+        """
+        routes = {
+            '/': html_route("<a href='/old'></a><a href='/missing'></a><img src='/logo.png'>"),
+            '/old': lambda handler: (301, {'Location': '/new'}, b''),
+            '/new': html_route("<img src='/logo.png'>"),
+            '/logo.png': lambda handler: (200, {'Content-Type': 'image/png'}, b''),
+        }
+        with LocalHTTPServer(routes) as server:
+            store = ResultStore(self.path)
+            spider = Spider(enable_logging=False, strict=True, result_store=store, max_retries=0)
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+        self.assertEqual(list(store.iter_results()), results)
+        page = store.get_page(server.url + '/new')
+        self.assertEqual((page['status'], page['final_url'], page['content_type']),
+                         (200, server.url + '/new', 'text/html; charset=utf-8'))
+        self.assertGreater(page['total_seconds'], 0)
+        self.assertGreater(page['fetch_seconds'], 0)
+        self.assertEqual(store.pages_using(server.url + '/logo.png'), [server.url + '/', server.url + '/new'])
+        self.assertEqual(store.stats()['pages'], 2)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
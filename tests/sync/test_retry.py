@@ -0,0 +1,155 @@
+import json
+import socket
+import time
+import urllib.error
+from unittest import TestCase, main
+
+from src.sync.metrics import CrawlMetrics
+from src.sync.retry import RetryingTransport, is_timeout, is_transient
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from src.sync.url_parser import URLParser
+from tests.sync.local_server import LocalHTTPServer, html_route, stalled_route
+
+
+class FailingTransport:
+    """
+    A transport raising the given errors, in order, before returning a response.
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.requests = 0
+
+    def send(self, url, method, headers=None, timeout=None):
+        self.requests += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'response'
+
+    def stats(self):
+        return {'requests_served': self.requests}
+
+    def close(self):
+        pass
+
+
+def http_error(code, headers=None):
+    return urllib.error.HTTPError('http://www.sample.com/', code, 'Error', headers or {}, None)
+
+
+def slow_route(body, delay):
+    """
+    Returns a route serving the given HTML body after the given number of seconds.
+    """
+    def route(handler):
+        time.sleep(delay)
+        return html_route(body)(handler)
+    return route
+
+
+class TestRetry(TestCase):
+    """
+    Collection of test cases for the timeouts, the retries and the deadline of the crawls.
+    """
+
+    def test_is_transient(self):
+        """
+        Tests which errors are considered transient.
+        """
+        self.assertTrue(is_transient(urllib.error.URLError(ConnectionRefusedError())))
+        self.assertTrue(is_transient(urllib.error.URLError(socket.timeout())))
+        self.assertTrue(is_transient(http_error(503)))
+        self.assertFalse(is_transient(http_error(404)))
+        self.assertFalse(is_transient(urllib.error.URLError('unknown url type: ftp')))
+        self.assertTrue(is_timeout(urllib.error.URLError(socket.timeout())))
+        self.assertTrue(is_timeout(socket.timeout()))
+        self.assertFalse(is_timeout(urllib.error.URLError(ConnectionRefusedError())))
+
+    def test_retries(self):
+        """
+        Tests that transient failures are retried with an exponential backoff, and the other ones aren't.
+        """
+        delays = []
+        metrics = CrawlMetrics()
+        transport = RetryingTransport(FailingTransport([urllib.error.URLError(ConnectionResetError()),
+                                                        http_error(502)]),
+                                      metrics=metrics, sleep=delays.append, random=lambda: 1.0)
+        self.assertEqual(transport.send('http://www.sample.com/', 'GET'), 'response')
+        self.assertEqual(delays, [0.5, 1.0])
+        self.assertEqual(metrics.retries, 2)
+        self.assertEqual(transport.stats(), {'requests_served': 3, 'retries': 2})
+        # Gives up after the maximum number of retries
+        transport = RetryingTransport(FailingTransport([http_error(500)] * 3), max_retries=2, sleep=delays.append)
+        with self.assertRaises(urllib.error.HTTPError):
+            transport.send('http://www.sample.com/', 'GET')
+        self.assertEqual(transport.transport.requests, 3)
+        # Errors which would happen again aren't retried
+        transport = RetryingTransport(FailingTransport([http_error(404)]), sleep=delays.append)
+        with self.assertRaises(urllib.error.HTTPError):
+            transport.send('http://www.sample.com/', 'GET')
+        self.assertEqual(transport.transport.requests, 1)
+        # Retry-After is honored, within the maximum backoff
+        del delays[:]
+        transport = RetryingTransport(FailingTransport([http_error(429, {'Retry-After': '3'}),
+                                                        http_error(429, {'Retry-After': '60'})]),
+                                      sleep=delays.append, random=lambda: 0.0)
+        self.assertEqual(transport.send('http://www.sample.com/', 'GET'), 'response')
+        self.assertEqual(delays, [3.0, 10.0])
+
+    def test_timeouts(self):
+        """
+        Tests that a page too slow to answer is skipped and counted as a timeout, and that the
+        failure of a HEAD request doesn't prevent the page linking it from being parsed.
+        """
+        routes = {'/': html_route("<a href='/slow'></a><a href='/fast'></a><img src='/logo.png'>"),
+                  '/slow': slow_route('', 1.0),
+                  '/fast': html_route('')}
+        with LocalHTTPServer(routes) as server:
+            metrics = CrawlMetrics()
+            transport = PooledTransport(timeout=0.2, connect_timeout=1)
+            parser = URLParser(enable_logging=False, strict=True, transport=transport, metrics=metrics)
+            parser.set_base_url(server.url + '/')
+            self.assertEqual(parser.parse_url(server.url + '/slow'), ([], []))
+            self.assertEqual(metrics.timeouts, 1)
+            # The HEAD request of /slow times out, /logo.png doesn't exist: only /fast is classified
+            self.assertEqual(parser.parse_url(server.url + '/'), ([], [server.url + '/fast']))
+            self.assertEqual(metrics.timeouts, 2)
+            parser.close()
+            transport.close()
+
+    def test_stalled_bodies(self):
+        """
+        Tests that a timeout while reading the body of an error response or of a redirect is reported
+        like a failed request, instead of aborting the crawl.
+        """
+        routes = {'/': html_route("<a href='/missing'></a><a href='/moved'></a><a href='/fast'></a>"),
+                  '/missing': stalled_route(404, {'Content-Type': 'text/html'}, 1.0),
+                  '/moved': stalled_route(301, {'Location': '/fast'}, 1.0),
+                  '/fast': html_route('')}
+        with LocalHTTPServer(routes) as server:
+            metrics = CrawlMetrics()
+            spider = Spider(enable_logging=False, timeout=0.2, max_retries=1, metrics=metrics)
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+        self.assertEqual([result['url'] for result in results],
+                         [server.url + '/', server.url + '/missing', server.url + '/moved', server.url + '/fast'])
+        self.assertEqual(metrics.retries, 2)
+
+    def test_deadline(self):
+        """
+        Tests that a crawl stops once its deadline is reached, returning the pages visited so far.
+        """
+        routes = {'/': slow_route("<a href='/1'></a>", 0.3),
+                  '/1': slow_route("<a href='/2'></a>", 0.3),
+                  '/2': slow_route("<a href='/3'></a>", 0.3),
+                  '/3': slow_route('', 0.3)}
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False, deadline=0.45)
+            results = json.loads(spider.crawl(server.url + '/', 4))
+            spider.close()
+        self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/1'])
+
+
+if __name__ == '__main__':
+    main()
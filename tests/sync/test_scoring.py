@@ -0,0 +1,38 @@
+from unittest import TestCase, main
+
+from src.sync.scoring import DepthScorer, InlinkScorer, PathFilter, PatternScorer, parse_pattern_weight
+
+
+class TestScoring(TestCase):
+    """
+    Collection of test cases for the scorers of the PriorityFrontier.
+    """
+
+    def test_scorers(self):
+        """
+        Tests the score given by each scorer.
+        """
+        url = 'http://www.sample.com/calendar/2020/01?page=3'
+        self.assertEqual(DepthScorer(weight=2)(url, 3, 1), -6)
+        self.assertEqual(InlinkScorer()(url, 3, 1), 0)
+        self.assertEqual(InlinkScorer(weight=0.5)(url, 3, 8), 1.5)
+        self.assertEqual(PatternScorer([('/calendar/', -5), (r'page=\d+', -1), ('/products/', 3)])(url, 3, 1), -6)
+        self.assertEqual(PathFilter()(url, 0, 1), 0)
+        self.assertEqual(PathFilter(allow=['/calendar', '/blog'])(url, 0, 1), 0)
+        self.assertIsNone(PathFilter(allow=['/blog'])(url, 0, 1))
+        self.assertIsNone(PathFilter(deny=['/calendar/'])(url, 0, 1))
+        self.assertIsNone(PathFilter(allow=['/calendar'], deny=['/calendar/2020'])(url, 0, 1))
+
+    def test_parse_pattern_weight(self):
+        """
+        Tests that the pattern weights given on the command line are parsed and validated.
+        """
+        self.assertEqual(parse_pattern_weight('/calendar/=-5'), ('/calendar/', -5.0))
+        self.assertEqual(parse_pattern_weight('a=b=2'), ('a=b', 2.0))
+        for value in ('/calendar/', '=2', '/calendar/=x', '(=1'):
+            with self.assertRaises(ValueError):
+                parse_pattern_weight(value)
+
+
+if __name__ == '__main__':
+    main()
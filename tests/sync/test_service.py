@@ -0,0 +1,165 @@
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from unittest import TestCase, main
+
+from src.sync.classification_cache import ClassificationCache
+from src.sync.service import CANCELLED, FINISHED, CrawlService, JobQueueFullError, ServiceServer
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from tests.sync.local_server import LocalHTTPServer, html_route
+
+ROUTES = {
+    '/': html_route("<a href='/a'></a><a href='/b'></a><img src='/logo.png'>"),
+    '/a': html_route("<a href='/b'></a><script src='/app.js'></script>"),
+    '/b': html_route("<a href='/'></a>"),
+}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    An HTTPConnection over a Unix socket.
+    """
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def request(url, method='GET', body=None):
+    """
+    Sends a request to the API of a service, returning the status and the decoded JSON body.
+    """
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method)) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode('utf-8'))
+
+
+class TestService(TestCase):
+    """
+    Collection of test cases for the CrawlService and ServiceServer classes.
+    """
+
+    def test_jobs(self):
+        """
+        Tests that concurrent jobs return the same results as a Spider, and that they share the
+        connections and the classification cache.
+        """
+        with LocalHTTPServer(ROUTES) as server:
+            spider = Spider(enable_logging=False, strict=True)
+            expected = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+            transport = PooledTransport()
+            service = CrawlService(transport, ClassificationCache(), max_jobs=2, enable_logging=False, strict=True)
+            first_job = service.submit(server.url + '/', 5)
+            self.assertTrue(first_job.wait(10))
+            head_requests = sum(1 for method, _, _ in server.requests if method == 'HEAD')
+            jobs = [first_job] + [service.submit(server.url + '/', 5) for _ in range(2)]
+            for job in jobs:
+                self.assertTrue(job.wait(10))
+                self.assertEqual(job.state, FINISHED)
+                self.assertEqual(list(job.iter_results()), expected)
+            # The links have been classified by the first job only
+            self.assertEqual(sum(1 for method, _, _ in server.requests if method == 'HEAD'), head_requests)
+            service.close()
+        self.assertLessEqual(transport.stats()['connections_opened'], 2)
+        self.assertEqual(service.stats()['jobs'], {'queued': 0, 'running': 0, 'finished': 3, 'failed': 0,
+                                                   'cancelled': 0})
+
+    def test_queue(self):
+        """
+        Tests that jobs are refused once the queue is full, and that queued jobs can be cancelled.
+        """
+        release = threading.Event()
+        routes = {'/': lambda handler: release.wait(10) and (200, {'Content-Type': 'text/html'}, b'')}
+        with LocalHTTPServer(routes) as server:
+            service = CrawlService(PooledTransport(), ClassificationCache(), max_jobs=1, max_queued_jobs=1,
+                                   max_finished_jobs=1, enable_logging=False)
+            running = service.submit(server.url + '/', 1)
+            while running.state != 'running':
+                running.wait(0.01)
+            queued = service.submit(server.url + '/', 1)
+            with self.assertRaises(JobQueueFullError):
+                service.submit(server.url + '/', 1)
+            self.assertIs(service.cancel(queued.id), queued)
+            self.assertEqual(queued.state, CANCELLED)
+            release.set()
+            self.assertTrue(running.wait(10))
+            service.close()
+        self.assertEqual(running.state, FINISHED)
+        # Only the last finished job is kept
+        self.assertIsNone(service.get(running.id))
+        self.assertIs(service.get(queued.id), queued)
+
+    def test_server(self):
+        """
+        Tests that jobs are submitted, followed, streamed and cancelled through the API.
+        """
+        with LocalHTTPServer(ROUTES) as server:
+            service = CrawlService(PooledTransport(), ClassificationCache(), max_job_pages=10, max_job_seconds=60,
+                                   enable_logging=False)
+            api = ServiceServer(service, ('127.0.0.1', 0))
+            status, job = request(api.url + '/jobs', 'POST', {'url': server.url + '/', 'max_pages': 2})
+            self.assertEqual(status, 202)
+            with urllib.request.urlopen('{}/jobs/{}/results'.format(api.url, job['id'])) as response:
+                results = [json.loads(line.decode('utf-8')) for line in response]
+            self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/a'])
+            status, job = request('{}/jobs/{}'.format(api.url, job['id']))
+            self.assertEqual((status, job['state'], job['pages']), (200, 'finished', 2))
+            self.assertEqual(request(api.url + '/jobs')[1][0]['id'], job['id'])
+            self.assertEqual(request(api.url + '/jobs', 'POST', {'url': 'ftp://x'})[0], 400)
+            # Jobs are capped by the limits of the service
+            self.assertEqual(request(api.url + '/jobs', 'POST', {'url': server.url + '/', 'max_pages': 11})[0], 400)
+            self.assertEqual(request(api.url + '/jobs', 'POST', {'url': server.url + '/', 'deadline': 61})[0], 400)
+            self.assertEqual(service.get(job['id']).deadline, 60)
+            self.assertEqual(request(api.url + '/jobs/unknown')[0], 404)
+            self.assertEqual(request(api.url + '/jobs/unknown', 'DELETE')[0], 404)
+            self.assertEqual(request('{}/jobs/{}'.format(api.url, job['id']), 'DELETE')[1]['state'], 'finished')
+            self.assertEqual(request(api.url + '/stats')[1]['jobs']['finished'], 1)
+            api.close()
+            service.close()
+
+    def test_unix_socket(self):
+        """
+        Tests that the API is served on a Unix socket, which replaces a stale socket but no other file.
+        """
+        with tempfile.TemporaryDirectory() as directory, LocalHTTPServer(ROUTES) as server:
+            service = CrawlService(PooledTransport(), ClassificationCache(), enable_logging=False)
+            with open(os.path.join(directory, 'file'), 'w'):
+                pass
+            with self.assertRaises(ValueError):
+                ServiceServer(service, os.path.join(directory, 'file'))
+            self.assertTrue(os.path.exists(os.path.join(directory, 'file')))
+            stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale_socket.bind(os.path.join(directory, 'crawler.sock'))
+            stale_socket.close()
+            api = ServiceServer(service, os.path.join(directory, 'crawler.sock'))
+            connection = UnixHTTPConnection(api.socket_path)
+            connection.request('POST', '/jobs', json.dumps({'url': server.url + '/', 'max_pages': 3}))
+            job = json.loads(connection.getresponse().read().decode('utf-8'))
+            connection.close()
+            self.assertTrue(service.get(job['id']).wait(10))
+            connection = UnixHTTPConnection(api.socket_path)
+            connection.request('GET', '/jobs/{}/results?follow=0'.format(job['id']))
+            lines = connection.getresponse().read().decode('utf-8').splitlines()
+            connection.close()
+            self.assertEqual(len(lines), 3)
+            api.close()
+            service.close()
+            self.assertFalse(os.path.exists(os.path.join(directory, 'crawler.sock')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase, main
+
+from src.sync.frontier import Frontier
+from src.sync.sitemap import SitemapSeeder, get_robots_sitemaps, iter_sitemap
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from tests.sync.local_server import LocalHTTPServer, html_route, stalled_route
+
+NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sitemap(urls):
+    """
+    Returns a sitemap listing the given (loc, lastmod) tuples.
+    """
+    entries = ''.join('<url><loc>{}</loc>{}</url>'.format(loc, '<lastmod>{}</lastmod>'.format(lastmod)
+                                                           if lastmod else '') for loc, lastmod in urls)
+    return '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{}">{}</urlset>'.format(NAMESPACE, entries)
+
+
+def sitemap_index(locs):
+    """
+    Returns a sitemap index listing the given sitemaps.
+    """
+    entries = ''.join('<sitemap><loc>{}</loc></sitemap>'.format(loc) for loc in locs)
+    return '<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{}">{}</sitemapindex>'.format(NAMESPACE,
+                                                                                                    entries)
+
+
+def xml_route(body, gzipped=False):
+    """
+    Returns a route serving the given XML document, as a .gz file if needed.
+    """
+    data = body.encode('utf-8')
+    if gzipped:
+        return lambda handler: (200, {'Content-Type': 'application/x-gzip'}, gzip.compress(data))
+    return lambda handler: (200, {'Content-Type': 'application/xml'}, data)
+
+
+class TestSitemap(TestCase):
+    """
+    Collection of test cases for the SitemapSeeder class.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_robots_sitemaps(self):
+        """
+        Tests that the Sitemap lines of a robots.txt are found, whatever their case.
+        """
+        robots_txt = 'User-agent: *\nDisallow: /private\nSitemap: http://www.sample.com/a.xml\n' \
+                     'sitemap:http://www.sample.com/b.xml.gz\n'
+        self.assertEqual(get_robots_sitemaps(robots_txt),
+                         ['http://www.sample.com/a.xml', 'http://www.sample.com/b.xml.gz'])
+        self.assertEqual(get_robots_sitemaps('User-agent: *'), [])
+
+    def test_iter_sitemap(self):
+        """
+        Tests that sitemaps are parsed in chunks, gzipped or not, and that oversized ones are refused.
+        """
+        document = sitemap([('http://www.sample.com/{}'.format(i), '2020-01-0{}'.format(i % 9 + 1) if i % 2 else None)
+                            for i in range(1000)]).encode('utf-8')
+        expected = [('url', 'http://www.sample.com/{}'.format(i), '2020-01-0{}'.format(i % 9 + 1) if i % 2 else None)
+                    for i in range(1000)]
+        for data in (document, gzip.compress(document)):
+            chunks = [data[i:i + 512] for i in range(0, len(data), 512)]
+            self.assertEqual(list(iter_sitemap(chunks)), expected)
+        self.assertEqual(list(iter_sitemap([sitemap_index(['http://www.sample.com/a.xml']).encode('utf-8')])),
+                         [('sitemap', 'http://www.sample.com/a.xml', None)])
+        with self.assertRaises(ValueError):
+            list(iter_sitemap([document], max_size=1000))
+
+    def test_seed(self):
+        """
+        Tests that the pages of the sitemaps declared by robots.txt are queued, following the indexes,
+        and that unchanged pages are skipped by the next crawl.
+        """
+        routes = {}
+        with LocalHTTPServer(routes) as server:
+            routes.update({
+                '/robots.txt': lambda handler: (200, {'Content-Type': 'text/plain'},
+                                                'Sitemap: {}/index.xml\n'.format(server.url).encode('utf-8')),
+                '/index.xml': xml_route(sitemap_index([server.url + '/pages.xml.gz', server.url + '/missing.xml',
+                                                       server.url + '/index.xml'])),
+                '/pages.xml.gz': xml_route(sitemap([(server.url + '/deep/1', '2020-01-01'),
+                                                    (server.url + '/deep/2', '2020-01-02'),
+                                                    ('http://www.other.com/', None),
+                                                    (server.url + '/', None)]), gzipped=True),
+                '/': html_route("<a href='/deep/1'></a>"),
+                '/deep/1': html_route(''),
+                '/deep/2': html_route(''),
+            })
+            state_path = os.path.join(self.directory.name, 'sitemaps.json')
+            spider = Spider(enable_logging=False, seeder=SitemapSeeder(state_path=state_path, enable_logging=False))
+            results = json.loads(spider.crawl(server.url + '/', 2))
+            self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/deep/1'])
+            # Only the pages visited are recorded
+            with open(state_path) as state_file:
+                self.assertEqual(json.load(state_file), {server.url + '/deep/1': '2020-01-01'})
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+            # The unchanged page is skipped, even if linked by the start page
+            self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/deep/2'])
+
+    def test_seed_without_robots(self):
+        """
+        Tests that /sitemap.xml is read when robots.txt declares no sitemaps, and that no more sitemap
+        entries are read once the frontier holds enough pages.
+        """
+        routes = {}
+        with LocalHTTPServer(routes) as server:
+            routes['/sitemap.xml'] = xml_route(sitemap([(server.url + '/{}'.format(i), None) for i in range(10)]))
+            frontier = Frontier()
+            frontier.add(server.url + '/')
+            seeder = SitemapSeeder(enable_logging=False)
+            transport = PooledTransport()
+            self.assertEqual(seeder.seed(server.url + '/', frontier, transport, lambda url: True, limit=4), (3, 0))
+            transport.close()
+        self.assertEqual(frontier.peek(10), [server.url + '/', server.url + '/0', server.url + '/1',
+                                             server.url + '/2'])
+
+    def test_stalled_sitemaps(self):
+        """
+        Tests that a truncated robots.txt and a sitemap whose body times out are skipped without
+        stopping the crawl.
+        """
+        routes = {'/robots.txt': stalled_route(200, {'Content-Type': 'text/plain'}, 0),
+                  '/sitemap.xml': stalled_route(200, {'Content-Type': 'application/xml'}, 1.0),
+                  '/': html_route("<a href='/about'></a>"),
+                  '/about': html_route('About')}
+        with LocalHTTPServer(routes) as server:
+            spider = Spider(enable_logging=False, timeout=0.3, max_retries=0,
+                            seeder=SitemapSeeder(enable_logging=False))
+            results = json.loads(spider.crawl(server.url + '/', 5))
+            spider.close()
+        self.assertEqual([result['url'] for result in results], [server.url + '/', server.url + '/about'])
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ from unittest import TestCase, main
 from unittest.mock import patch
 
 import tests.sync.mocks as mocks
+from src.sync.frontier import PriorityFrontier
 from src.sync.spider import Spider
 
 
@@ -55,6 +56,33 @@ class TestSpider(TestCase):
         self.assertEqual(current_json_response, expected_json_response)
         del spider
 
+    @patch('src.sync.url_parser.URLParser.parse_url', side_effect=mocks.mocked_parse_url)
+    def test_iter_crawl(self, mock_parse_url):
+        """
+        Tests that the iter_crawl method yields each result before parsing the next page.
+        """
+        spider = Spider()
+        results = spider.iter_crawl('http://www.sample.com/', 3)
+        self.assertEqual(next(results), {'url': 'http://www.sample.com/',
+                                         'assets': ['https://www.sample.com/some_img.png']})
+        self.assertEqual(mock_parse_url.call_count, 1)
+        self.assertEqual([result['url'] for result in results],
+                         ['http://www.sample.com/test1/', 'http://www.sample.com/test2/'])
+        del spider
+
+    @patch('src.sync.url_parser.URLParser.parse_url', side_effect=mocks.mocked_parse_url)
+    def test_max_depth(self, mock_parse_url):
+        """
+        Tests that the links of the pages at the maximum depth aren't followed.
+        """
+        spider = Spider(max_depth=0)
+        self.assertEqual([result['url'] for result in spider.iter_crawl('http://www.sample.com/', 3)],
+                         ['http://www.sample.com/'])
+        spider = Spider(max_depth=1, frontier=PriorityFrontier)
+        self.assertEqual([result['url'] for result in spider.iter_crawl('http://www.sample.com/', 3)],
+                         ['http://www.sample.com/', 'http://www.sample.com/test1/', 'http://www.sample.com/test2/'])
+        del spider
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,87 @@
+import urllib.error
+from unittest import TestCase, main
+
+from src.sync.spider import Spider
+from src.sync.transport import PooledTransport
+from tests.sync.local_server import LocalHTTPServer, html_route, redirect_route
+
+
+class TestPooledTransport(TestCase):
+    """
+    Collection of test cases for the PooledTransport class, run against a local HTTP server.
+    """
+
+    def setUp(self):
+        self.server = LocalHTTPServer({
+            '/': html_route("<html><body><a href='/about'></a><img src='/logo.png'></body></html>"),
+            '/about': html_route('<html><body>About</body></html>'),
+            '/logo.png': lambda handler: (200, {'Content-Type': 'image/png'}, b'png'),
+            '/old': redirect_route('/about'),
+            '/close': html_route('<html></html>', {'Connection': 'close'}),
+        })
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_connection_reuse(self):
+        """
+        Tests that GET and HEAD requests to the same host reuse a single connection.
+        """
+        transport = PooledTransport()
+        for _ in range(3):
+            response = transport.send(self.server.url + '/', 'GET')
+            self.assertIn(b'/about', response.read())
+            response = transport.send(self.server.url + '/logo.png', 'HEAD')
+            self.assertEqual(response.info()['Content-Type'], 'image/png')
+        self.assertEqual(transport.stats(), {'connections_opened': 1, 'requests_served': 6})
+        self.assertEqual(self.server.connections, 1)
+        transport.close()
+
+    def test_redirect_and_errors(self):
+        """
+        Tests that redirects are followed and that error responses raise HTTPError.
+        """
+        transport = PooledTransport()
+        response = transport.send(self.server.url + '/old', 'HEAD')
+        self.assertEqual(response.geturl(), self.server.url + '/about')
+        self.assertEqual(response.getcode(), 200)
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            transport.send(self.server.url + '/missing', 'GET')
+        self.assertEqual(context.exception.code, 404)
+        # Error and redirect bodies are consumed, so the connection is still reusable
+        self.assertEqual(transport.stats()['connections_opened'], 1)
+        with self.assertRaises(urllib.error.URLError):
+            transport.send('ftp://127.0.0.1/file', 'GET')
+        transport.close()
+
+    def test_connections_not_reused(self):
+        """
+        Tests that connections closed by the server, partially read or idle for too long aren't reused.
+        """
+        transport = PooledTransport()
+        transport.send(self.server.url + '/close', 'GET').read()
+        transport.send(self.server.url + '/', 'GET').close()
+        transport.send(self.server.url + '/about', 'GET').read()
+        self.assertEqual(transport.stats()['connections_opened'], 3)
+        transport.close()
+        transport = PooledTransport(idle_timeout=0)
+        transport.send(self.server.url + '/about', 'GET').read()
+        transport.send(self.server.url + '/about', 'GET').read()
+        self.assertEqual(transport.stats()['connections_opened'], 2)
+        transport.close()
+
+    def test_spider_with_pooled_transport(self):
+        """
+        Tests a whole crawl of the local server over a single connection.
+        """
+        spider = Spider(enable_logging=False)
+        result = spider.crawl(self.server.url + '/', 5)
+        spider.close()
+        self.assertIn('"assets": ["{}/logo.png"]'.format(self.server.url), result)
+        self.assertIn('"url": "{}/about"'.format(self.server.url), result)
+        self.assertEqual(self.server.connections, 1)
+        del spider
+
+
+if __name__ == '__main__':
+    main()
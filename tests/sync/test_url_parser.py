@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 from unittest import TestCase, main
 from unittest.mock import patch
 
@@ -150,6 +152,50 @@ class TestURLParser(TestCase):
         self.assertEqual(response.data, "<html><body>500 Internal Server Error</body></html>")
         self.assertEqual(response.status_code, 500)
 
+    @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
+    @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
+    def test_request(self, mock_req, mock_resp):
+        """
+        Tests the _request method, sending the requests through the transport of the parser.
+        """
+        parser = URLParser()
+        # Tests successful GETs
+        response = parser._request('http://someurl.com/test', method="GET")
+        self.assertEqual(response.url, 'http://someurl.com/test')
+        self.assertEqual(response.data, "<html><body><a href='http://someurl.com/other'></a></body></html>")
+        self.assertEqual(response.status_code, 200)
+        response = parser._request('http://someotherurl.com/test', method="GET")
+        self.assertEqual(response.url, 'http://someotherurl.com/test')
+        self.assertEqual(response.data, "<html><body><a href='http://someotherurl.com/other'></a></body></html>")
+        self.assertEqual(response.status_code, 200)
+        # Tests 404
+        response = parser._request('http://errorurl.com/', method="GET")
+        self.assertEqual(response.url, 'http://errorurl.com/')
+        self.assertEqual(response.data, "<html><body>404 Error<body></html>")
+        self.assertEqual(response.status_code, 404)
+        # Tests successful HEADs
+        response = parser._request('http://someurl.com/test', method="HEAD")
+        self.assertEqual(response.url, 'http://someurl.com/test')
+        self.assertEqual(response.data, "")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'text/html')
+        response = parser._request('http://someotherurl.com/test.png', method="HEAD")
+        self.assertEqual(response.url, 'http://someotherurl.com/test.png')
+        self.assertEqual(response.data, "")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'image/png')
+        # Tests 404 HEAD
+        response = parser._request('http://errorurl.com/', method="HEAD")
+        self.assertEqual(response.url, 'http://errorurl.com/')
+        self.assertEqual(response.data, "<html><body>404 Error<body></html>")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.headers['Content-Type'], 'text/html')
+        # Tests different request types
+        response = parser._request('http://errorurl.com/', method="PUT")
+        self.assertEqual(response.url, 'http://errorurl.com/')
+        self.assertEqual(response.data, "<html><body>500 Internal Server Error</body></html>")
+        self.assertEqual(response.status_code, 500)
+
     @patch('src.sync.url_parser.URLParser._get_valid_linked_urls', side_effect=mocks.mocked_get_valid_linked_urls)
     @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
     @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
@@ -169,6 +215,37 @@ class TestURLParser(TestCase):
         self.assertEqual(assets[1], [])
         del parser
 
+    def test_get_assets_with_workers(self):
+        """
+        Tests that the _get_assets method sends the HEAD requests in parallel when more workers are
+        available, keeping the order of the links in the page.
+        """
+        lock = threading.Lock()
+        counters = {'running': 0, 'peak': 0}
+
+        def slow_classify_url(url):
+            with lock:
+                counters['running'] += 1
+                counters['peak'] = max(counters['peak'], counters['running'])
+            time.sleep(0.05)
+            with lock:
+                counters['running'] -= 1
+            return url, url.endswith('/')
+
+        parser = URLParser(max_workers=4)
+        parser.set_base_url('http://someurl.com/')
+        links = ['http://someurl.com/{}'.format(i) if i % 2 else 'http://someurl.com/{}/'.format(i) for i in range(8)]
+        with patch.object(parser, '_get_valid_linked_urls', return_value=links), \
+                patch.object(parser, '_classify_url', side_effect=slow_classify_url):
+            static_assets, links_to_follow = parser._get_assets('')
+        parser.close()
+        self.assertEqual(static_assets, links[1::2])
+        self.assertEqual(links_to_follow, links[0::2])
+        self.assertEqual(counters['peak'], 4)
+        self.assert_raise_with_msg(ValueError, 'The number of workers must be a positive integer.',
+                                   URLParser, True, 0)
+        del parser
+
     @patch('urllib.request.Request', side_effect=mocks.mocked_http_request)
     @patch('urllib.request.urlopen', side_effect=mocks.mocked_http_response)
     @patch('src.sync.url_parser.URLParser._get_assets', side_effect=mocks.mocked_get_assets)
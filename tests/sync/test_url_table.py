@@ -0,0 +1,41 @@
+from unittest import TestCase, main
+
+from src.sync.url_table import CompactResults, URLTable
+
+RESULTS = [{'url': 'http://www.sample.com/', 'assets': ['https://www.sample.com/style.css',
+                                                       'https://www.sample.com/logo.png']},
+           {'url': 'http://www.sample.com/test1/', 'assets': []},
+           {'url': 'http://www.sample.com/test2/', 'assets': ['https://www.sample.com/logo.png']}]
+
+
+class TestURLTable(TestCase):
+    """
+    Collection of test cases for the URLTable and CompactResults classes.
+    """
+
+    def test_url_table(self):
+        """
+        Tests that every distinct URL gets its own id, in the order it is first seen.
+        """
+        table = URLTable()
+        self.assertEqual(table.intern('http://www.sample.com/a'), 0)
+        self.assertEqual(table.intern('http://www.sample.com/b'), 1)
+        self.assertEqual(table.intern('http://www.sample.com/a'), 0)
+        self.assertEqual(table.url(1), 'http://www.sample.com/b')
+        self.assertEqual(len(table), 2)
+
+    def test_compact_results(self):
+        """
+        Tests that the results are stored once and expanded back when iterating.
+        """
+        results = CompactResults()
+        results.extend(RESULTS)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(results.table), 2)
+        self.assertEqual(list(results), RESULTS)
+        self.assertEqual(results[1], RESULTS[1])
+        self.assertEqual(results[-1], RESULTS[-1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import tests.sync.mocks as mocks
+from src.sync.frontier import Frontier
+from src.sync.spider import Spider
+from src.sync.visited import VISITED_SETS, BloomVisitedSet, SQLiteVisitedSet
+
+
+class TestVisited(TestCase):
+    """
+    Collection of test cases for the visited set backends.
+    """
+
+    def test_backends(self):
+        """
+        Tests that every backend reports the URLs already added.
+        """
+        for name, visited_set in VISITED_SETS.items():
+            visited = visited_set()
+            try:
+                self.assertTrue(visited.add('http://www.sample.com/a'), name)
+                self.assertTrue(visited.add('http://www.sample.com/b'), name)
+                self.assertFalse(visited.add('http://www.sample.com/a'), name)
+                self.assertIn('http://www.sample.com/b', visited)
+                self.assertNotIn('http://www.sample.com/c', visited)
+                self.assertEqual(len(visited), 2)
+            finally:
+                visited.close()
+
+    def test_bloom_error_rate(self):
+        """
+        Tests that the Bloom filter scales beyond its initial capacity while keeping the error rate.
+        """
+        visited = BloomVisitedSet(error_rate=0.01, initial_capacity=1000)
+        added = sum(visited.add('http://www.sample.com/{}'.format(i)) for i in range(20000))
+        self.assertGreater(len(visited._filters), 1)
+        self.assertEqual(len(visited), added)
+        for i in range(20000):
+            self.assertIn('http://www.sample.com/{}'.format(i), visited)
+        false_positives = sum('http://www.other.com/{}'.format(i) in visited for i in range(20000))
+        self.assertLess(false_positives, 20000 * 0.01 * 2)
+        self.assertLess(visited.size_in_bytes, 20000 * 4)
+
+    def test_sqlite(self):
+        """
+        Tests that the SQLite backend keeps the URLs added before it was last pickled.
+        """
+        temporary = SQLiteVisitedSet()
+        with self.assertRaises(TypeError):
+            pickle.dumps(temporary)
+        temporary.close()
+        self.assertFalse(os.path.exists(temporary.path))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'visited.sqlite')
+            visited = SQLiteVisitedSet(path)
+            visited.add('http://www.sample.com/a')
+            state = pickle.dumps(visited)
+            visited.add('http://www.sample.com/b')
+            visited.close()
+            restored = pickle.loads(state)
+            self.assertEqual(len(restored), 1)
+            self.assertIn('http://www.sample.com/a', restored)
+            self.assertNotIn('http://www.sample.com/b', restored)
+            restored.close()
+            reset = SQLiteVisitedSet(path, reset=True)
+            self.assertEqual(len(reset), 0)
+            reset.close()
+
+    def test_sqlite_commits(self):
+        """
+        Tests that the SQLite backend commits its URLs in batches and when it is closed, without being pickled.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'visited.sqlite')
+            visited = SQLiteVisitedSet(path, commit_every=2)
+            for i in range(3):
+                visited.add('http://www.sample.com/{}'.format(i))
+            with sqlite3.connect(path) as connection:
+                self.assertEqual(connection.execute('SELECT COUNT(*) FROM visited').fetchone()[0], 2)
+            visited.close()
+            reopened = SQLiteVisitedSet(path)
+            self.assertEqual(len(reopened), 3)
+            self.assertIn('http://www.sample.com/2', reopened)
+            reopened.close()
+
+    def test_frontier(self):
+        """
+        Tests a Frontier keeping its URLs in a Bloom filter.
+        """
+        frontier = Frontier(visited=BloomVisitedSet())
+        self.assertTrue(frontier.add('http://www.sample.com/a'))
+        self.assertFalse(frontier.add('http://www.sample.com/a#top'))
+        self.assertEqual(frontier.seen_count, 1)
+        self.assertEqual(frontier.pop(), 'http://www.sample.com/a')
+        frontier.close()
+
+    @patch('src.sync.url_parser.URLParser.parse_url', side_effect=mocks.mocked_parse_url)
+    def test_crawl(self, mock_parse_url):
+        """
+        Tests that crawls with any backend return the same results.
+        """
+        expected_json_response = Spider(enable_logging=False).crawl('http://www.sample.com/', 3)
+        for visited_set in VISITED_SETS.values():
+            spider = Spider(enable_logging=False, visited_set=visited_set)
+            self.assertEqual(spider.crawl('http://www.sample.com/', 3), expected_json_response)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import io
+import json
+from unittest import TestCase, main
+
+from src.sync.writers import CompactJSONWriter, JSONArrayWriter, NDJSONWriter, read_compact
+
+RESULTS = [{'url': 'http://www.sample.com/', 'assets': ['https://www.sample.com/some_img.png']},
+           {'url': 'http://www.sample.com/test1/', 'assets': []}]
+
+
+class TestWriters(TestCase):
+    """
+    Collection of test cases for the result writers.
+    """
+
+    def test_json_array_writer(self):
+        """
+        Tests that the JSONArrayWriter writes the same json returned by Spider.crawl to every stream.
+        """
+        streams = [io.StringIO(), io.StringIO()]
+        writer = JSONArrayWriter(streams)
+        writer.write(RESULTS[0])
+        # The array is written incrementally
+        self.assertEqual(streams[0].getvalue(), '[' + json.dumps(RESULTS[0]))
+        writer.write(RESULTS[1])
+        writer.close()
+        for stream in streams:
+            self.assertEqual(stream.getvalue(), json.dumps(RESULTS) + '\n')
+        empty_stream = io.StringIO()
+        JSONArrayWriter([empty_stream]).close()
+        self.assertEqual(json.loads(empty_stream.getvalue()), [])
+
+    def test_ndjson_writer(self):
+        """
+        Tests that the NDJSONWriter writes one json object per line.
+        """
+        stream = io.StringIO()
+        writer = NDJSONWriter([stream])
+        for result in RESULTS:
+            writer.write(result)
+        writer.close()
+        self.assertEqual([json.loads(line) for line in stream.getvalue().splitlines()], RESULTS)
+        self.assertEqual(writer.count, 2)
+
+    def test_compact_writer(self):
+        """
+        Tests that the CompactJSONWriter writes every asset once and that its output can be expanded.
+        """
+        results = RESULTS + [{'url': 'http://www.sample.com/test2/',
+                              'assets': ['https://www.sample.com/some_img.png', 'https://www.sample.com/other.png']}]
+        stream = io.StringIO()
+        writer = CompactJSONWriter([stream])
+        for result in results:
+            writer.write(result)
+        writer.close()
+        data = json.loads(stream.getvalue())
+        self.assertEqual(data['assets'], ['https://www.sample.com/some_img.png', 'https://www.sample.com/other.png'])
+        self.assertEqual(data['pages'][2], {'url': 'http://www.sample.com/test2/', 'assets': [0, 1]})
+        self.assertEqual(read_compact(data), results)
+        empty_stream = io.StringIO()
+        CompactJSONWriter([empty_stream]).close()
+        self.assertEqual(json.loads(empty_stream.getvalue()), {'pages': [], 'assets': []})
+
+
+if __name__ == '__main__':
+    main()